@@ -1,27 +1,33 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session as flask_session
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, request, jsonify, render_template, redirect, url_for, g, session as flask_session
 import logging
 import traceback
 import os
 from dotenv import load_dotenv
 from flask_socketio import SocketIO, emit, join_room
 
-import threading
-import time
-
 # Importing models from models folder
-from models import db, User, Sessions, Feedback, PerformanceMetrics, SensorData
+from models import db, User, Sessions, Feedback, PerformanceMetrics, SessionAggregates
 
 # Importing services for the business logic
-from services import build_lstm_autoencoder, run_isolation_forest, logical_check, run_analysis_realtime
+from services.upload_analysis import analyze_stored_upload, rebuild_results
+from services.model_registry import warm_up
+from services.live_ingest import LiveIngest, decode_frame
+from services.jobs import JobScheduler, QueueFullError, SOCKETIO_MESSAGE_QUEUE
+from services import sensor_store, aggregates, metrics, results_store, history, baselines, segmentation
+from services.batching import get_batcher
+from services.streaming import active_stream_count
+from services.emitter import legend
 
 # Importing additional utilities
-import numpy as np
-import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-import matplotlib.pyplot as plt
 import uuid
-from utils.auth import auth, signup, login  # login buraya dikkat!
+from datetime import date
+from utils.auth import signup, login, login_with_token  # login buraya dikkat!
 from utils.auth_decorator import login_required
+from utils.data_preprocessing import read_csv_chunks
+from utils.profiling import RequestProfiler, PROFILING_ALLOWED
 
 # Load dotenv file
 load_dotenv()
@@ -37,8 +43,77 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'fallback_dev_key')
 
-# Flask app’ine SocketIO ekle
-socketio = SocketIO(app)
+# Flask app’ine SocketIO ekle (message queue lets analysis worker processes emit events)
+socketio = SocketIO(app, message_queue=SOCKETIO_MESSAGE_QUEUE)
+
+# Rows of sensor data rendered on the session detail page
+SENSOR_DISPLAY_ROWS = 500
+# Rows parsed and stored per chunk of an uploaded CSV
+UPLOAD_CHUNK_ROWS = int(os.getenv('UPLOAD_CHUNK_ROWS', '65536'))
+
+
+# Stores live samples as columnar chunks and counts their anomalies (called from the live drain tasks)
+def persist_live_samples(session_id, samples, summary):
+    with app.app_context():
+        try:
+            session_obj = Sessions.query.filter_by(id=session_id).first()
+            if session_obj:
+                with metrics.stage_timer('db_write', pipeline='live'):
+                    sensor_store.append_samples(session_obj, samples)
+                    aggregates.add_analysis(session_id, summary)
+                    db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+# Live sensor ingestion (sensor_batch events) with per-session backpressure
+live_ingest = LiveIngest(socketio, on_samples=persist_live_samples)
+
+# Adds the anomaly counters of a finished upload analysis to the session aggregates and metrics
+def record_analysis_summary(job):
+    if job.started_at:
+        metrics.STAGE_SECONDS.observe(job.started_at - job.created_at, stage='queue_wait', pipeline='upload')
+        metrics.STAGE_SECONDS.observe(job.finished_at - job.started_at, stage='analysis', pipeline='upload')
+    if job.status != 'done' or not job.result:
+        return
+    metrics.record_summary(job.result)
+    with app.app_context():
+        try:
+            aggregates.add_analysis(job.session_id, job.result)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+# Bounded worker pool for upload analysis
+analysis_jobs = JobScheduler(socketio, on_complete=record_analysis_summary)
+
+# Gauges read when /metrics is scraped
+metrics.gauge('lifting_analysis_queue_depth', 'Upload analyses waiting for a worker', lambda: analysis_jobs.queue_depth)
+metrics.gauge('lifting_analysis_running', 'Upload analyses running', lambda: analysis_jobs.running_count)
+metrics.gauge('lifting_live_sessions', 'Sessions with an open live stream', active_stream_count)
+metrics.gauge('lifting_live_pending_frames', 'Live frames waiting to be analysed', lambda: live_ingest.pending_frames)
+metrics.gauge('lifting_inference_pending_windows', 'Windows waiting in the inference batcher',
+              lambda: get_batcher().pending_count)
+
+# Results cache rebuild job of each session, so revisits do not queue the same rebuild twice
+results_rebuilds = {}
+
+
+# Version of a session's cached analysis results, None if it has none for the served model
+# (or the athlete's baseline of it).
+def cached_results_version(session_obj):
+    version = baselines.version_for(session_obj.athlete, session_obj.lift_type)
+    if version and results_store.has_results(session_obj.id, version):
+        return version
+    return None
+
+
+# Per-request cProfile capture, switched at runtime through POST /debug/profiling
+request_profiler = RequestProfiler()
+request_profiler.init_app(app)
 
 # App configuration for SQLAlchemy
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
@@ -48,27 +123,31 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
 # Initialize ML system
-logger.info("Initializing anomaly detection system...")
-
-try:
-    scaler = MinMaxScaler()
-    timesteps = 10
-    n_features = 3
-    logger.debug("Building LSTM Autoencoder model...")
-    lstm_model = build_lstm_autoencoder(timesteps, n_features)
-    logger.info("LSTM Autoencoder initialized successfully")
-
-    if os.path.exists('trained_lstm_model.h5'):
-        logger.info("Loading trained LSTM model weights...")
-        lstm_model.load_weights('trained_lstm_model.weights.h5')
-        logger.info("LSTM model weights loaded successfully")
-    else:
-        logger.warning("No pre-trained LSTM model found. Model is untrained.")
-
-except Exception as e:
-    logger.error(f"Initialization error: {str(e)}")
-    logger.error(traceback.format_exc())
-    raise
+# ML_WARMUP = 'background' (default) loads the model in a background task after startup,
+#             'eager' loads it before serving, 'off' loads it on the first analysis (web-only workers).
+ML_WARMUP = os.getenv('ML_WARMUP', 'background')
+
+
+def warm_up_ml():
+    try:
+        # Trained offline with train_lstm.py; analysis only runs inference with this artifact
+        model_artifact = warm_up()
+        if model_artifact:
+            logger.info(f"Serving model version {model_artifact.version}")
+        else:
+            logger.warning("No registered model found. Uploads will train a session model.")
+    except Exception as e:
+        logger.error(f"Initialization error: {str(e)}")
+        logger.error(traceback.format_exc())
+        if ML_WARMUP == 'eager':
+            raise
+
+
+if ML_WARMUP == 'eager':
+    logger.info("Initializing anomaly detection system...")
+    warm_up_ml()
+elif ML_WARMUP == 'background':
+    socketio.start_background_task(warm_up_ml)
 
 # ================== ROUTES ====================
 
@@ -91,14 +170,16 @@ def signup_user():
         last_name = data.get('last_name')
         role = data.get('role')
 
-        user = auth.create_user_with_email_and_password(email, password)
+        user = signup(email, password)
+        if "error" in user:
+            return jsonify({'status': 'error', 'message': user['error']}), 400
 
         new_user = User(
             first_name=first_name,
             last_name=last_name,
             email=email,
             role=role,
-            firebase_uid=user['localId']
+            firebase_uid=user['uid']
         )
         db.session.add(new_user)
         db.session.commit()
@@ -119,11 +200,15 @@ def login_user():
         data = request.get_json()
         email = data.get('email')
         password = data.get('password')
+        id_token = data.get('id_token')
 
-        if not email or not password:
+        # An ID token from the client SDK is verified locally; email/password signs in through the provider
+        if id_token:
+            user = login_with_token(id_token)
+        elif not email or not password:
             return jsonify({'status': 'error', 'message': 'Email and password are required'}), 400
-
-        user = login(email, password)
+        else:
+            user = login(email, password)
 
         if "error" in user:
             return jsonify({'status': 'error', 'message': user['error']}), 400
@@ -145,10 +230,16 @@ def dashboard():
 def sessions():
     logger.info("Rendering sessions page")
     try:
-        trainers = User.query.filter(User.role == 'trainer').all()
+        # Only the columns of the dropdown, through the users.role index
+        trainers = (
+            User.query
+            .with_entities(User.id, User.first_name, User.last_name)
+            .filter(User.role == 'trainer')
+            .order_by(User.first_name, User.last_name)
+        )
         trainer_options = [
-            {'id': str(trainer.id), 'full_name': f"{trainer.first_name} {trainer.last_name}"}
-            for trainer in trainers
+            {'id': str(trainer_id), 'full_name': f"{first_name} {last_name}"}
+            for trainer_id, first_name, last_name in trainers
         ]
         return render_template('sessions.html', trainers=trainer_options)
     except Exception as e:
@@ -162,7 +253,7 @@ def start_session():
         data = request.get_json()
         lift_type = data.get('lift_type')
         trainer_id = data.get('trainer_id')
-        athlete_id = flask_session.get('user_id')
+        athlete_id = g.user_id
 
         if not athlete_id:
             logger.warning("Unauthorized attempt to start a session (no athlete ID)")
@@ -171,9 +262,13 @@ def start_session():
         if not lift_type or not trainer_id:
             logger.warning("Missing required fields for starting session")
             return jsonify({'status': 'error', 'message': 'Missing required fields'}), 400
+        try:
+            trainer_id = uuid.UUID(str(trainer_id))
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'Invalid trainer_id'}), 400
 
         new_session = Sessions(
-            id=str(uuid.uuid4()),
+            id=uuid.uuid4(),
             lift_type=lift_type,
             trainer=trainer_id,
             athlete=athlete_id,
@@ -206,20 +301,65 @@ def session_detail(session_id):
         if not current_session:
             return "Session not found", 404
 
-        sensor_data_entry = SensorData.query.filter(SensorData.session == session_id).first()
-        data_list = []
-        if sensor_data_entry and sensor_data_entry.raw_data:
-            data_list = sensor_data_entry.raw_data
+        # Only the first rows are rendered; the full recording is available through the range API
+        samples = sensor_store.read_samples(session_id, 0, SENSOR_DISPLAY_ROWS)
+        data_list = [dict(zip(sensor_store.FEATURES, map(float, row))) for row in samples]
 
         return render_template(
             'session_detail.html',
             session=current_session,
-            sensor_data=data_list
+            sensor_data=data_list,
+            sensor_sample_count=sensor_store.sample_count(session_id),
+            results_version=cached_results_version(current_session)
         )
     except Exception as e:
         logger.error(f"Error loading session detail: {str(e)}")
         return "An error occurred loading the session detail page.", 500
 
+@app.route('/sessions/<session_id>/sensor_data', methods=['GET'])
+@login_required
+def get_sensor_data(session_id):
+    try:
+        start = request.args.get('start', 0, type=int)
+        stop = request.args.get('stop', None, type=int)
+        samples = sensor_store.read_samples(session_id, max(start, 0), stop)
+        return jsonify({
+            'status': 'success',
+            'start': start,
+            'count': int(len(samples)),
+            'total': sensor_store.sample_count(session_id),
+            **{feature: samples[:, i].tolist() for i, feature in enumerate(sensor_store.FEATURES)}
+        }), 200
+    except Exception as e:
+        logger.error(f"❌ Error reading sensor data for session {session_id}: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': f"Internal error: {str(e)}"}), 500
+
+# Cached per-window analysis results of a session (served model version only), as columns.
+# Query: start/stop sample indices. 404 if the session has no results for the served model.
+@app.route('/sessions/<session_id>/results', methods=['GET'])
+@login_required
+def get_results(session_id):
+    try:
+        session_obj = Sessions.query.filter(Sessions.id == session_id).first()
+        if not session_obj:
+            return jsonify({'status': 'error', 'message': 'Session not found'}), 404
+        version = cached_results_version(session_obj)
+        if version is None:
+            return jsonify({'status': 'error', 'message': 'No cached results for the current model'}), 404
+        start = request.args.get('start', 0, type=int)
+        stop = request.args.get('stop', None, type=int)
+        results = results_store.read_results(session_id, version, max(start, 0), stop)
+        return jsonify({
+            'status': 'success',
+            'model_version': version,
+            'count': int(len(results['mse'])),
+            'legend': legend(),
+            **{name: values.tolist() for name, values in results.items()}
+        }), 200
+    except Exception as e:
+        logger.error(f"❌ Error reading results for session {session_id}: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': f"Internal error: {str(e)}"}), 500
+
 @app.route('/sessions/<session_id>/sensor_data', methods=['POST'])
 @login_required
 def upload_sensor_data(session_id):
@@ -235,37 +375,52 @@ def upload_sensor_data(session_id):
         if not session_obj:
             return jsonify({'status': 'error', 'message': 'Session not found'}), 404
 
-        # Read CSV into DataFrame
-        df = pd.read_csv(file)
-        required_columns = {'left_foot_pressure', 'right_foot_pressure', 'core_stability'}
-        if not required_columns.issubset(df.columns):
-            return jsonify({'status': 'error', 'message': 'CSV missing required columns'}), 400
-
-        # Save raw sensor data
-        sensor_data_list = df.to_dict(orient='records')
-        new_sensor_data = SensorData(
-            id=str(uuid.uuid4()),
-            session=session_obj.id,
-            athlete=session_obj.athlete,
-            raw_data=sensor_data_list
-        )
-
-        db.session.add(new_sensor_data)
-        db.session.flush()  # Get generated ID
-
-        # Update session with sensor_data_id
-        session_obj.sensor_data_id = new_sensor_data.id
-        db.session.commit()
+        # Parse the CSV in chunks (only the sensor columns, float32) and store each chunk as it is read,
+        # so memory stays bounded by UPLOAD_CHUNK_ROWS whatever the file size (header row is created on first upload)
+        start = sensor_store.get_or_create_header(session_obj).sample_count or 0
+        rows = 0
+        chunks = read_csv_chunks(file, sensor_store.FEATURES, UPLOAD_CHUNK_ROWS)
+        try:
+            while True:
+                with metrics.stage_timer('csv_parse'):
+                    samples = next(chunks, None)
+                if samples is None:
+                    break
+                with metrics.stage_timer('db_write'):
+                    sensor_store.append_samples(session_obj, samples)
+                    db.session.commit()
+                rows += len(samples)
+        except ValueError as e:
+            db.session.rollback()
+            metrics.UPLOADS.inc(status='invalid')
+            message = str(e) if rows == 0 else f"{rows} rows stored, then: {str(e)}"
+            return jsonify({'status': 'error', 'message': message}), 400
+        metrics.UPLOADED_ROWS.inc(rows)
 
         logger.info(f"✅ Sensor data saved for session {session_id}, starting real-time analysis...")
 
-        # Start real-time analysis in background
-        threading.Thread(target=run_analysis_realtime, args=(session_id, df, socketio)).start()
-
-        return jsonify({'status': 'success', 'message': 'Sensor data uploaded and real-time analysis started.'}), 200
+        # Queue real-time analysis on the worker pool (per-session fine-tuning is opt-in)
+        fine_tune = request.form.get('fine_tune', 'false').lower() in ('1', 'true', 'yes')
+        try:
+            job = analysis_jobs.submit(
+                session_id, analyze_stored_upload, session_id, start, start + rows,
+                fine_tune=fine_tune, lift_type=session_obj.lift_type
+            )
+        except QueueFullError as e:
+            metrics.UPLOADS.inc(status='rejected')
+            logger.warning(f"Analysis queue full, rejecting upload analysis for session {session_id}")
+            return jsonify({'status': 'error', 'message': f"Sensor data saved but analysis is busy: {str(e)}. Please retry later."}), 429
+
+        metrics.UPLOADS.inc(status='queued')
+        return jsonify({
+            'status': 'success',
+            'message': 'Sensor data uploaded and real-time analysis queued.',
+            'job_id': job.id
+        }), 200
 
     except Exception as e:
         db.session.rollback()
+        metrics.UPLOADS.inc(status='error')
         logger.error(f"❌ Error uploading sensor data for session {session_id}: {str(e)}", exc_info=True)
         return jsonify({'status': 'error', 'message': f"Internal error: {str(e)}"}), 500
 
@@ -281,23 +436,23 @@ def end_session(session_id):
         if current_session.status == 'ended':
             return jsonify({'status': 'error', 'message': 'Session already ended'}), 400
 
-        # Fetch sensor data
-        sensor_data_entry = SensorData.query.filter_by(session=session_id).first()
-        if not sensor_data_entry or not sensor_data_entry.raw_data:
+        # Finish live ingestion so every streamed sample is stored
+        with metrics.stage_timer('close_stream', pipeline='end_session'):
+            live_ingest.close(session_id, timeout=10)
+
+        # Running aggregates kept up to date as data arrived (O(1) read)
+        with metrics.stage_timer('aggregates', pipeline='end_session'):
+            session_aggregates = aggregates.get_or_create(session_id)
+            if not session_aggregates.sample_count:
+                # Sessions recorded before aggregates existed: build them once from the stored samples
+                for _, chunk in sensor_store.iter_chunks(session_id):
+                    aggregates.add_samples(session_id, chunk)
+        if not session_aggregates.sample_count:
+            db.session.rollback()
             return jsonify({'status': 'error', 'message': 'No sensor data found for this session'}), 404
 
-        df = pd.DataFrame(sensor_data_entry.raw_data)
-        features = ['left_foot_pressure', 'right_foot_pressure', 'core_stability']
-        if not set(features).issubset(df.columns):
-            return jsonify({'status': 'error', 'message': 'Sensor data missing required features'}), 400
-
         # Calculate performance metrics
-        avg_left = float(df['left_foot_pressure'].mean())
-        avg_right = float(df['right_foot_pressure'].mean())
-        avg_core = float(df['core_stability'].mean())
-        balance_score = float(1 - abs(avg_left - avg_right))
-        stability_score = float(avg_core)
-        injury_risk = float(1 - (balance_score * stability_score))
+        balance_score, stability_score, injury_risk = aggregates.performance_scores(session_aggregates)
 
         # Save performance metrics
         perf_metrics_id = str(uuid.uuid4())
@@ -319,6 +474,10 @@ def end_session(session_id):
             alerts.append("Çekirdek stabilitesi düşük.")
         if injury_risk > 0.7:
             alerts.append("Yüksek sakatlanma riski.")
+        # Reps and phases with anomalies, from the cached analysis of a segmented recording
+        results_version = cached_results_version(current_session)
+        if results_version:
+            alerts.extend(segmentation.rep_alerts(results_store.read_reps(session_id, results_version)))
         if not alerts:
             alerts.append("Performans mükemmel, hiçbir sorun bulunmadı!")
 
@@ -327,16 +486,21 @@ def end_session(session_id):
             id=str(uuid.uuid4()),
             session=session_id,
             metrics_id=perf_metrics_id,  # connect to metrics
-            feedback_text=" ".join(alerts)
+            feedback_text=" ".join(alerts)[:500]
         )
         db.session.add(feedback)
 
+        # Daily trend rollup of the athlete
+        history.add_to_rollup(current_session, perf_metrics)
+
         # Mark session as ended
         current_session.status = 'ended'
         current_session.ended_at = db.func.now()
 
         # Commit all at once
-        db.session.commit()
+        with metrics.stage_timer('db_write', pipeline='end_session'):
+            db.session.commit()
+        metrics.SESSIONS_ENDED.inc()
 
         logger.info(f"✅ Session {session_id} ended. Metrics and feedback saved.")
 
@@ -351,25 +515,77 @@ def end_session(session_id):
         logger.error(f"❌ Error ending session {session_id}: {str(e)}", exc_info=True)
         return jsonify({'status': 'error', 'message': f"Internal error: {str(e)}"}), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def job_status(job_id):
+    job = analysis_jobs.get(job_id)
+    if not job:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify({
+        'status': 'success',
+        'job': job.to_dict(),
+        'queue_depth': analysis_jobs.queue_depth,
+        'running': analysis_jobs.running_count
+    }), 200
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_job(job_id):
+    job = analysis_jobs.get(job_id)
+    if not job:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    if not analysis_jobs.cancel(job_id):
+        return jsonify({'status': 'error', 'message': f"Job cannot be cancelled (status: {job.status})"}), 409
+    logger.info(f"Cancellation requested for job {job_id}")
+    return jsonify({'status': 'success', 'message': 'Job cancellation requested.', 'job': job.to_dict()}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return app.response_class(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/profiling', methods=['POST'])
+@login_required
+def set_profiling():
+    if not PROFILING_ALLOWED:
+        return jsonify({'status': 'error', 'message': 'Profiling is disabled (set PROFILING_ALLOWED=true)'}), 403
+    mode = (request.get_json(silent=True) or {}).get('mode', 'off')
+    try:
+        request_profiler.set_mode(mode)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'status': 'success', 'mode': request_profiler.mode, 'output_dir': request_profiler.output_dir}), 200
+
 @app.route('/sessions/<session_id>/details', methods=['GET'])
 @login_required
 def session_details_page(session_id):
     try:
-        current_session = Sessions.query.filter(Sessions.id == session_id).first()
+        # Session, metrics and feedback in one joined query
+        current_session = history.session_with_report(session_id)
         if not current_session:
             return "Session not found", 404
 
-        metrics = PerformanceMetrics.query.filter_by(session=session_id).first()
-        feedback = Feedback.query.filter_by(session=session_id).first()
+        metrics = current_session.metrics_rel
+        feedback = current_session.feedback_rel
+        session_aggregates = SessionAggregates.query.filter_by(session=session_id).first()
 
         if not metrics or not feedback:
             return "Metrics or feedback not found for this session", 404
 
+        results_version = cached_results_version(current_session)
+
         return render_template(
             'result.html',
             session=current_session,
             metrics=metrics,
-            feedback=feedback
+            feedback=feedback,
+            aggregates=session_aggregates,
+            channel_summary=aggregates.describe(session_aggregates) if session_aggregates else {},
+            imbalance_bins=aggregates.IMBALANCE_BINS,
+            results_version=results_version,
+            timeline=results_store.timeline(session_id, results_version) if results_version else [],
+            anomalies=results_store.anomalies(session_id, results_version) if results_version else [],
+            reps=results_store.read_reps(session_id, results_version) if results_version else [],
+            phases=segmentation.PHASES
         )
     except Exception as e:
         logger.error(f"❌ Error loading session details: {str(e)}", exc_info=True)
@@ -379,22 +595,106 @@ def session_details_page(session_id):
 @login_required
 def profile_page():
     try:
-        user_id = flask_session.get('user_id')
+        user_id = g.user_id
         user = User.query.filter_by(id=user_id).first()
         if not user:
             return "User not found", 404
 
-        sessions = Sessions.query.filter_by(athlete=user_id).all()
+        # One keyset page of the history, with metrics and feedback joined in
+        try:
+            sessions, next_cursor = history.athlete_sessions(user_id, cursor=request.args.get('cursor'))
+        except ValueError as e:
+            return str(e), 400
 
         return render_template(
             'profile.html',
             user=user,
-            sessions=sessions
+            sessions=sessions,
+            next_cursor=next_cursor,
+            first_page=not request.args.get('cursor')
         )
     except Exception as e:
         logger.error(f"❌ Error loading profile page: {str(e)}", exc_info=True)
         return "An error occurred while loading the profile page.", 500
 
+# Access of the caller to an athlete's history: the athlete sees all of it, a trainer the sessions they trained.
+# @return (athlete UUID, trainer filter for history.athlete_sessions, error response or None)
+def athlete_history_access(athlete_id):
+    try:
+        athlete_id = uuid.UUID(athlete_id)
+    except ValueError:
+        return None, None, (jsonify({'status': 'error', 'message': 'Invalid athlete id'}), 400)
+    if athlete_id == g.user_id:
+        return athlete_id, None, None
+    if history.trains_athlete(g.user_id, athlete_id):
+        return athlete_id, g.user_id, None
+    return None, None, (jsonify({'status': 'error', 'message': "Forbidden: not your athlete's history"}), 403)
+
+# Sessions of an athlete, newest first, keyset-paginated.
+# Query: cursor (next_cursor of the previous page), limit (default 20, max 100).
+@app.route('/athletes/<athlete_id>/sessions', methods=['GET'])
+@login_required
+def athlete_sessions(athlete_id):
+    athlete_uuid, trainer_id, error = athlete_history_access(athlete_id)
+    if error:
+        return error
+    try:
+        sessions, next_cursor = history.athlete_sessions(
+            athlete_uuid,
+            limit=request.args.get('limit', history.SESSION_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor'),
+            trainer_id=trainer_id
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Error listing sessions of athlete {athlete_id}: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': f"Internal error: {str(e)}"}), 500
+
+    return jsonify({
+        'status': 'success',
+        'sessions': [
+            {
+                'id': str(s.id),
+                'lift_type': s.lift_type,
+                'status': s.status,
+                'started_at': s.started_at.isoformat() if s.started_at else None,
+                'ended_at': s.ended_at.isoformat() if s.ended_at else None,
+                'balance_score': s.metrics_rel.balance_score if s.metrics_rel else None,
+                'stability_score': s.metrics_rel.stability_score if s.metrics_rel else None,
+                'injury_risk': s.metrics_rel.injury_risk if s.metrics_rel else None,
+                'feedback': s.feedback_rel.feedback_text if s.feedback_rel else None,
+            }
+            for s in sessions
+        ],
+        'next_cursor': next_cursor
+    }), 200
+
+# Balance/stability/injury-risk trend of an athlete from the daily rollups.
+# Query: period (day|week|month), lift_type, since/until (YYYY-MM-DD).
+@app.route('/athletes/<athlete_id>/trends', methods=['GET'])
+@login_required
+def athlete_trends(athlete_id):
+    athlete_uuid, _, error = athlete_history_access(athlete_id)
+    if error:
+        return error
+    try:
+        since = request.args.get('since')
+        until = request.args.get('until')
+        points = history.trend(
+            athlete_uuid,
+            period=request.args.get('period', 'day'),
+            lift_type=request.args.get('lift_type'),
+            since=date.fromisoformat(since) if since else None,
+            until=date.fromisoformat(until) if until else None
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Error loading trends of athlete {athlete_id}: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': f"Internal error: {str(e)}"}), 500
+    return jsonify({'status': 'success', 'trend': points}), 200
+
 @app.route('/logout', methods=['POST'])
 def logout():
     flask_session.clear()
@@ -416,6 +716,79 @@ def on_join(room_id):
     join_room(room_id)
     logger.info(f"Client joined room {room_id}")
 
+
+# Live sensor frames from insole gateways.
+# Payload: {'session_id': ..., 'frame': <bytes of float32 left/right/core triplets>}
+# The returned dict is the Socket.IO ack; on 'backpressure' the client resends the frame later.
+@socketio.on('sensor_batch')
+def on_sensor_batch(data):
+    if not flask_session.get('user_id'):
+        return {'status': 'error', 'message': 'Unauthorized'}
+
+    session_id = data.get('session_id') if isinstance(data, dict) else None
+    if not session_id:
+        return {'status': 'error', 'message': 'session_id is required'}
+
+    try:
+        samples = decode_frame(data.get('frame'))
+    except ValueError as e:
+        return {'status': 'error', 'message': str(e)}
+
+    # Validate the session once, when its live stream is opened
+    lift_type = athlete = None
+    if not live_ingest.is_open(session_id):
+        session_obj = Sessions.query.filter_by(id=session_id).first()
+        if not session_obj:
+            return {'status': 'error', 'message': 'Session not found'}
+        if session_obj.status == 'ended':
+            return {'status': 'error', 'message': 'Session already ended'}
+        lift_type, athlete = session_obj.lift_type, session_obj.athlete
+
+    try:
+        return live_ingest.submit(session_id, samples, lift_type, athlete)
+    except Exception as e:
+        logger.error(f"❌ Error ingesting live data for session {session_id}: {str(e)}", exc_info=True)
+        return {'status': 'error', 'message': f"Internal error: {str(e)}"}
+
+# Replays a session's cached analysis results to the requesting client.
+# Without results for the served model, the stored samples are re-analysed once to rebuild the cache
+# (the rebuild streams to the session room like an upload analysis).
+# The returned dict is the Socket.IO ack.
+@socketio.on('replay_results')
+def on_replay_results(data):
+    if not flask_session.get('user_id'):
+        return {'status': 'error', 'message': 'Unauthorized'}
+
+    session_id = data.get('session_id') if isinstance(data, dict) else None
+    session_obj = Sessions.query.filter_by(id=session_id).first() if session_id else None
+    if not session_obj:
+        return {'status': 'error', 'message': 'Session not found'}
+
+    version = cached_results_version(session_obj)
+    if version:
+        sid = request.sid
+
+        def replay():
+            with app.app_context():
+                with metrics.stage_timer('replay', pipeline='results'):
+                    results_store.replay(session_id, version, socketio, room=sid)
+
+        socketio.start_background_task(replay)
+        return {'status': 'replaying', 'model_version': version}
+
+    if not sensor_store.sample_count(session_id):
+        return {'status': 'error', 'message': 'No sensor data to analyse'}
+    job = results_rebuilds.get(session_id)
+    if job is None or job.status not in ('queued', 'running'):
+        try:
+            job = analysis_jobs.submit(session_id, rebuild_results, session_id, lift_type=session_obj.lift_type)
+        except QueueFullError as e:
+            return {'status': 'error', 'message': f"Analysis is busy: {str(e)}. Please retry later."}
+        results_rebuilds[session_id] = job
+    return {'status': 'rebuilding', 'job_id': job.id}
+
+logger.info(f"App initialized in {time.perf_counter() - _import_started:.2f}s (ML_WARMUP={ML_WARMUP})")
+
 if __name__ == '__main__':
     logger.info("Starting Flask anomaly detection API...")
     socketio.run(app, debug=True, port=5000)
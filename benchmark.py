@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+
+# Frame pacing of the emitter would dominate the emission timing
+os.environ.setdefault('EMIT_FPS', '0')
+
+import numpy as np
+from utils.synthetic import generate_recording, FEATURES
+from utils.windowing import iter_window_chunks
+from services.normalization import MinMaxNormalizer
+from services.lstm_runtime import NumpyAutoencoder, LSTM_UNITS, predict_mse
+from services.anomaly_detection import fit_reference_detectors, run_isolation_forest, run_oneclass_svm
+from services.logic_rules import evaluate_rules
+from services.emitter import BatchEmitter, pack_flags
+from services.model_registry import ModelArtifact, load_artifact
+from services.analyze import run_analysis_realtime
+from services.segmentation import RepSegmenter
+
+# Benchmark of the upload analysis pipeline on synthetic recordings (utils/synthetic.py).
+# Every stage of run_analysis_realtime is timed separately, plus the whole call end to end:
+#   scaling, segmentation, windowing, lstm_fit (optional, needs TensorFlow), lstm_predict, isolation_forest,
+#   oneclass_svm, rules, emission, end_to_end
+# Results (latency percentiles, throughput, peak memory) are written as JSON and can be
+# compared with an earlier run:
+#
+#   $ python benchmark.py --rows 10000 100000 --repeat 5
+#   $ python benchmark.py --compare benchmark_results/<earlier run>.json
+
+
+# Socket.IO stand-in that only counts events.
+class NullSocketIO:
+    def __init__(self):
+        self.events = 0
+
+    def emit(self, *args, **kwargs):
+        self.events += 1
+
+
+# Model with seeded random weights (same layout as build_lstm_autoencoder), so the benchmark
+# runs without a registered model or TensorFlow. Scaler, detectors and threshold are fitted on
+# an anomaly-free synthetic reference recording.
+def synthetic_artifact(timesteps, seed, reference_rows=5000):
+    rng = np.random.default_rng(seed)
+    weights, n_in = [], len(FEATURES)
+    for units in LSTM_UNITS:
+        weights += [
+            rng.normal(0, 1 / np.sqrt(n_in), (n_in, 4 * units)),
+            rng.normal(0, 1 / np.sqrt(units), (units, 4 * units)),
+            np.zeros(4 * units),
+        ]
+        n_in = units
+    weights += [rng.normal(0, 1 / np.sqrt(n_in), (n_in, len(FEATURES))), np.zeros(len(FEATURES))]
+    model = NumpyAutoencoder(weights, timesteps)
+
+    reference = generate_recording(reference_rows, seed=seed)[FEATURES].to_numpy()
+    scaler = MinMaxNormalizer().fit(reference)
+    scaled = scaler.transform(reference)
+    threshold = float(np.percentile(predict_mse(model, scaled, timesteps), 95))
+    iso_detector, svm_detector = fit_reference_detectors(scaled)
+    return ModelArtifact('synthetic', model, scaler, threshold, timesteps, FEATURES,
+                         iso_detector=iso_detector, svm_detector=svm_detector)
+
+
+# Runs fn once untimed, `repeat` times timed and once under tracemalloc for the peak memory.
+def measure(fn, repeat):
+    fn()
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return np.array(latencies), peak
+
+
+def summarize(latencies, peak, rows):
+    median = float(np.median(latencies))
+    return {
+        'runs': int(len(latencies)),
+        'mean_ms': float(latencies.mean() * 1000),
+        'p50_ms': median * 1000,
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'min_ms': float(latencies.min() * 1000),
+        'rows_per_s': rows / median if median > 0 else None,
+        'peak_mem_mb': peak / 2 ** 20,
+    }
+
+
+# Times every stage on one recording.
+# @return {stage: summary}
+def bench_recording(df, artifact, repeat, fit_epochs=0):
+    timesteps = artifact.timesteps
+    raw = df[FEATURES].to_numpy()
+    scaled = artifact.scaler.transform(raw)
+    X_ml = scaled[:-timesteps]
+    mse = predict_mse(artifact.model, scaled, timesteps)
+    iso = artifact.iso_detector.predict(X_ml)
+    svm = artifact.svm_detector.predict(X_ml)
+    final = (mse > artifact.threshold) | (iso & svm)
+    codes = evaluate_rules(X_ml[:, 0], X_ml[:, 1], X_ml[:, 2], mse, artifact.threshold)
+    flags = pack_flags(mse > artifact.threshold, iso, svm, final)
+
+    def windowing():
+        for _ in iter_window_chunks(scaled, timesteps):
+            pass
+
+    def emission():
+        BatchEmitter(NullSocketIO(), 'benchmark', fps=0).emit_arrays(
+            X_ml[:, 0], X_ml[:, 1], X_ml[:, 2], mse, flags, codes)
+
+    stages = {
+        'scaling': lambda: artifact.scaler.transform(raw),
+        'segmentation': lambda: RepSegmenter().update(scaled),
+        'windowing': windowing,
+        'lstm_predict': lambda: predict_mse(artifact.model, scaled, timesteps),
+        'isolation_forest': lambda: artifact.iso_detector.predict(X_ml),
+        'oneclass_svm': lambda: artifact.svm_detector.predict(X_ml),
+        'isolation_forest_refit': lambda: run_isolation_forest(X_ml),
+        'oneclass_svm_refit': lambda: run_oneclass_svm(X_ml),
+        'rules': lambda: evaluate_rules(X_ml[:, 0], X_ml[:, 1], X_ml[:, 2], mse, artifact.threshold),
+        'emission': emission,
+        'end_to_end': lambda: run_analysis_realtime('benchmark', df, NullSocketIO(), artifact=artifact),
+    }
+    if fit_epochs:
+        from services.lstm_model import build_lstm_autoencoder, fit_windows
+
+        def lstm_fit():
+            model = build_lstm_autoencoder(timesteps, len(FEATURES))
+            fit_windows(model, scaled, timesteps, epochs=fit_epochs, verbose=0)
+        stages['lstm_fit'] = lstm_fit
+
+    results = {}
+    for name, fn in stages.items():
+        # Refitting OCSVM is quadratic; keep it to one timed run on large recordings
+        runs = 1 if name.endswith('_refit') and len(df) > 20000 else repeat
+        results[name] = summarize(*measure(fn, runs), len(df))
+        print(f"  {name:<24} p50 {results[name]['p50_ms']:>10.2f} ms   "
+              f"p99 {results[name]['p99_ms']:>10.2f} ms   peak {results[name]['peak_mem_mb']:>8.1f} MB")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Prints the p50 ratio of every stage against a previous result file.
+# @return Stages slower than max_regression times the baseline.
+def compare(result, baseline_path, max_regression):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    baseline_runs = {run['rows']: run['stages'] for run in baseline['runs']}
+    regressions = []
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    for run in result['runs']:
+        for name, stats in run['stages'].items():
+            before = baseline_runs.get(run['rows'], {}).get(name)
+            if not before:
+                continue
+            ratio = stats['p50_ms'] / before['p50_ms'] if before['p50_ms'] else float('inf')
+            marker = '❌' if ratio > max_regression else '✅'
+            print(f"  {marker} rows={run['rows']:<8} {name:<24} {before['p50_ms']:>10.2f} -> {stats['p50_ms']:>10.2f} ms ({ratio:.2f}x)")
+            if ratio > max_regression:
+                regressions.append((run['rows'], name, ratio))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the analysis pipeline on synthetic recordings.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000], help='Recording lengths to benchmark')
+    parser.add_argument('--anomaly-rate', type=float, default=0.02, help='Fraction of rows in injected anomalies')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per stage')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--model', choices=['auto', 'registry', 'synthetic'], default='auto',
+                        help='Registered model (auto: if one exists) or seeded random weights')
+    parser.add_argument('--version', default=None, help='Registry version used with --model registry')
+    parser.add_argument('--timesteps', type=int, default=10, help='Window length of the synthetic model')
+    parser.add_argument('--fit-epochs', type=int, default=0, help='Also time LSTM training (needs TensorFlow)')
+    parser.add_argument('--output', default=None, help='Result JSON (default: benchmark_results/<time>-<commit>.json)')
+    parser.add_argument('--compare', default=None, help='Earlier result JSON to compare against')
+    parser.add_argument('--max-regression', type=float, default=1.2, help='Allowed p50 slowdown when comparing')
+    args = parser.parse_args()
+
+    artifact = None
+    if args.model in ('auto', 'registry'):
+        artifact = load_artifact(args.version)
+        if artifact is None and args.model == 'registry':
+            raise SystemExit("Model registry is empty. Run train_lstm.py first.")
+    if artifact is None or not (artifact.iso_detector and artifact.svm_detector):
+        artifact = synthetic_artifact(args.timesteps, args.seed)
+    print(f"Model: {artifact.version} (timesteps={artifact.timesteps})")
+
+    result = {
+        'commit': git_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {**vars(args), 'model_version': artifact.version},
+        'runs': [],
+    }
+    for n_rows in args.rows:
+        print(f"\nRecording of {n_rows} rows (anomaly rate {args.anomaly_rate}):")
+        df = generate_recording(n_rows, args.anomaly_rate, seed=args.seed)
+        result['runs'].append({'rows': n_rows, 'stages': bench_recording(df, artifact, args.repeat, args.fit_epochs)})
+    # ru_maxrss is in KB on Linux
+    result['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    output = args.output or os.path.join(
+        'benchmark_results', f"{time.strftime('%Y%m%d-%H%M%S')}-{result['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\n✅ Results saved to {output} (max RSS {result['max_rss_mb']:.0f} MB)")
+
+    if args.compare:
+        regressions = compare(result, args.compare, args.max_regression)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} stage(s) slower than {args.max_regression}x the baseline")
@@ -0,0 +1,40 @@
+import argparse
+from models import create_db_app
+from services import baselines
+from services.model_registry import load_artifact, REGISTRY_DIR
+
+# Builds per-athlete baselines (services/baselines.py) from the athletes' ended sessions.
+# Re-run after new sessions or a new model version; existing baselines are replaced.
+parser = argparse.ArgumentParser(description='Build per-athlete baselines of a registered model.')
+parser.add_argument('--version', default=None, help='Registry version (default: MODEL_VERSION or LATEST)')
+parser.add_argument('--registry-dir', default=REGISTRY_DIR)
+parser.add_argument('--baseline-dir', default=baselines.BASELINE_DIR)
+parser.add_argument('--athlete', default=None, help='Only this athlete id (default: every athlete with ended sessions)')
+parser.add_argument('--lift-type', default=None, help='Only this lift type')
+parser.add_argument('--max-sessions', type=int, default=baselines.BASELINE_MAX_SESSIONS, help='Newest sessions used per baseline')
+parser.add_argument('--min-windows', type=int, default=baselines.BASELINE_MIN_WINDOWS, help='Windows of history needed')
+parser.add_argument('--percentile', type=float, default=95, help='MSE percentile used as the athlete threshold')
+parser.add_argument('--fine-tune-epochs', type=int, default=0, help='Fine-tune the LSTM on the athlete (needs TensorFlow)')
+args = parser.parse_args()
+
+with create_db_app().app_context():
+    base = load_artifact(args.version, args.registry_dir)
+    if base is None:
+        raise SystemExit("Model registry is empty. Run train_lstm.py to register a model.")
+    built = skipped = 0
+    for athlete, lift_type in baselines.baseline_candidates(args.athlete, args.lift_type):
+        path = baselines.build_baseline(
+            athlete, lift_type, base,
+            baseline_dir=args.baseline_dir,
+            max_sessions=args.max_sessions,
+            min_windows=args.min_windows,
+            percentile=args.percentile,
+            fine_tune_epochs=args.fine_tune_epochs,
+        )
+        if path:
+            built += 1
+            print(f"   {athlete} / {lift_type}: {path}")
+        else:
+            skipped += 1
+
+print(f"✅ {built} baselines built for model {base.version} ({skipped} skipped: not enough history)")
@@ -0,0 +1,44 @@
+import argparse
+import json
+import os
+import numpy as np
+from services.lstm_model import build_lstm_autoencoder
+from services.lstm_runtime import NumpyAutoencoder, TFLiteAutoencoder, export_npz, export_tflite, max_abs_diff, LSTM_UNITS
+from services.model_registry import REGISTRY_DIR, META_FILE, WEIGHTS_FILE, NPZ_FILE, TFLITE_FILE, resolve_version
+
+# Exports a registered model for the TensorFlow-free serving backends (INFERENCE_BACKEND=numpy|tflite)
+# and checks that the exported model reproduces the Keras reconstructions.
+parser = argparse.ArgumentParser(description='Export a registered LSTM autoencoder to lstm.npz / lstm.tflite.')
+parser.add_argument('--version', default='latest', help='Registry version to export')
+parser.add_argument('--registry-dir', default=REGISTRY_DIR)
+parser.add_argument('--tflite', action='store_true', help='Also convert the graph to lstm.tflite')
+parser.add_argument('--tolerance', type=float, default=1e-4, help='Max allowed absolute difference to Keras')
+parser.add_argument('--samples', type=int, default=256, help='Random windows used for the check')
+args = parser.parse_args()
+
+version = resolve_version(args.version, args.registry_dir)
+if version is None:
+    raise SystemExit("Model registry is empty. Run train_lstm.py first.")
+path = os.path.join(args.registry_dir, version)
+with open(os.path.join(path, META_FILE)) as f:
+    meta = json.load(f)
+
+model = build_lstm_autoencoder(meta['timesteps'], len(meta['features']), meta.get('lstm_units', LSTM_UNITS))
+model.load_weights(os.path.join(path, WEIGHTS_FILE))
+X = np.random.default_rng(42).random((args.samples, meta['timesteps'], len(meta['features'])), dtype=np.float32)
+
+exported = [('numpy', NumpyAutoencoder.load(export_npz(model, meta['timesteps'], os.path.join(path, NPZ_FILE))))]
+if args.tflite:
+    export_tflite(model, os.path.join(path, TFLITE_FILE))
+    exported.append(('tflite', TFLiteAutoencoder(os.path.join(path, TFLITE_FILE), meta['timesteps'])))
+
+failed = False
+for backend, runtime in exported:
+    diff = max_abs_diff(model, runtime, X)
+    ok = diff <= args.tolerance
+    failed = failed or not ok
+    print(f"{'✅' if ok else '❌'} {backend}: max |keras - {backend}| = {diff:.2e} (tolerance {args.tolerance:.0e})")
+
+if failed:
+    raise SystemExit(1)
+print(f"✅ Model {version} exported to {path}")
@@ -0,0 +1,14 @@
+import argparse
+from models import create_db_app
+from services.sensor_store import migrate_json_rows
+
+# Converts legacy sensor_data.raw_data JSON rows to columnar sensor_chunks.
+# Safe to re-run: only rows with storage_format='json' are converted.
+parser = argparse.ArgumentParser(description='Migrate JSON sensor data to columnar sensor_chunks.')
+parser.add_argument('--batch-size', type=int, default=50, help='Sensor data rows converted per commit')
+args = parser.parse_args()
+
+with create_db_app().app_context():
+    converted = migrate_json_rows(batch_size=args.batch_size)
+
+print(f"✅ {converted} sensor data rows migrated to sensor_chunks")
@@ -1,6 +1,11 @@
-from .db import db
+from .db import db, create_db_app
 from .user import User
 from .sessions import Sessions
 from .feedback import Feedback
 from .performance_metrics import PerformanceMetrics
 from .sensor_data import SensorData
+from .sensor_chunks import SensorChunk
+from .session_aggregates import SessionAggregates
+from .analysis_results import AnalysisResultChunk
+from .athlete_trends import AthleteTrend
+from .rep_summaries import RepSummary
@@ -0,0 +1,19 @@
+from models.db import db
+import uuid
+
+class AnalysisResultChunk(db.Model):
+    __tablename__ = 'analysis_results'
+    __table_args__ = (
+        db.UniqueConstraint('session', 'model_version', 'start_index', name='uq_analysis_results_session_version_start'),
+    )
+
+    id = db.Column(db.UUID, primary_key=True, default=uuid.uuid4)
+    session = db.Column(db.UUID, db.ForeignKey('sessions.id'), nullable=False, index=True)
+    model_version = db.Column(db.String(64), nullable=False)
+    start_index = db.Column(db.Integer, nullable=False)
+    n_windows = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f'<AnalysisResultChunk {self.session} {self.model_version} [{self.start_index}:{self.start_index + self.n_windows}]>'
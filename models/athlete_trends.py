@@ -0,0 +1,25 @@
+from models.db import db
+import uuid
+
+# Daily rollup of the performance metrics of an athlete's ended sessions, per lift type.
+# Sums are stored so days can be merged into weeks/months without reading the sessions.
+class AthleteTrend(db.Model):
+    __tablename__ = 'athlete_trends'
+    __table_args__ = (db.UniqueConstraint('athlete', 'lift_type', 'day', name='uq_athlete_trends_athlete_lift_day'),)
+
+    id = db.Column(db.UUID, primary_key=True, default=uuid.uuid4)
+    athlete = db.Column(db.UUID, db.ForeignKey('users.id'), nullable=False)
+    lift_type = db.Column(db.String(100), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+    balance_sum = db.Column(db.Float, nullable=False, default=0.0)
+    stability_sum = db.Column(db.Float, nullable=False, default=0.0)
+    injury_risk_sum = db.Column(db.Float, nullable=False, default=0.0)
+    injury_risk_max = db.Column(db.Float, nullable=False, default=0.0)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+    athlete_rel = db.relationship('User', foreign_keys=[athlete])
+
+    def __repr__(self):
+        return f'<AthleteTrend {self.athlete} {self.lift_type} {self.day}>'
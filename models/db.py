@@ -1,3 +1,17 @@
+import os
+from dotenv import load_dotenv
+from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
+
+
+# Flask app with only the database configured, for analysis workers and offline scripts.
+# Importing app.py would also start the job scheduler, the live ingestion and the model warm-up.
+def create_db_app(name=__name__):
+    load_dotenv()
+    app = Flask(name)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
@@ -5,7 +5,7 @@ class Feedback(db.Model):
     __tablename__ = 'feedback'
 
     id = db.Column(db.UUID, primary_key=True, default=uuid.uuid4)
-    session = db.Column(db.UUID, db.ForeignKey('sessions.id'))
+    session = db.Column(db.UUID, db.ForeignKey('sessions.id'), index=True)
     feedback_text = db.Column(db.String(500), nullable=False)
     metrics_id = db.Column(db.UUID, db.ForeignKey('performance_metrics.id'))
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
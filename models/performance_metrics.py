@@ -5,7 +5,7 @@ class PerformanceMetrics(db.Model):
     __tablename__ = 'performance_metrics'
 
     id = db.Column(db.UUID, primary_key=True, default=uuid.uuid4)
-    session = db.Column(db.UUID, db.ForeignKey('sessions.id'))
+    session = db.Column(db.UUID, db.ForeignKey('sessions.id'), index=True)
     balance_score = db.Column(db.Float, nullable=False)
     stability_score = db.Column(db.Float, nullable=False)
     injury_risk = db.Column(db.Float, nullable=False)
@@ -0,0 +1,25 @@
+from models.db import db
+import uuid
+
+# Per-rep summary of an analysed session (services/segmentation.py), cached per model version next to
+# the session's analysis results and deleted with them.
+class RepSummary(db.Model):
+    __tablename__ = 'rep_summaries'
+    __table_args__ = (
+        db.UniqueConstraint('session', 'model_version', 'start_index', name='uq_rep_summaries_session_version_start'),
+    )
+
+    id = db.Column(db.UUID, primary_key=True, default=uuid.uuid4)
+    session = db.Column(db.UUID, db.ForeignKey('sessions.id'), nullable=False, index=True)
+    model_version = db.Column(db.String(64), nullable=False)
+    start_index = db.Column(db.Integer, nullable=False)
+    stop_index = db.Column(db.Integer, nullable=False)
+    turnaround_index = db.Column(db.Integer, nullable=False)
+    windows = db.Column(db.Integer, nullable=False)
+    anomaly_count = db.Column(db.Integer, nullable=False, default=0)
+    max_mse = db.Column(db.Float, nullable=False)
+    phases = db.Column(db.JSON, nullable=False)  # {eccentric|concentric: {rows, anomalies, max_mse, mean_imbalance, min_core, rule_codes}}
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f'<RepSummary {self.session} {self.model_version} [{self.start_index}:{self.stop_index}]>'
@@ -0,0 +1,17 @@
+from models.db import db
+import uuid
+
+class SensorChunk(db.Model):
+    __tablename__ = 'sensor_chunks'
+    __table_args__ = (db.UniqueConstraint('session', 'start_index', name='uq_sensor_chunks_session_start'),)
+
+    id = db.Column(db.UUID, primary_key=True, default=uuid.uuid4)
+    session = db.Column(db.UUID, db.ForeignKey('sessions.id'), nullable=False, index=True)
+    sensor_data = db.Column(db.UUID, db.ForeignKey('sensor_data.id'), nullable=False)
+    start_index = db.Column(db.Integer, nullable=False)
+    n_samples = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f'<SensorChunk {self.session} [{self.start_index}:{self.start_index + self.n_samples}]>'
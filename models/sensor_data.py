@@ -6,8 +6,10 @@ class SensorData(db.Model):
 
     id = db.Column(db.UUID, primary_key=True, default=uuid.uuid4)
     athlete = db.Column(db.UUID, db.ForeignKey('users.id'))
-    session = db.Column(db.UUID, db.ForeignKey('sessions.id'), nullable=False)
-    raw_data = db.Column(db.JSON, nullable=False)
+    session = db.Column(db.UUID, db.ForeignKey('sessions.id'), nullable=False, index=True)
+    raw_data = db.Column(db.JSON, nullable=True)  # legacy row dicts, NULL once stored as sensor_chunks
+    storage_format = db.Column(db.String(20), nullable=False, default='columnar')
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
 
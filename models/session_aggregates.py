@@ -0,0 +1,24 @@
+from models.db import db
+import uuid
+
+class SessionAggregates(db.Model):
+    __tablename__ = 'session_aggregates'
+
+    id = db.Column(db.UUID, primary_key=True, default=uuid.uuid4)
+    session = db.Column(db.UUID, db.ForeignKey('sessions.id'), nullable=False, unique=True)
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    channel_stats = db.Column(db.JSON, nullable=False, default=dict)  # {channel: {count, mean, m2, min, max}}
+    imbalance_hist = db.Column(db.JSON, nullable=False, default=list)  # counts per IMBALANCE_BINS bucket
+    windows_scored = db.Column(db.Integer, nullable=False, default=0)
+    lstm_anomaly_count = db.Column(db.Integer, nullable=False, default=0)
+    iso_anomaly_count = db.Column(db.Integer, nullable=False, default=0)
+    svm_anomaly_count = db.Column(db.Integer, nullable=False, default=0)
+    anomaly_count = db.Column(db.Integer, nullable=False, default=0)
+    rep_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+    session_rel = db.relationship('Sessions', foreign_keys=[session])
+
+    def __repr__(self):
+        return f'<SessionAggregates {self.session}>'
@@ -3,9 +3,11 @@ import uuid
 
 class Sessions(db.Model):
     __tablename__ = 'sessions'
+    # Keyset pagination of an athlete's history: WHERE athlete = ? AND (started_at, id) < (?, ?) ORDER BY started_at DESC, id DESC
+    __table_args__ = (db.Index('ix_sessions_athlete_started', 'athlete', 'started_at', 'id'),)
 
     id = db.Column(db.UUID, primary_key=True, default=uuid.uuid4)
-    trainer = db.Column(db.UUID, db.ForeignKey('users.id'))
+    trainer = db.Column(db.UUID, db.ForeignKey('users.id'), index=True)
     athlete = db.Column(db.UUID, db.ForeignKey('users.id'))
     lift_type = db.Column(db.String(100), nullable=False)
     status = db.Column(db.String(20), nullable=False, default='ongoing')
@@ -18,6 +20,9 @@ class Sessions(db.Model):
     trainer_rel = db.relationship('User', foreign_keys=[trainer])
     athlete_rel = db.relationship('User', foreign_keys=[athlete])
     sensor_data_rel = db.relationship('SensorData', foreign_keys=[sensor_data_id])
+    # Report rows written when the session ends (one each); read-only, for joined loading
+    metrics_rel = db.relationship('PerformanceMetrics', foreign_keys='PerformanceMetrics.session', uselist=False, viewonly=True)
+    feedback_rel = db.relationship('Feedback', foreign_keys='Feedback.session', uselist=False, viewonly=True)
 
     def __repr__(self):
         return f'<Sessions {self.id}>'
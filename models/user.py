@@ -9,8 +9,8 @@ class User(db.Model):
     first_name = db.Column(db.String(100), nullable=False)
     last_name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    role = db.Column(db.String(50), nullable=False)
-    firebase_uid = db.Column(db.String(128), nullable=True)
+    role = db.Column(db.String(50), nullable=False, index=True)
+    firebase_uid = db.Column(db.String(128), nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
 
@@ -0,0 +1,9 @@
+from models import create_db_app
+from services.history import rebuild_rollups
+
+# Rebuilds the athlete_trends daily rollups from the stored performance metrics.
+# Needed once for sessions ended before the rollups existed; safe to re-run.
+with create_db_app().app_context():
+    rows = rebuild_rollups()
+
+print(f"✅ {rows} athlete trend rollups rebuilt")
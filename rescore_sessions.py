@@ -0,0 +1,50 @@
+import argparse
+from datetime import date
+from models import create_db_app
+from services.model_registry import REGISTRY_DIR
+from services.rescoring import RescoreFilters, rescore_sessions, PAGE_SIZE, STATE_FILE
+
+# Re-scores stored sessions with a registered model, e.g. after shipping a new version:
+# rebuilds the results cache and the anomaly counters and recomputes the performance metrics.
+# Interrupted runs resume from the state file (same version and filters); --restart starts over.
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-score stored sessions with a registered model.')
+    parser.add_argument('--version', default=None, help='Registry version (default: MODEL_VERSION or LATEST)')
+    parser.add_argument('--registry-dir', default=REGISTRY_DIR)
+    parser.add_argument('--athlete', default=None, help='Only sessions of this athlete id')
+    parser.add_argument('--lift-type', default=None, help='Only sessions of this lift type')
+    parser.add_argument('--since', type=date.fromisoformat, default=None, help='Only sessions started on or after YYYY-MM-DD')
+    parser.add_argument('--until', type=date.fromisoformat, default=None, help='Only sessions started on or before YYYY-MM-DD')
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes (default: CPU count, 1 = in process)')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help='Sessions read and committed per page')
+    parser.add_argument('--state-file', default=STATE_FILE, help='Progress file used to resume')
+    parser.add_argument('--restart', action='store_true', help='Ignore the state file and start over')
+    parser.add_argument('--dry-run', action='store_true', help='Score and report without writing anything')
+    args = parser.parse_args()
+
+    filters = RescoreFilters(athlete=args.athlete, lift_type=args.lift_type, since=args.since, until=args.until)
+    with create_db_app().app_context():
+        state = rescore_sessions(
+            filters,
+            version=args.version,
+            registry_dir=args.registry_dir,
+            jobs=args.jobs,
+            page_size=args.page_size,
+            state_path=args.state_file,
+            restart=args.restart,
+            dry_run=args.dry_run,
+        )
+
+    rate = state['done'] / state['seconds'] if state['seconds'] else 0.0
+    print(f"✅ {state['done']} sessions re-scored with {state['version']} in {state['seconds']:.1f}s ({rate:.1f} sessions/s)"
+          + (" [dry run, nothing written]" if args.dry_run else ""))
+    print(f"   anomalies: {state['anomalies_before']} -> {state['anomalies_after']}, "
+          f"metrics changed: {state['metrics_changed']}, too short: {state['skipped']}")
+    if state['failed']:
+        print(f"⚠️  {len(state['failed'])} sessions failed: {', '.join(state['failed'][:20])}")
+
+
+if __name__ == '__main__':
+    main()
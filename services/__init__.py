@@ -1,4 +1,26 @@
-from .analyze import run_analysis_realtime
-from .anomaly_detection import run_isolation_forest, run_oneclass_svm
-from .logic_rules import logical_check
-from .lstm_model import build_lstm_autoencoder
\ No newline at end of file
+import importlib
+
+# Public names of the services package, imported on first access.
+# Importing `services` (or one of its light submodules) therefore does not load pandas,
+# scikit-learn or TensorFlow; each stack is loaded the first time something needs it.
+_EXPORTS = {
+    'run_analysis_realtime': '.analyze',
+    'run_isolation_forest': '.anomaly_detection',
+    'run_oneclass_svm': '.anomaly_detection',
+    'AnomalyDetector': '.anomaly_detection',
+    'logical_check': '.logic_rules',
+    'build_lstm_autoencoder': '.lstm_model',
+    'StreamingAnalyzer': '.streaming',
+    'get_stream': '.streaming',
+    'close_stream': '.streaming',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
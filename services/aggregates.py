@@ -0,0 +1,163 @@
+import numpy as np
+from models import db, SessionAggregates
+
+# Running per-session aggregates.
+# Updated whenever samples are stored or an analysis finishes, so ending a session and
+# rendering its report only read one row instead of decoding the whole recording.
+# Channel means/variances are merged chunk by chunk (Chan et al. parallel variance).
+
+FEATURES = ['left_foot_pressure', 'right_foot_pressure', 'core_stability']
+# |left - right| buckets of the imbalance histogram (last bucket is open-ended)
+IMBALANCE_BINS = [0.0, 0.05, 0.1, 0.2, 0.3, 0.4, np.inf]
+ANALYSIS_COUNTERS = {
+    'windows': 'windows_scored',
+    'lstm_anomalies': 'lstm_anomaly_count',
+    'iso_anomalies': 'iso_anomaly_count',
+    'svm_anomalies': 'svm_anomaly_count',
+    'final_anomalies': 'anomaly_count',
+    'reps': 'rep_count',
+}
+
+
+# Returns the aggregates row of a session, creating an empty one if needed; the caller commits.
+def get_or_create(session_id):
+    aggregates = SessionAggregates.query.filter_by(session=session_id).first()
+    if aggregates is None:
+        aggregates = SessionAggregates(
+            session=session_id,
+            sample_count=0,
+            channel_stats={},
+            imbalance_hist=[0] * (len(IMBALANCE_BINS) - 1),
+            windows_scored=0,
+            lstm_anomaly_count=0,
+            iso_anomaly_count=0,
+            svm_anomaly_count=0,
+            anomaly_count=0,
+            rep_count=0,
+        )
+        db.session.add(aggregates)
+    return aggregates
+
+
+# Merges (count, mean, m2, min, max) of two parts of a channel.
+def _merge(a, b):
+    count = a['count'] + b['count']
+    delta = b['mean'] - a['mean']
+    return {
+        'count': count,
+        'mean': a['mean'] + delta * b['count'] / count,
+        'm2': a['m2'] + b['m2'] + delta * delta * a['count'] * b['count'] / count,
+        'min': min(a['min'], b['min']),
+        'max': max(a['max'], b['max']),
+    }
+
+
+# @return Stats of one chunk of a channel, None if it has no valid values.
+def _chunk_stats(values):
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return None
+    mean = float(values.mean())
+    return {
+        'count': int(len(values)),
+        'mean': mean,
+        'm2': float(np.sum((values - mean) ** 2)),
+        'min': float(values.min()),
+        'max': float(values.max()),
+    }
+
+
+# Adds newly stored samples to the session aggregates; the caller commits.
+# @param samples: Array of shape (n, 3) in FEATURES order.
+def add_samples(session_id, samples):
+    samples = np.asarray(samples, dtype=np.float64).reshape(-1, len(FEATURES))
+    aggregates = get_or_create(session_id)
+
+    channel_stats = dict(aggregates.channel_stats or {})
+    for i, feature in enumerate(FEATURES):
+        chunk = _chunk_stats(samples[:, i])
+        if chunk is None:
+            continue
+        channel_stats[feature] = _merge(channel_stats[feature], chunk) if feature in channel_stats else chunk
+
+    imbalance = np.abs(samples[:, 0] - samples[:, 1])
+    hist, _ = np.histogram(imbalance[~np.isnan(imbalance)], bins=IMBALANCE_BINS)
+    previous = aggregates.imbalance_hist or [0] * len(hist)
+
+    aggregates.channel_stats = channel_stats
+    aggregates.imbalance_hist = [int(a + b) for a, b in zip(previous, hist)]
+    aggregates.sample_count = (aggregates.sample_count or 0) + len(samples)
+    return aggregates
+
+
+# Recomputes the sample statistics of a session from all of its stored samples, e.g. after its storage was
+# migrated; the analysis counters are kept. The caller commits.
+# @param chunks: Iterable of (n, 3) sample arrays covering the whole session.
+def rebuild_samples(session_id, chunks):
+    aggregates = get_or_create(session_id)
+    aggregates.channel_stats = {}
+    aggregates.imbalance_hist = [0] * (len(IMBALANCE_BINS) - 1)
+    aggregates.sample_count = 0
+    for samples in chunks:
+        add_samples(session_id, samples)
+    return aggregates
+
+
+# Adds the counters of a finished analysis (see run_analysis_realtime's summary); the caller commits.
+# @param summary: Dict with windows, lstm_anomalies, iso_anomalies, svm_anomalies, final_anomalies
+#                 (and reps when the recording was segmented).
+def add_analysis(session_id, summary):
+    aggregates = get_or_create(session_id)
+    for key, column in ANALYSIS_COUNTERS.items():
+        setattr(aggregates, column, (getattr(aggregates, column) or 0) + int(summary.get(key, 0)))
+    return aggregates
+
+
+# Replaces the analysis counters of an aggregates row with those of a complete re-analysis
+# (batch re-scoring); the caller commits.
+def set_analysis(aggregates, summary):
+    for key, column in ANALYSIS_COUNTERS.items():
+        setattr(aggregates, column, int(summary.get(key, 0)))
+    return aggregates
+
+
+# Mean of each channel, or None for a channel without samples.
+def channel_means(aggregates):
+    stats = aggregates.channel_stats or {}
+    return [stats[f]['mean'] if f in stats else None for f in FEATURES]
+
+
+# Session performance report from the channel means.
+# A channel without valid samples (e.g. a sensor that only sent NaN) counts as 0, so the scores stay
+# defined and the missing sensor shows up as imbalance or low stability.
+# @return (balance_score, stability_score, injury_risk)
+def performance_scores(aggregates):
+    avg_left, avg_right, avg_core = (0.0 if mean is None else mean for mean in channel_means(aggregates))
+    balance_score = float(1 - abs(avg_left - avg_right))
+    stability_score = float(avg_core)
+    injury_risk = float(1 - (balance_score * stability_score))
+    return balance_score, stability_score, injury_risk
+
+
+# Readable per-channel summary (mean, std, min, max) for reports.
+def describe(aggregates):
+    described = {}
+    for feature, stats in (aggregates.channel_stats or {}).items():
+        described[feature] = {
+            'mean': stats['mean'],
+            'std': float(np.sqrt(stats['m2'] / stats['count'])),
+            'min': stats['min'],
+            'max': stats['max'],
+        }
+    return described
+
+
+# Counts analysis results for add_analysis.
+def summarize_flags(lstm, iso, svm, final):
+    return {
+        'windows': int(len(final)),
+        'lstm_anomalies': int(np.count_nonzero(lstm)),
+        'iso_anomalies': int(np.count_nonzero(iso)),
+        'svm_anomalies': int(np.count_nonzero(svm)),
+        'final_anomalies': int(np.count_nonzero(final)),
+    }
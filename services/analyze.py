@@ -1,73 +1,313 @@
 from models import db, SensorData, PerformanceMetrics, Feedback
+import logging
 import uuid
 import time
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-from services.lstm_model import build_lstm_autoencoder
+from services.lstm_runtime import predict_mse, lstm_units
 from services.anomaly_detection import run_isolation_forest, run_oneclass_svm
-from services.logic_rules import logical_check
-from utils.socket_logger import SocketIOCallback
+from services.logic_rules import evaluate_rules, render_alerts
+from services.model_registry import get_active_artifact
+from services.normalization import MinMaxNormalizer
+from services.emitter import BatchEmitter, pack_flags, EMIT_MODE
+from services.aggregates import summarize_flags
+from services.metrics import stage_timer
+from services.segmentation import RepSegmenter, RepTracker, runs, REP_SEGMENTATION
 
+logger = logging.getLogger(__name__)
 
-def run_analysis_realtime(session_id, df, socketio):
-    features = ['left_foot_pressure', 'right_foot_pressure', 'core_stability']
-    data_clean = df[features].dropna().reset_index(drop=True)
+FEATURES = ['left_foot_pressure', 'right_foot_pressure', 'core_stability']
+FINE_TUNE_EPOCHS = 5
 
-    scaler = MinMaxScaler()
-    scaled_data = scaler.fit_transform(data_clean)
 
-    timesteps = 10
-    if len(scaled_data) < timesteps:
-        socketio.emit('analysis_error', {'message': 'Not enough data for LSTM analysis.'}, room=session_id)
+# Runs the anomaly analysis for one uploaded recording and streams the results to the session room.
+# By default only inference is run with the registered model artifact; the recording is then
+# scaled, scored and emitted block by block, so memory is bounded by the block size.
+# @param df: DataFrame, array of shape (n, 3), or an iterable of such blocks (e.g. chunks read back from storage).
+# @param socketio: SocketIO server receiving the results, or None to only score (batch re-scoring).
+# @param artifact: ModelArtifact to use, defaults to the process-wide active artifact.
+# @param fine_tune: If True, a copy of the model is fine-tuned on this upload before scoring (opt-in).
+#                   Without a registered artifact the model is trained from scratch on the upload.
+# @param lift_type: Lift type whose logic rule thresholds are used.
+# @param cancel_event: Optional threading.Event; when set the analysis stops at the next stage boundary.
+# @param result_sink: Optional callable(start, left, right, core, mse, flags, rule_codes) receiving every scored
+#                     block (e.g. results_store.ResultWriter.write). Only used for inference with the registered
+#                     model; fine-tuned results come from a per-session model and are not passed on.
+# @param segment: Score only the windows of reps (services/segmentation.py), defaults to REP_SEGMENTATION.
+# @param rep_sink: Optional callable(reps) receiving the summaries of completed reps (e.g. ResultWriter.write_reps),
+#                  with the same restriction as result_sink.
+# @return Summary counters (windows and anomalies per detector, reps when segmented), None if the analysis did not finish.
+def run_analysis_realtime(session_id, df, socketio, artifact=None, fine_tune=False, lift_type=None, cancel_event=None,
+                          result_sink=None, segment=None, rep_sink=None):
+    artifact = artifact or get_active_artifact()
+    timesteps = artifact.timesteps if artifact else 10
+    emitter = BatchEmitter(socketio, session_id, cancel_event=cancel_event) if socketio is not None else None
+    segment = REP_SEGMENTATION if segment is None else segment
+
+    if artifact and not fine_tune:
+        summary = _analyze_blocks(session_id, _iter_blocks(df), socketio, emitter, artifact, lift_type, cancel_event,
+                                  result_sink, segment, rep_sink)
+    else:
+        summary = _analyze_with_training(session_id, df, socketio, emitter, artifact, lift_type, cancel_event, segment)
+    if summary is False:
+        return
+
+    if summary is None:
+        if socketio is not None:
+            socketio.emit('analysis_error', {'message': 'Not enough data for LSTM analysis.'}, room=session_id)
         return
 
-    X_lstm = np.array([scaled_data[i:i + timesteps] for i in range(len(scaled_data) - timesteps)])
+    if socketio is not None:
+        socketio.emit('analysis_complete', {'message': 'Analysis complete!'}, room=session_id)
+    return summary
+
+
+# Yields float32 (n, 3) blocks of the recording without NaN rows.
+def _iter_blocks(data):
+    if isinstance(data, (pd.DataFrame, np.ndarray)):
+        data = [data]
+    for block in data:
+        if isinstance(block, pd.DataFrame):
+            block = block[FEATURES].to_numpy(dtype=np.float32)
+        block = np.asarray(block, dtype=np.float32).reshape(-1, len(FEATURES))
+        block = block[~np.isnan(block).any(axis=1)]
+        if len(block):
+            yield block
+
+
+# Inference with the registered model, one block at a time.
+# The last `timesteps` scaled rows are carried into the next block, so every window is scored
+# exactly once and the results match scoring the whole recording at once.
+# When segmenting, the rows whose rep label is not known yet are carried as well and only the windows
+# starting inside a rep are predicted and scored.
+# @return Summary, None if there was not enough data, False if cancelled.
+def _analyze_blocks(session_id, blocks, socketio, emitter, artifact, lift_type, cancel_event, result_sink=None,
+                    segment=False, rep_sink=None):
+    timesteps = artifact.timesteps
+    detectors = (artifact.iso_detector, artifact.svm_detector) if artifact.iso_detector and artifact.svm_detector else None
+    segmenter = RepSegmenter() if segment else None
+    tracker = RepTracker() if segment else None
+    tail = np.empty((0, len(FEATURES)), dtype=np.float32)
+    tail_labels = np.empty(0, dtype=bool)
+    start = 0
+    summary = None
+
+    def score(data, labels, ready):
+        nonlocal summary
+        for a, b in runs(labels[:ready]) if segmenter else [(0, ready)]:
+            with stage_timer('lstm_predict'):
+                mse = predict_mse(artifact.model, data[a:b + timesteps], timesteps)
+            flags = _score_block(session_id, data[a:b + timesteps], mse, start + a, artifact.threshold, detectors,
+                                 lift_type, socketio, emitter, cancel_event, result_sink, tracker)
+            if flags is None:
+                return False
+            summary = _add_summary(summary, summarize_flags(*flags))
+        if tracker is not None and rep_sink is not None and tracker.closed:
+            rep_sink(tracker.take())
+        return True
+
+    for block in blocks:
+        # Registered models use the normalizer fitted on their training data, so MSE stays
+        # comparable to the stored threshold
+        with stage_timer('scaling'):
+            scaled = artifact.scaler.transform(block)
+        data = np.concatenate([tail, scaled]) if len(tail) else scaled
+        ready = len(data) - timesteps
+        labels = None
+        if segmenter:
+            with stage_timer('segmentation'):
+                labels = np.concatenate([tail_labels, segmenter.update(scaled)])
+            ready = min(ready, len(labels))
+        if ready <= 0:
+            tail, tail_labels = data, labels
+            continue
+
+        if not score(data, labels, ready):
+            return False
+        start += ready
+        tail = data[ready:]
+        tail_labels = labels[ready:] if segmenter else None
 
-    # Build and fit model directly here
-    model = build_lstm_autoencoder(timesteps, X_lstm.shape[2])
-    model.fit(
-    X_lstm, X_lstm,
-    epochs=30,
-    batch_size=32,
-    validation_split=0.1,
-    verbose=0,
-    callbacks=[SocketIOCallback(socketio, session_id)]
-)
+    if segmenter:
+        # Last rows, held back until their labels were final
+        labels = np.concatenate([tail_labels, segmenter.finish()])
+        if len(tail) > timesteps and not score(tail, labels, len(tail) - timesteps):
+            return False
+        tracker.close()
+        if rep_sink is not None and tracker.closed:
+            rep_sink(tracker.take())
+        if summary is None and start + len(tail) > timesteps:
+            # Enough data, but no rep in it
+            summary = summarize_flags(*([np.zeros(0, dtype=bool)] * 4))
+        if summary is not None:
+            summary['reps'] = tracker.count
+    return summary
 
 
-    X_pred = model.predict(X_lstm)
-    mse = np.mean(np.power(X_lstm - X_pred, 2), axis=(1, 2))
-    threshold = np.percentile(mse, 95)
+# Per-session training: fine-tune a copy of the registered model, or train from scratch.
+# Training needs the whole recording, so it is collected first. Fine-tuned models keep the threshold
+# calibrated on the model's reference data, so their flags stay comparable with other sessions; a model
+# trained from scratch has no reference data and uses the 95th MSE percentile of the upload.
+# @return Summary, None if there was not enough data, False if cancelled.
+def _analyze_with_training(session_id, df, socketio, emitter, artifact, lift_type, cancel_event, segment=False):
+    timesteps = artifact.timesteps if artifact else 10
+    blocks = list(_iter_blocks(df))
+    data_clean = np.concatenate(blocks) if blocks else np.empty((0, len(FEATURES)), dtype=np.float32)
+    if len(data_clean) <= timesteps:
+        return None
+
+    # Without a registered model the upload is scaled to itself
+    with stage_timer('scaling'):
+        if artifact:
+            scaled_data = artifact.scaler.transform(data_clean)
+        else:
+            scaled_data = MinMaxNormalizer().fit_transform(data_clean)
+
+    # TensorFlow is imported here only; inference alone runs on the exported runtime.
+    from services.lstm_model import build_lstm_autoencoder, fit_windows
+    from utils.socket_logger import SocketIOCallback
+    if artifact:
+        weights = artifact.model.get_weights()
+        model = build_lstm_autoencoder(timesteps, len(FEATURES), lstm_units(weights))
+        model.set_weights(weights)
+    else:
+        model = build_lstm_autoencoder(timesteps, len(FEATURES))
+        logger.warning(f"No registered model, training a session model for {session_id}")
+    with stage_timer('lstm_fit'):
+        fit_windows(
+            model, scaled_data, timesteps,
+            epochs=FINE_TUNE_EPOCHS if artifact else 30,
+            batch_size=32,
+            validation_split=0.1,
+            verbose=0,
+            callbacks=[SocketIOCallback(socketio, session_id, cancel_event)]
+        )
+    if _cancelled(cancel_event, socketio, session_id):
+        return False
+
+    # Detectors fitted once on reference data only score; older artifacts without them fall back to fit_predict
+    detectors = None
+    if artifact and artifact.iso_detector and artifact.svm_detector:
+        detectors = (artifact.iso_detector, artifact.svm_detector)
+    if not segment:
+        with stage_timer('lstm_predict'):
+            mse = predict_mse(model, scaled_data, timesteps)
+        threshold = artifact.threshold if artifact else np.percentile(mse, 95)
+        if _cancelled(cancel_event, socketio, session_id):
+            return False
+        flags = _score_block(session_id, scaled_data, mse, 0, threshold, detectors, lift_type, socketio, emitter, cancel_event)
+        if flags is None:
+            return False
+        return summarize_flags(*flags)
+
+    # Only the rep windows are scored; the session model's threshold then comes from the rep windows
+    with stage_timer('segmentation'):
+        segmenter = RepSegmenter()
+        labels = np.concatenate([segmenter.update(scaled_data), segmenter.finish()])
+    rep_runs = runs(labels[:len(scaled_data) - timesteps])
+    with stage_timer('lstm_predict'):
+        rep_mse = [predict_mse(model, scaled_data[a:b + timesteps], timesteps) for a, b in rep_runs]
+    threshold = artifact.threshold if artifact or not rep_runs else np.percentile(np.concatenate(rep_mse), 95)
+    if _cancelled(cancel_event, socketio, session_id):
+        return False
+    tracker = RepTracker()
+    summary = summarize_flags(*([np.zeros(0, dtype=bool)] * 4))
+    for (a, b), mse in zip(rep_runs, rep_mse):
+        flags = _score_block(session_id, scaled_data[a:b + timesteps], mse, a, threshold, detectors, lift_type, socketio,
+                             emitter, cancel_event, rep_tracker=tracker)
+        if flags is None:
+            return False
+        summary = _add_summary(summary, summarize_flags(*flags))
+    tracker.close()
+    summary['reps'] = tracker.count
+    return summary
+
+
+# Runs the classical detectors and the rules on one block and emits its rows.
+# @param data: Scaled rows; the rows data[:len(mse)] are reported, the rest only complete their windows.
+# @param mse: Reconstruction error of each reported row's window.
+# @param start: Index of data[0] in the cleaned recording.
+# @param detectors: (iso_detector, svm_detector) fitted on reference data, or None to fit_predict on the block.
+# @param result_sink: Optional callable receiving the block's results before they are emitted.
+# @param rep_tracker: Optional segmentation.RepTracker collecting the block's results per rep.
+# @return (lstm, iso, svm, final) anomaly arrays, None if the analysis was cancelled.
+def _score_block(session_id, data, mse, start, threshold, detectors, lift_type, socketio, emitter, cancel_event,
+                 result_sink=None, rep_tracker=None):
+    X_ml = data[:len(mse)]
     lstm_anomalies = mse > threshold
+    if _cancelled(cancel_event, socketio, session_id):
+        return None
+
+    if detectors:
+        with stage_timer('isolation_forest'):
+            iso_anomalies = detectors[0].predict(X_ml)
+        with stage_timer('oneclass_svm'):
+            svm_anomalies = detectors[1].predict(X_ml)
+    else:
+        with stage_timer('isolation_forest'):
+            iso_anomalies = run_isolation_forest(X_ml)
+        with stage_timer('oneclass_svm'):
+            svm_anomalies = run_oneclass_svm(X_ml)
+    final_anomalies = lstm_anomalies | (svm_anomalies & iso_anomalies)
 
-    X_ml = pd.DataFrame(scaled_data[:-timesteps], columns=features)
-    iso_anomalies = run_isolation_forest(X_ml)
-    svm_anomalies = run_oneclass_svm(X_ml)
+    left, right, core = X_ml[:, 0], X_ml[:, 1], X_ml[:, 2]
+    with stage_timer('rules'):
+        rule_codes = evaluate_rules(left, right, core, mse, threshold, lift_type)
+    flags = pack_flags(lstm_anomalies, iso_anomalies, svm_anomalies, final_anomalies)
+    if result_sink is not None:
+        with stage_timer('result_store'):
+            result_sink(start, left, right, core, mse, flags, rule_codes)
+    if rep_tracker is not None:
+        rep_tracker.add(start, left, right, core, mse, final_anomalies, rule_codes)
 
-    results = X_ml.copy()
-    results['LSTM_MSE'] = mse
-    results['LSTM_Anomaly'] = lstm_anomalies
-    results['ISO_Anomaly'] = iso_anomalies
-    results['SVM_Anomaly'] = svm_anomalies
-    results['Final_Anomaly'] = (results['LSTM_Anomaly'] | (results['SVM_Anomaly'] & results['ISO_Anomaly']))
+    if emitter is None:
+        return lstm_anomalies, iso_anomalies, svm_anomalies, final_anomalies
+    with stage_timer('emission'):
+        if EMIT_MODE == 'row':
+            delivered = _emit_rows(session_id, socketio, cancel_event, start + 1, left, right, core, mse,
+                                   lstm_anomalies, iso_anomalies, svm_anomalies, final_anomalies, rule_codes)
+        else:
+            delivered = emitter.emit_arrays(left, right, core, mse, flags, rule_codes, start_index=start + 1)
+    if not delivered:
+        _cancelled(cancel_event, socketio, session_id)
+        return None
+    return lstm_anomalies, iso_anomalies, svm_anomalies, final_anomalies
 
 
-    results['Logic_Alert'] = results.apply(lambda row: logical_check(row, threshold), axis=1)
+def _add_summary(total, summary):
+    if total is None:
+        return summary
+    return {key: total[key] + value for key, value in summary.items()}
 
-    for i, row in results.iterrows():
+
+# Legacy delivery: one datapoint_feedback event per row (EMIT_MODE=row).
+# @return False if the analysis was cancelled during delivery.
+def _emit_rows(session_id, socketio, cancel_event, start_index, left, right, core, mse, lstm, iso, svm, final, rule_codes):
+    for i in range(len(mse)):
+        if _cancelled(cancel_event, socketio, session_id):
+            return False
         socketio.emit('datapoint_feedback', {
-            'index': i + 1,
-            'left': float(row['left_foot_pressure']),
-            'right': float(row['right_foot_pressure']),
-            'core': float(row['core_stability']),
-            'mse': float(row['LSTM_MSE']),
-            'lstm_anomaly': bool(row['LSTM_Anomaly']),
-            'iso_anomaly': bool(row['ISO_Anomaly']),
-            'svm_anomaly': bool(row['SVM_Anomaly']),
-            'final_anomaly': bool(row['Final_Anomaly']),
-            'logic_alert': row['Logic_Alert'],
+            'index': start_index + i,
+            'left': float(left[i]),
+            'right': float(right[i]),
+            'core': float(core[i]),
+            'mse': float(mse[i]),
+            'lstm_anomaly': bool(lstm[i]),
+            'iso_anomaly': bool(iso[i]),
+            'svm_anomaly': bool(svm[i]),
+            'final_anomaly': bool(final[i]),
+            'rule_code': int(rule_codes[i]),
+            'logic_alert': render_alerts(int(rule_codes[i])),
         }, room=session_id)
         time.sleep(0.05)
+    return True
+
 
-    socketio.emit('analysis_complete', {'message': 'Analysis complete!'}, room=session_id)
+# Emits analysis_cancelled and returns True if the job was asked to stop.
+def _cancelled(cancel_event, socketio, session_id):
+    if cancel_event is None or not cancel_event.is_set():
+        return False
+    logger.info(f"Analysis cancelled for session {session_id}")
+    if socketio is not None:
+        socketio.emit('analysis_cancelled', {'message': 'Analysis cancelled.'}, room=session_id)
+    return True
@@ -1,5 +1,14 @@
-from sklearn.ensemble import IsolationForest
-from sklearn.svm import OneClassSVM
+import joblib
+import numpy as np
+
+# scikit-learn is imported inside the functions below so importing this module (e.g. by the
+# web app through the model registry) stays cheap until a detector is actually built.
+
+# OneClassSVM training is roughly quadratic in the number of rows, so reference data is subsampled.
+SVM_MAX_TRAIN_ROWS = 5000
+# Rows per decision_function call; bounds the kernel matrix of the SVM when scoring long recordings.
+SCORE_CHUNK_SIZE = 4096
+
 
 # @iso_anomalies = Anomaly scores from Isolation Forest.
 # @run_isolation_forest = Function to run Isolation Forest for anomaly detection.
@@ -8,6 +17,7 @@ from sklearn.svm import OneClassSVM
 # @preds = Anomaly predictions from the model.
 # @return = Boolean array indicating whether each sample is an anomaly (true) or not (false).
 def run_isolation_forest(X, contamination=0.01):
+    from sklearn.ensemble import IsolationForest
     model = IsolationForest(n_estimators=100, contamination=contamination, random_state=42)
     preds = model.fit_predict(X)
     return preds == -1
@@ -19,6 +29,71 @@ def run_isolation_forest(X, contamination=0.01):
 # @preds = Anomaly predictions from the model.
 # @return = Boolean array indicating whether each sample is an anomaly (true) or not (false).
 def run_oneclass_svm(X, nu=0.01):
+    from sklearn.svm import OneClassSVM
     model = OneClassSVM(kernel='rbf', nu=nu, gamma='auto')
     preds = model.fit_predict(X)
-    return preds == -1
\ No newline at end of file
+    return preds == -1
+
+
+# Fit-once, score-many wrapper around IsolationForest / OneClassSVM.
+# The detector is fitted on reference data, saved to disk and afterwards only used for scoring,
+# which works on any number of rows (a whole recording or a streaming chunk).
+# @kind = 'isolation_forest' or 'oneclass_svm'.
+# @estimator = Underlying scikit-learn model.
+# @max_train_rows = Rows used for fitting at most (random subsample), None for all rows.
+class AnomalyDetector:
+    def __init__(self, kind, estimator, max_train_rows=None):
+        self.kind = kind
+        self.estimator = estimator
+        self.max_train_rows = max_train_rows
+        self.fitted = False
+
+    @classmethod
+    def isolation_forest(cls, contamination=0.01):
+        from sklearn.ensemble import IsolationForest
+        return cls('isolation_forest', IsolationForest(n_estimators=100, contamination=contamination, random_state=42))
+
+    @classmethod
+    def oneclass_svm(cls, nu=0.01, max_train_rows=SVM_MAX_TRAIN_ROWS):
+        from sklearn.svm import OneClassSVM
+        return cls('oneclass_svm', OneClassSVM(kernel='rbf', nu=nu, gamma='auto'), max_train_rows)
+
+    # Fits the detector on reference (normal) data.
+    def fit(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.max_train_rows and len(X) > self.max_train_rows:
+            rows = np.random.default_rng(42).choice(len(X), self.max_train_rows, replace=False)
+            X = X[rows]
+        self.estimator.fit(X)
+        self.fitted = True
+        return self
+
+    # @return decision_function values (negative = anomaly), scored in chunks.
+    def score(self, X, chunk_size=SCORE_CHUNK_SIZE):
+        X = np.asarray(X, dtype=np.float64)
+        scores = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), chunk_size):
+            scores[start:start + chunk_size] = self.estimator.decision_function(X[start:start + chunk_size])
+        return scores
+
+    # @return Boolean array, True where the sample is an anomaly.
+    def predict(self, X, chunk_size=SCORE_CHUNK_SIZE):
+        if len(X) == 0:
+            return np.zeros(0, dtype=bool)
+        return self.score(X, chunk_size) < 0
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+    def __repr__(self):
+        return f'<AnomalyDetector {self.kind} fitted={self.fitted}>'
+
+
+# Fits both classical detectors on scaled reference data.
+# @return (isolation_forest_detector, oneclass_svm_detector)
+def fit_reference_detectors(X):
+    return AnomalyDetector.isolation_forest().fit(X), AnomalyDetector.oneclass_svm().fit(X)
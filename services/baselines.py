@@ -0,0 +1,316 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import numpy as np
+from models import db, Sessions
+from services import sensor_store
+from services.anomaly_detection import AnomalyDetector, fit_reference_detectors
+from services.lstm_runtime import NumpyAutoencoder, predict_mse, lstm_units
+from services.quantiles import calibrate_threshold
+from services.model_registry import ModelArtifact, get_active_artifact, active_version, ISO_FILE, SVM_FILE, NPZ_FILE, META_FILE
+
+logger = logging.getLogger(__name__)
+
+# Per-athlete baselines.
+# A baseline adapts the registered model to one athlete and lift type, learned from the athlete's
+# ended sessions: an MSE threshold calibrated on their recordings, Isolation Forest / One-Class SVM
+# fitted on their samples and, optionally, LSTM weights fine-tuned on them (build_baselines.py).
+# Samples are scaled with the model's normalizer, so the LSTM and the logic rules see the value
+# range they were calibrated on and only the notion of "normal" becomes the athlete's own.
+#
+#   models/baselines/<model version>/<athlete>/<lift type>/meta.json, iso_forest.joblib, oneclass_svm.joblib
+#                                                          lstm.npz (fine-tuned baselines only)
+#
+# Baselines belong to a model version, so registering a new model falls back to it until they are rebuilt.
+# Loaded baselines are kept in an LRU cache bounded by memory; a returning athlete is scored without
+# training or loading, and a rebuilt baseline replaces the cached one within BASELINE_RECHECK_SECONDS.
+# A baseline's results are cached under its own version ("<model>+bl-<id>").
+#
+# ATHLETE_BASELINES = 'on' (default) or 'off'
+# BASELINE_DIR = Root folder of the baselines
+# BASELINE_CACHE_MB = Memory budget of the loaded baselines (approximate, from their file sizes)
+
+ATHLETE_BASELINES = os.getenv('ATHLETE_BASELINES', 'on').lower() not in ('0', 'off', 'false', 'no')
+BASELINE_DIR = os.getenv('BASELINE_DIR', os.path.join('models', 'baselines'))
+BASELINE_CACHE_MB = float(os.getenv('BASELINE_CACHE_MB', '256'))
+# Seconds a cached (or missing) baseline is trusted before its files are checked for changes again
+BASELINE_RECHECK_SECONDS = 30
+BASELINE_MAX_SESSIONS = 50
+# Newest samples used to build a baseline
+BASELINE_MAX_ROWS = 200000
+# Windows of history needed before a baseline is built
+BASELINE_MIN_WINDOWS = 2000
+DETECTOR_SAMPLE_ROWS = 50000
+
+
+def _slug(value):
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', str(value))
+
+
+# Folder of a baseline.
+def baseline_path(base_version, athlete_id, lift_type, baseline_dir=BASELINE_DIR):
+    return os.path.join(baseline_dir, _slug(base_version), _slug(athlete_id), _slug(lift_type))
+
+
+def baseline_version(base_version, meta):
+    return f"{base_version}+bl-{meta['baseline_id']}"
+
+
+# LRU cache of loaded baselines with a memory budget.
+# Entries are (artifact or None, size in bytes, recheck time, stamp); None remembers a missing baseline.
+# Every BASELINE_RECHECK_SECONDS an entry is compared with the stamp of its files on disk (meta.json
+# mtime), so a baseline rebuilt, added or removed by another process is picked up by a running server.
+class BaselineCache:
+    def __init__(self, max_bytes=BASELINE_CACHE_MB * 1024 * 1024, recheck_seconds=BASELINE_RECHECK_SECONDS,
+                 clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.recheck_seconds = recheck_seconds
+        self.clock = clock
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # @param stamp: Callable returning the current stamp of the key's files, called when the entry is due
+    #               for a recheck; without it a due entry is reloaded.
+    # @return (found, artifact); found is False when the key has to be loaded.
+    def get(self, key, stamp=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < self.clock():
+                if stamp is not None and stamp() == entry[3]:
+                    entry = (entry[0], entry[1], self.clock() + self.recheck_seconds, entry[3])
+                    self._entries[key] = entry
+                else:
+                    self._pop(key)
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    # @param stamp: Stamp of the key's files when the artifact was loaded (None if they do not exist).
+    def put(self, key, artifact, size=0, stamp=None):
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (artifact, size, self.clock() + self.recheck_seconds, stamp)
+            self.size += size
+            # Least recently used baselines are dropped first; the newest one always stays
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self.size = 0
+            else:
+                self._pop(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+cache = BaselineCache()
+
+
+# Stamp of a baseline's files: mtime of its meta.json (written last and swapped in with the baseline),
+# None if there is no baseline.
+def baseline_stamp(path):
+    try:
+        return os.stat(os.path.join(path, META_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+# Reads a baseline from disk on top of its model artifact.
+# @return (ModelArtifact, approximate size in bytes), or (None, 0) if there is no baseline.
+def load_baseline(base, athlete_id, lift_type, baseline_dir=BASELINE_DIR):
+    path = baseline_path(base.version, athlete_id, lift_type, baseline_dir)
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.isfile(meta_path):
+        return None, 0
+    with open(meta_path) as f:
+        meta = json.load(f)
+
+    size = 0
+    model = base.model
+    npz_path = os.path.join(path, NPZ_FILE)
+    if os.path.isfile(npz_path):
+        model = NumpyAutoencoder.load(npz_path)
+        size += sum(w.nbytes for w in model.weights)
+    detectors = []
+    for name in (ISO_FILE, SVM_FILE):
+        detector_path = os.path.join(path, name)
+        detectors.append(AnomalyDetector.load(detector_path) if os.path.isfile(detector_path) else None)
+        size += os.path.getsize(detector_path) if os.path.isfile(detector_path) else 0
+
+    artifact = ModelArtifact(
+        version=baseline_version(base.version, meta),
+        model=model,
+        scaler=base.scaler,
+        threshold=meta['threshold'],
+        timesteps=base.timesteps,
+        features=base.features,
+        path=path,
+        meta=meta,
+        iso_detector=detectors[0] or base.iso_detector,
+        svm_detector=detectors[1] or base.svm_detector,
+    )
+    logger.info(f"Baseline loaded for athlete {athlete_id} ({lift_type}): {artifact}")
+    return artifact, size
+
+
+# Artifact to score an athlete's session with: their baseline for the lift type, else the model artifact.
+# @param base: Model artifact the baseline must belong to, defaults to the served one.
+# @return ModelArtifact, or None if the registry is empty.
+def artifact_for(athlete_id, lift_type, base=None, baseline_dir=BASELINE_DIR):
+    base = base or get_active_artifact()
+    if base is None or not ATHLETE_BASELINES or not athlete_id or not lift_type:
+        return base
+    key = (base.version, str(athlete_id), lift_type)
+    path = baseline_path(base.version, athlete_id, lift_type, baseline_dir)
+    found, artifact = cache.get(key, lambda: baseline_stamp(path))
+    if not found:
+        stamp = baseline_stamp(path)
+        try:
+            artifact, size = load_baseline(base, athlete_id, lift_type, baseline_dir)
+        except Exception as e:
+            logger.warning(f"Could not load the baseline of athlete {athlete_id} ({lift_type}): {str(e)}")
+            artifact, size = None, 0
+        cache.put(key, artifact, size, stamp)
+    return artifact or base
+
+
+# Version an athlete's sessions are scored with, without loading the baseline.
+def version_for(athlete_id, lift_type, baseline_dir=BASELINE_DIR):
+    base_version = active_version()
+    if base_version is None or not ATHLETE_BASELINES or not athlete_id or not lift_type:
+        return base_version
+    path = baseline_path(base_version, athlete_id, lift_type, baseline_dir)
+    found, artifact = cache.get((base_version, str(athlete_id), lift_type), lambda: baseline_stamp(path))
+    if found:
+        return artifact.version if artifact else base_version
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.isfile(meta_path):
+        return base_version
+    with open(meta_path) as f:
+        return baseline_version(base_version, json.load(f))
+
+
+# Scaled, NaN-free samples of the athlete's newest ended sessions of a lift type, one array per session,
+# oldest first, at most max_rows samples in total.
+def athlete_history(base, athlete_id, lift_type, max_sessions=BASELINE_MAX_SESSIONS, max_rows=BASELINE_MAX_ROWS):
+    session_ids = [
+        row.id for row in
+        Sessions.query.with_entities(Sessions.id)
+        .filter(Sessions.athlete == athlete_id, Sessions.lift_type == lift_type, Sessions.status == 'ended')
+        .order_by(Sessions.started_at.desc(), Sessions.id.desc())
+        .limit(max_sessions)
+    ]
+    parts, rows = [], 0
+    for session_id in session_ids:
+        samples = sensor_store.read_samples(session_id)
+        samples = samples[~np.isnan(samples).any(axis=1)][-(max_rows - rows):]
+        if len(samples) > base.timesteps:
+            parts.append(base.scaler.transform(samples))
+            rows += len(samples)
+        if rows >= max_rows:
+            break
+    return parts[::-1], len(session_ids)
+
+
+# Learns and saves the baseline of an athlete for a lift type. Needs an app context.
+# @param base: Model artifact the baseline adapts.
+# @param fine_tune_epochs: Epochs the LSTM is fine-tuned on the athlete's windows (needs TensorFlow), 0 keeps its weights.
+# @param percentile: MSE percentile of the athlete's windows used as threshold.
+# @return Folder of the baseline, or None if the athlete has fewer than min_windows windows of history.
+def build_baseline(athlete_id, lift_type, base, baseline_dir=BASELINE_DIR, max_sessions=BASELINE_MAX_SESSIONS,
+                   max_rows=BASELINE_MAX_ROWS, min_windows=BASELINE_MIN_WINDOWS, percentile=95, fine_tune_epochs=0):
+    timesteps = base.timesteps
+    parts, n_sessions = athlete_history(base, athlete_id, lift_type, max_sessions, max_rows)
+    n_windows = sum(len(part) - timesteps for part in parts)
+    if n_windows < min_windows:
+        logger.info(f"Not enough history for a baseline of athlete {athlete_id} ({lift_type}): {n_windows} windows")
+        return None
+
+    model = base.model
+    if fine_tune_epochs:
+        # TensorFlow is imported for fine-tuning only; windows never span two sessions
+        from services.lstm_model import build_lstm_autoencoder, WindowSequence
+        from utils.windowing import sliding_windows
+        weights = base.model.get_weights()
+        model = build_lstm_autoencoder(timesteps, base.n_features, lstm_units(weights))
+        model.set_weights(weights)
+        windows = np.concatenate([sliding_windows(part, timesteps) for part in parts])
+        model.fit(WindowSequence(windows, shuffle=True), epochs=fine_tune_epochs, verbose=0)
+
+    calibration = calibrate_threshold((predict_mse(model, part, timesteps) for part in parts), percentile)
+    threshold = calibration.value
+    rows = np.concatenate(parts)
+    iso_detector, svm_detector = fit_reference_detectors(rows[::max(1, -(-len(rows) // DETECTOR_SAMPLE_ROWS))])
+
+    # Written next to the old baseline and swapped in, so a loading process never sees half a baseline
+    path = baseline_path(base.version, athlete_id, lift_type, baseline_dir)
+    staging = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    if fine_tune_epochs:
+        NumpyAutoencoder(model.get_weights(), timesteps).save(os.path.join(staging, NPZ_FILE))
+    iso_detector.save(os.path.join(staging, ISO_FILE))
+    svm_detector.save(os.path.join(staging, SVM_FILE))
+    meta = {
+        'baseline_id': time.strftime('%Y%m%d%H%M%S'),
+        'base_version': base.version,
+        'athlete': str(athlete_id),
+        'lift_type': lift_type,
+        'threshold': threshold,
+        'threshold_percentile': percentile,
+        'threshold_calibration': calibration.to_dict(),
+        'base_threshold': base.threshold,
+        'sessions': n_sessions,
+        'samples': int(len(rows)),
+        'windows': int(n_windows),
+        'fine_tune_epochs': fine_tune_epochs,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    with open(os.path.join(staging, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    if os.path.isdir(path):
+        shutil.rmtree(f"{path}.old", ignore_errors=True)
+        os.replace(path, f"{path}.old")
+    os.replace(staging, path)
+    shutil.rmtree(f"{path}.old", ignore_errors=True)
+
+    cache.invalidate((base.version, str(athlete_id), lift_type))
+    logger.info(f"Baseline saved for athlete {athlete_id} ({lift_type}): threshold={threshold:.6f} "
+                f"(model {base.threshold:.6f}), {n_windows} windows from {n_sessions} sessions")
+    return path
+
+
+# (athlete, lift type) pairs with ended sessions, optionally of one athlete or lift type.
+def baseline_candidates(athlete_id=None, lift_type=None):
+    query = (
+        db.session.query(Sessions.athlete, Sessions.lift_type)
+        .filter(Sessions.athlete.isnot(None), Sessions.status == 'ended')
+    )
+    if athlete_id:
+        query = query.filter(Sessions.athlete == uuid.UUID(str(athlete_id)))
+    if lift_type:
+        query = query.filter(Sessions.lift_type == lift_type)
+    return query.distinct().all()
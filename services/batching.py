@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Shared micro-batching inference for live sessions.
+# Every StreamingAnalyzer hands its completed windows to one InferenceBatcher instead of calling
+# model.predict itself. A worker thread collects the pending windows of all sessions, runs one
+# forward pass per batch and returns each session its slice of per-window MSE values, so many
+# concurrent athletes share large, vectorized batches instead of running many tiny ones.
+#
+# INFERENCE_BATCHING = Use the shared batcher for live sessions (default true)
+# INFERENCE_MAX_BATCH = Max windows per forward pass
+# INFERENCE_MAX_LATENCY_MS = Max time the oldest pending request waits for the batch to fill
+
+INFERENCE_BATCHING = os.getenv('INFERENCE_BATCHING', 'true').lower() in ('1', 'true', 'yes')
+INFERENCE_MAX_BATCH = int(os.getenv('INFERENCE_MAX_BATCH', '1024'))
+INFERENCE_MAX_LATENCY_MS = float(os.getenv('INFERENCE_MAX_LATENCY_MS', '5'))
+
+
+# Windows of one session waiting to be scored.
+class _Request:
+    def __init__(self, model, windows):
+        self.model = model
+        self.windows = windows
+        self.created_at = time.monotonic()
+        self.done = threading.Event()
+        self.mse = None
+        self.error = None
+
+
+# @max_batch_size = Max windows per forward pass (a single larger request still runs alone).
+# @max_latency_ms = Max wait of the oldest request before a partial batch is run.
+class InferenceBatcher:
+    def __init__(self, max_batch_size=INFERENCE_MAX_BATCH, max_latency_ms=INFERENCE_MAX_LATENCY_MS):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_latency = max_latency_ms / 1000.0
+        self._pending = deque()
+        self._pending_windows = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._worker = None
+        self.batches_run = 0
+        self.windows_scored = 0
+
+    @property
+    def pending_count(self):
+        return self._pending_windows
+
+    # Queues windows for scoring.
+    # @param model: Model used for the forward pass; only requests with the same model share a batch.
+    # @param windows: Array of shape (n, timesteps, features).
+    # @return _Request whose `done` event is set once `mse` (or `error`) is available.
+    def submit(self, model, windows):
+        request = _Request(model, np.ascontiguousarray(windows, dtype=np.float32))
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Inference batcher is closed")
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+                self._worker.start()
+            self._pending.append(request)
+            self._pending_windows += len(request.windows)
+            self._cond.notify()
+        return request
+
+    # Scores windows through the shared batch and blocks until the result is ready.
+    # @return 1D array with the MSE of each window.
+    def score(self, model, windows, timeout=None):
+        request = self.submit(model, windows)
+        if not request.done.wait(timeout):
+            raise TimeoutError("Inference batch timed out")
+        if request.error is not None:
+            raise request.error
+        return request.mse
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        return {
+            'batches': self.batches_run,
+            'windows': self.windows_scored,
+            'avg_batch_size': self.windows_scored / self.batches_run if self.batches_run else 0.0,
+            'pending_windows': self._pending_windows,
+        }
+
+    # Waits until the batch is full or the oldest request reached max_latency, then takes
+    # the requests of the oldest request's model up to max_batch_size windows.
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            deadline = self._pending[0].created_at + self.max_latency
+            while self._pending_windows < self.max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            model = self._pending[0].model
+            batch, kept, size = [], deque(), 0
+            while self._pending:
+                request = self._pending.popleft()
+                if request.model is model and (not batch or size + len(request.windows) <= self.max_batch_size):
+                    batch.append(request)
+                    size += len(request.windows)
+                else:
+                    kept.append(request)
+            self._pending = kept
+            self._pending_windows -= size
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                X = batch[0].windows if len(batch) == 1 else np.concatenate([r.windows for r in batch])
+                X_pred = batch[0].model.predict(X, verbose=0)
+                mse = np.mean(np.power(X - X_pred, 2), axis=(1, 2))
+                offset = 0
+                for request in batch:
+                    request.mse = mse[offset:offset + len(request.windows)]
+                    offset += len(request.windows)
+                self.batches_run += 1
+                self.windows_scored += len(X)
+            except Exception as e:
+                logger.error(f"Inference batch failed: {str(e)}", exc_info=True)
+                for request in batch:
+                    request.error = e
+            for request in batch:
+                request.done.set()
+
+
+# Process-wide batcher shared by all live sessions.
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = InferenceBatcher()
+        return _batcher
@@ -0,0 +1,114 @@
+import os
+import time
+import numpy as np
+from services.logic_rules import RULE_MESSAGES, NORMAL_MESSAGE
+
+# Batched delivery of analysis results over Socket.IO.
+# Results are sent as columnar chunks ('datapoint_batch' events) at a fixed frame rate
+# instead of one 'datapoint_feedback' event per row.
+#
+# EMIT_MODE = 'batch' (default) or 'row' (legacy per-row events)
+# EMIT_CHUNK_SIZE = Rows per chunk
+# EMIT_FPS = Chunks per second, 0 sends as fast as possible
+# EMIT_BINARY = Send chunks as one packed binary buffer instead of JSON arrays
+
+EMIT_MODE = os.getenv('EMIT_MODE', 'batch')
+EMIT_CHUNK_SIZE = int(os.getenv('EMIT_CHUNK_SIZE', '256'))
+EMIT_FPS = float(os.getenv('EMIT_FPS', '10'))
+EMIT_BINARY = os.getenv('EMIT_BINARY', 'false').lower() in ('1', 'true', 'yes')
+
+# Detector flag bits of the `flags` column
+FLAG_LSTM = 1 << 0
+FLAG_ISO = 1 << 1
+FLAG_SVM = 1 << 2
+FLAG_FINAL = 1 << 3
+
+
+# Packs the detector outputs into one uint8 per row.
+def pack_flags(lstm, iso, svm, final):
+    flags = np.zeros(len(lstm), dtype=np.uint8)
+    flags |= np.where(lstm, FLAG_LSTM, 0).astype(np.uint8)
+    flags |= np.where(iso, FLAG_ISO, 0).astype(np.uint8)
+    flags |= np.where(svm, FLAG_SVM, 0).astype(np.uint8)
+    flags |= np.where(final, FLAG_FINAL, 0).astype(np.uint8)
+    return flags
+
+
+# Builds one 'datapoint_batch' payload.
+# JSON layout: {start, count, left: [...], right: [...], core: [...], mse: [...], flags: [...], rule_codes: [...]}
+# Binary layout: {start, count, encoding: 'binary', data} where data is little-endian
+#   float32 left[count], right[count], core[count], mse[count], uint8 flags[count], uint8 rule_codes[count]
+# @param start: 1-based index of the first row in the chunk.
+def encode_batch(start, left, right, core, mse, flags, rule_codes, binary=False):
+    count = len(left)
+    if binary:
+        floats = np.stack([left, right, core, mse]).astype('<f4')
+        data = floats.tobytes() + np.asarray(flags, dtype=np.uint8).tobytes() + np.asarray(rule_codes, dtype=np.uint8).tobytes()
+        return {'start': int(start), 'count': count, 'encoding': 'binary', 'data': data}
+
+    def column(values):
+        return np.round(np.asarray(values, dtype=np.float64), 6).tolist()
+
+    return {
+        'start': int(start),
+        'count': count,
+        'left': column(left),
+        'right': column(right),
+        'core': column(core),
+        'mse': column(mse),
+        'flags': np.asarray(flags, dtype=np.uint8).tolist(),
+        'rule_codes': np.asarray(rule_codes, dtype=np.uint8).tolist(),
+    }
+
+
+# Legend sent once before the chunks so the client can render flags and rule codes.
+def legend():
+    return {
+        'flags': {'lstm': FLAG_LSTM, 'iso': FLAG_ISO, 'svm': FLAG_SVM, 'final': FLAG_FINAL},
+        'rules': [[bit, message] for bit, message in RULE_MESSAGES],
+        'normal': NORMAL_MESSAGE,
+    }
+
+
+# Sends result columns to a room in chunks at a fixed frame rate.
+# @socketio = SocketIO server (or message-queue emitter).
+# @room = Session room receiving the events.
+# @cancel_event = Optional threading.Event that stops the delivery between chunks.
+class BatchEmitter:
+    def __init__(self, socketio, room, chunk_size=EMIT_CHUNK_SIZE, fps=EMIT_FPS, binary=EMIT_BINARY, cancel_event=None):
+        self.socketio = socketio
+        self.room = room
+        self.chunk_size = max(1, chunk_size)
+        self.fps = fps
+        self.binary = binary
+        self.cancel_event = cancel_event
+        self.legend_sent = False
+
+    # Sends one block of rows; may be called repeatedly for a recording analysed block by block.
+    # The legend is sent before the first block only.
+    # @param start_index: 1-based index of the first row of the block in the recording.
+    # @return False if the delivery was cancelled, True otherwise.
+    def emit_arrays(self, left, right, core, mse, flags, rule_codes, start_index=1):
+        if not self.legend_sent:
+            self.socketio.emit('analysis_legend', legend(), room=self.room)
+            self.legend_sent = True
+        interval = 1.0 / self.fps if self.fps > 0 else 0
+        next_frame = time.monotonic()
+
+        for start in range(0, len(left), self.chunk_size):
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                return False
+            stop = start + self.chunk_size
+            self.socketio.emit('datapoint_batch', encode_batch(
+                start_index + start,
+                left[start:stop], right[start:stop], core[start:stop], mse[start:stop],
+                flags[start:stop], rule_codes[start:stop],
+                binary=self.binary,
+            ), room=self.room)
+
+            if interval and stop < len(left):
+                next_frame += interval
+                delay = next_frame - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+        return True
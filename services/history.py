@@ -0,0 +1,183 @@
+import base64
+import uuid
+from datetime import date, datetime, timedelta
+from sqlalchemy.orm import joinedload
+from models import db, Sessions, PerformanceMetrics, AthleteTrend
+
+# Athlete history queries.
+# Session lists are paginated by keyset on (started_at, id), newest first, using the
+# ix_sessions_athlete_started index, so a page costs the same however long the history is.
+# Each page loads its sessions with their PerformanceMetrics and Feedback in one joined query.
+# Trends are read from athlete_trends daily rollups, updated when a session ends.
+
+SESSION_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+TREND_PERIODS = ('day', 'week', 'month')
+
+
+# Opaque cursor pointing after a session.
+def encode_cursor(session_obj):
+    raw = f"{session_obj.started_at.isoformat()}|{session_obj.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+# @return (started_at, session id)
+# @raise ValueError on a malformed cursor.
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        started_at, session_id = raw.split('|')
+        return datetime.fromisoformat(started_at), uuid.UUID(session_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+# True if the user is the trainer of at least one of the athlete's sessions.
+def trains_athlete(trainer_id, athlete_id):
+    return db.session.query(
+        Sessions.query.filter(Sessions.athlete == athlete_id, Sessions.trainer == trainer_id).exists()
+    ).scalar()
+
+
+# One page of an athlete's sessions, newest first, with metrics_rel and feedback_rel loaded.
+# @param cursor: next_cursor of the previous page, None for the first page.
+# @param trainer_id: Only the sessions of this trainer (a trainer viewing an athlete), all if None.
+# @return (sessions, next_cursor); next_cursor is None on the last page.
+def athlete_sessions(athlete_id, limit=SESSION_PAGE_SIZE, cursor=None, trainer_id=None):
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = (
+        Sessions.query
+        .options(joinedload(Sessions.metrics_rel), joinedload(Sessions.feedback_rel))
+        .filter(Sessions.athlete == athlete_id)
+    )
+    if trainer_id is not None:
+        query = query.filter(Sessions.trainer == trainer_id)
+    if cursor:
+        started_at, session_id = decode_cursor(cursor)
+        query = query.filter(db.tuple_(Sessions.started_at, Sessions.id) < (started_at, session_id))
+    # One extra row tells whether there is a next page
+    rows = query.order_by(Sessions.started_at.desc(), Sessions.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+# Session with its metrics and feedback loaded in the same query.
+def session_with_report(session_id):
+    return (
+        Sessions.query
+        .options(joinedload(Sessions.metrics_rel), joinedload(Sessions.feedback_rel))
+        .filter(Sessions.id == session_id)
+        .first()
+    )
+
+
+def _get_or_create_rollup(athlete_id, lift_type, day):
+    rollup = AthleteTrend.query.filter_by(athlete=athlete_id, lift_type=lift_type, day=day).first()
+    if rollup is None:
+        rollup = AthleteTrend(
+            athlete=athlete_id,
+            lift_type=lift_type,
+            day=day,
+            session_count=0,
+            balance_sum=0.0,
+            stability_sum=0.0,
+            injury_risk_sum=0.0,
+            injury_risk_max=0.0,
+        )
+        db.session.add(rollup)
+    return rollup
+
+
+# Adds the metrics of an ended session to its athlete's daily rollup; the caller commits.
+def add_to_rollup(session_obj, perf_metrics):
+    if session_obj.athlete is None:
+        return
+    day = session_obj.started_at.date() if session_obj.started_at else date.today()
+    rollup = _get_or_create_rollup(session_obj.athlete, session_obj.lift_type, day)
+    rollup.session_count += 1
+    rollup.balance_sum += perf_metrics.balance_score
+    rollup.stability_sum += perf_metrics.stability_score
+    rollup.injury_risk_sum += perf_metrics.injury_risk
+    rollup.injury_risk_max = max(rollup.injury_risk_max, perf_metrics.injury_risk)
+
+
+# Recomputes every rollup from the stored metrics with one grouped query (for existing data).
+# @return Number of rollup rows written.
+def rebuild_rollups():
+    day = db.func.date(Sessions.started_at)
+    groups = (
+        db.session.query(
+            Sessions.athlete, Sessions.lift_type, day,
+            db.func.count(PerformanceMetrics.id),
+            db.func.sum(PerformanceMetrics.balance_score),
+            db.func.sum(PerformanceMetrics.stability_score),
+            db.func.sum(PerformanceMetrics.injury_risk),
+            db.func.max(PerformanceMetrics.injury_risk),
+        )
+        .join(PerformanceMetrics, PerformanceMetrics.session == Sessions.id)
+        .filter(Sessions.athlete.isnot(None))
+        .group_by(Sessions.athlete, Sessions.lift_type, day)
+        .all()
+    )
+    AthleteTrend.query.delete(synchronize_session=False)
+    for athlete, lift_type, group_day, count, balance, stability, risk, risk_max in groups:
+        db.session.add(AthleteTrend(
+            athlete=athlete,
+            lift_type=lift_type,
+            # SQLite returns date() as text
+            day=date.fromisoformat(group_day) if isinstance(group_day, str) else group_day,
+            session_count=count,
+            balance_sum=balance,
+            stability_sum=stability,
+            injury_risk_sum=risk,
+            injury_risk_max=risk_max,
+        ))
+    db.session.commit()
+    return len(groups)
+
+
+def _period_start(day, period):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+# Balance, stability and injury-risk trend of an athlete from the daily rollups.
+# @param period: 'day', 'week' (starting Monday) or 'month'.
+# @param lift_type: Only this lift type, all lift types if None.
+# @param since/until: Optional date bounds (inclusive).
+# @return List of {period, sessions, balance_score, stability_score, injury_risk, injury_risk_max}, oldest first.
+def trend(athlete_id, period='day', lift_type=None, since=None, until=None):
+    if period not in TREND_PERIODS:
+        raise ValueError(f"Unknown trend period: {period}")
+    query = AthleteTrend.query.filter(AthleteTrend.athlete == athlete_id)
+    if lift_type:
+        query = query.filter(AthleteTrend.lift_type == lift_type)
+    if since:
+        query = query.filter(AthleteTrend.day >= since)
+    if until:
+        query = query.filter(AthleteTrend.day <= until)
+
+    buckets = {}
+    for rollup in query.order_by(AthleteTrend.day):
+        key = _period_start(rollup.day, period)
+        bucket = buckets.setdefault(key, {'sessions': 0, 'balance': 0.0, 'stability': 0.0, 'risk': 0.0, 'risk_max': 0.0})
+        bucket['sessions'] += rollup.session_count
+        bucket['balance'] += rollup.balance_sum
+        bucket['stability'] += rollup.stability_sum
+        bucket['risk'] += rollup.injury_risk_sum
+        bucket['risk_max'] = max(bucket['risk_max'], rollup.injury_risk_max)
+
+    return [
+        {
+            'period': key.isoformat(),
+            'sessions': bucket['sessions'],
+            'balance_score': bucket['balance'] / bucket['sessions'],
+            'stability_score': bucket['stability'] / bucket['sessions'],
+            'injury_risk': bucket['risk'] / bucket['sessions'],
+            'injury_risk_max': bucket['risk_max'],
+        }
+        for key, bucket in buckets.items() if bucket['sessions']
+    ]
@@ -0,0 +1,238 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+# Analysis job scheduler.
+# Jobs wait in a bounded queue and run on a fixed-size thread or process pool.
+# Pending jobs are kept per session and dispatched round-robin, so one session
+# uploading many recordings cannot starve the others.
+#
+# ANALYSIS_EXECUTOR = 'thread' (default) or 'process'
+# ANALYSIS_WORKERS = Number of analyses running at the same time
+# ANALYSIS_QUEUE_SIZE = Jobs that may wait before new submissions are rejected
+# SOCKETIO_MESSAGE_QUEUE = Message queue URL (e.g. redis://) used by worker processes to emit Socket.IO events
+
+ANALYSIS_EXECUTOR = os.getenv('ANALYSIS_EXECUTOR', 'thread')
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '2'))
+ANALYSIS_QUEUE_SIZE = int(os.getenv('ANALYSIS_QUEUE_SIZE', '20'))
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+JOB_HISTORY_SIZE = 500
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+# Raised by submit() when the queue is full (admission control).
+class QueueFullError(Exception):
+    pass
+
+
+# One analysis job.
+# @id = Job id returned to the client.
+# @session_id = Session the job belongs to (unit of fair scheduling).
+# @status = queued, running, done, failed or cancelled.
+# @cancel_event = Set when cancellation is requested; thread jobs check it between stages.
+class Job:
+    def __init__(self, session_id, fn, args, kwargs):
+        self.id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'session_id': self.session_id,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+# Socket.IO emitter of a worker process, connected through the message queue.
+_process_socketio = None
+
+
+def _get_process_socketio():
+    global _process_socketio
+    if _process_socketio is None:
+        from flask_socketio import SocketIO
+        _process_socketio = SocketIO(message_queue=SOCKETIO_MESSAGE_QUEUE)
+    return _process_socketio
+
+
+# Entry point of jobs running in a worker process.
+def _run_in_process(fn, args, kwargs):
+    return fn(*args, socketio=_get_process_socketio(), **kwargs)
+
+
+# @socketio = SocketIO server passed to jobs running in threads.
+# @max_workers = Number of jobs running at the same time.
+# @max_queue = Number of jobs allowed to wait.
+# @executor = 'thread' or 'process'.
+# @on_complete = Optional callback(job) called in this process when a job finishes.
+class JobScheduler:
+    def __init__(self, socketio, max_workers=ANALYSIS_WORKERS, max_queue=ANALYSIS_QUEUE_SIZE,
+                 executor=ANALYSIS_EXECUTOR, on_complete=None):
+        if executor == 'process' and not SOCKETIO_MESSAGE_QUEUE:
+            raise RuntimeError("ANALYSIS_EXECUTOR=process needs SOCKETIO_MESSAGE_QUEUE for progress events")
+        self.socketio = socketio
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.mode = executor
+        self.on_complete = on_complete
+        if executor == 'process':
+            self._executor = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('spawn'))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='analysis')
+
+        self._slots = threading.Semaphore(max_workers)
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()
+        self._queued = 0
+        self._running = 0
+        self._jobs = OrderedDict()
+        self._closed = False
+        threading.Thread(target=self._dispatch_loop, name='analysis-dispatcher', daemon=True).start()
+        logger.info(f"Job scheduler started ({executor}, workers={max_workers}, queue={max_queue})")
+
+    @property
+    def queue_depth(self):
+        return self._queued
+
+    @property
+    def running_count(self):
+        return self._running
+
+    # Queues a job. fn is called as fn(*args, socketio=..., **kwargs); in thread mode it
+    # also receives cancel_event. In process mode fn and its arguments must be picklable.
+    # @return Job
+    # @raise QueueFullError when max_queue jobs are already waiting.
+    def submit(self, session_id, fn, *args, **kwargs):
+        job = Job(session_id, fn, args, kwargs)
+        with self._cond:
+            if self._queued >= self.max_queue:
+                raise QueueFullError(f"Analysis queue is full ({self.max_queue} jobs waiting)")
+            self._pending.setdefault(session_id, deque()).append(job)
+            self._queued += 1
+            self._remember(job)
+            self._cond.notify()
+        logger.info(f"Job {job.id} queued for session {session_id} (queue depth {self._queued})")
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    # Cancels a job. Queued jobs are removed; running thread jobs are asked to stop.
+    # @return True if the job was cancelled or asked to stop.
+    def cancel(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in (DONE, FAILED, CANCELLED):
+                return False
+            if job.status == QUEUED:
+                jobs = self._pending.get(job.session_id)
+                jobs.remove(job)
+                if not jobs:
+                    del self._pending[job.session_id]
+                self._queued -= 1
+                job.status = CANCELLED
+                job.finished_at = time.time()
+                return True
+        if self.mode == 'process':
+            return False
+        job.cancel_event.set()
+        return True
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._executor.shutdown(wait=False)
+
+    def _remember(self, job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > JOB_HISTORY_SIZE:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status in (QUEUED, RUNNING):
+                break
+            self._jobs.popitem(last=False)
+
+    # Picks the next job round-robin across sessions whenever a worker slot is free.
+    def _dispatch_loop(self):
+        while True:
+            self._slots.acquire()
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                session_id, jobs = next(iter(self._pending.items()))
+                job = jobs.popleft()
+                if jobs:
+                    self._pending.move_to_end(session_id)
+                else:
+                    del self._pending[session_id]
+                self._queued -= 1
+                self._running += 1
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            try:
+                if self.mode == 'process':
+                    future = self._executor.submit(_run_in_process, job.fn, job.args, job.kwargs)
+                else:
+                    future = self._executor.submit(
+                        job.fn, *job.args, socketio=self.socketio, cancel_event=job.cancel_event, **job.kwargs
+                    )
+            except Exception as e:
+                self._finish(job, None, error=e)
+                continue
+            future.add_done_callback(partial(self._finish, job))
+
+    def _finish(self, job, future, error=None):
+        if future is not None:
+            error = future.exception()
+        if error is not None:
+            job.status = FAILED
+            job.error = str(error)
+            logger.error(f"Job {job.id} for session {job.session_id} failed: {job.error}")
+        elif job.cancel_event.is_set():
+            job.status = CANCELLED
+        else:
+            job.status = DONE
+            job.result = future.result()
+        job.finished_at = time.time()
+        # Arguments may hold a whole recording; drop them once the job is over
+        job.args = job.kwargs = None
+
+        with self._cond:
+            self._running -= 1
+        self._slots.release()
+
+        if self.on_complete:
+            try:
+                self.on_complete(job)
+            except Exception as e:
+                logger.error(f"Job completion callback failed for {job.id}: {str(e)}", exc_info=True)
@@ -0,0 +1,171 @@
+import logging
+import os
+import queue
+import threading
+import numpy as np
+from services.streaming import get_stream, close_stream
+from services import baselines
+from services.aggregates import summarize_flags
+from services.metrics import stage_timer, record_summary
+
+logger = logging.getLogger(__name__)
+
+# Live sensor ingestion for Socket.IO clients.
+# Gateways send `sensor_batch` events carrying compact binary frames:
+# little-endian float32 triplets (left_foot_pressure, right_foot_pressure, core_stability) per sample.
+# Each session has a bounded frame queue drained by one background task that feeds
+# the StreamingAnalyzer and emits the results to the session room.
+
+FRAME_DTYPE = np.dtype('<f4')
+N_CHANNELS = 3
+MAX_PENDING_FRAMES = int(os.getenv('STREAM_MAX_PENDING_FRAMES', '32'))
+MAX_FRAME_SAMPLES = int(os.getenv('STREAM_MAX_FRAME_SAMPLES', '4096'))
+IDLE_TIMEOUT = float(os.getenv('STREAM_IDLE_TIMEOUT', '30'))
+# Live samples are handed to storage in batches of this many rows
+PERSIST_ROWS = int(os.getenv('STREAM_PERSIST_ROWS', '4096'))
+
+
+# Decodes one frame into an (n, 3) float32 array.
+# @param frame: bytes of packed float32 triplets, or a list of [left, right, core] rows
+#               (or dicts with the column names) for clients that cannot send binary.
+# @return Array of shape (n_samples, 3).
+def decode_frame(frame):
+    if isinstance(frame, (bytes, bytearray, memoryview)):
+        if len(frame) % (FRAME_DTYPE.itemsize * N_CHANNELS):
+            raise ValueError("Frame size is not a multiple of 3 float32 values")
+        samples = np.frombuffer(frame, dtype=FRAME_DTYPE).reshape(-1, N_CHANNELS)
+    elif isinstance(frame, list):
+        if frame and isinstance(frame[0], dict):
+            frame = [[row['left_foot_pressure'], row['right_foot_pressure'], row['core_stability']] for row in frame]
+        samples = np.asarray(frame, dtype=np.float32).reshape(-1, N_CHANNELS)
+    else:
+        raise ValueError("Unsupported frame format")
+
+    if len(samples) > MAX_FRAME_SAMPLES:
+        raise ValueError(f"Frame too large (max {MAX_FRAME_SAMPLES} samples)")
+    return samples
+
+
+# Anomaly counters of a list of streaming results.
+def summarize_results(results):
+    return summarize_flags(
+        [r['lstm_anomaly'] for r in results],
+        [r['iso_anomaly'] for r in results],
+        [r['svm_anomaly'] for r in results],
+        [r['final_anomaly'] for r in results],
+    )
+
+
+# Per-session frame queues with backpressure.
+# @socketio = SocketIO server used to start drain tasks and emit results.
+# @max_pending = Frames a session may have queued before new frames are rejected.
+# @on_samples = Optional callback(session_id, samples, summary) storing received samples and the
+#               anomaly counters of their results (see aggregates.summarize_flags), called in batches.
+class LiveIngest:
+    def __init__(self, socketio, max_pending=MAX_PENDING_FRAMES, on_samples=None):
+        self.socketio = socketio
+        self.max_pending = max_pending
+        self.on_samples = on_samples
+        self._queues = {}
+        self._finished = {}
+        self._lock = threading.Lock()
+
+    def is_open(self, session_id):
+        return session_id in self._queues
+
+    # Number of sessions with a running drain task.
+    @property
+    def open_count(self):
+        return len(self._queues)
+
+    # Frames waiting in all session queues.
+    @property
+    def pending_frames(self):
+        with self._lock:
+            return sum(frames.qsize() for frames in self._queues.values())
+
+    # Queues a frame for analysis.
+    # @param lift_type: Lift type of the session, used when its analyzer is opened.
+    # @param athlete: Athlete of the session, whose baseline (services/baselines.py) scores the stream.
+    # @return Ack dict for the client: status 'ok', or 'backpressure' when the queue is full
+    #         (the client should wait `retry_after_ms` and resend the same frame).
+    def submit(self, session_id, samples, lift_type=None, athlete=None):
+        with self._lock:
+            frames = self._queues.get(session_id)
+            if frames is None:
+                frames = queue.Queue(maxsize=self.max_pending)
+                self._queues[session_id] = frames
+                self._finished[session_id] = threading.Event()
+                self.socketio.start_background_task(
+                    self._drain, session_id, frames, lift_type, self._finished[session_id], athlete
+                )
+            # Enqueue under the lock so an idle drain task cannot exit in between
+            try:
+                frames.put_nowait(samples)
+            except queue.Full:
+                return {'status': 'backpressure', 'pending': frames.qsize(), 'retry_after_ms': 100}
+        return {'status': 'ok', 'pending': frames.qsize(), 'accepted': int(len(samples))}
+
+    # Stops the drain task of a session once its queued frames are processed.
+    # @param timeout: Seconds to wait for the queued frames to be analysed and stored, None to not wait.
+    def close(self, session_id, timeout=None):
+        with self._lock:
+            frames = self._queues.get(session_id)
+            finished = self._finished.get(session_id)
+        if frames is not None:
+            frames.put(None)
+            if timeout is not None:
+                finished.wait(timeout)
+
+    def _flush(self, session_id, unsaved, results):
+        if unsaved:
+            self.on_samples(session_id, np.concatenate(unsaved), summarize_results(results))
+
+    def _drain(self, session_id, frames, lift_type=None, finished=None, athlete=None):
+        unsaved = []
+        unsaved_rows = 0
+        unsaved_results = []
+        try:
+            stream = get_stream(session_id, baselines.artifact_for(athlete, lift_type), lift_type)
+            while True:
+                try:
+                    samples = frames.get(timeout=IDLE_TIMEOUT)
+                except queue.Empty:
+                    self._flush(session_id, unsaved, unsaved_results)
+                    unsaved, unsaved_rows, unsaved_results = [], 0, []
+                    with self._lock:
+                        if frames.empty():
+                            break
+                    continue
+                if samples is None:
+                    break
+
+                with stage_timer('stream_push', pipeline='live'):
+                    results = stream.push(samples)
+                if results:
+                    record_summary(summarize_results(results), pipeline='live')
+                    with stage_timer('emission', pipeline='live'):
+                        self.socketio.emit('stream_feedback', {'results': results}, room=session_id)
+
+                if self.on_samples:
+                    unsaved.append(samples)
+                    unsaved_rows += len(samples)
+                    unsaved_results.extend(results)
+                    if unsaved_rows >= PERSIST_ROWS:
+                        self._flush(session_id, unsaved, unsaved_results)
+                        unsaved, unsaved_rows, unsaved_results = [], 0, []
+        except Exception as e:
+            logger.error(f"Live analysis failed for session {session_id}: {str(e)}", exc_info=True)
+            self.socketio.emit('analysis_error', {'message': f"Live analysis failed: {str(e)}"}, room=session_id)
+        finally:
+            try:
+                self._flush(session_id, unsaved, unsaved_results)
+            except Exception as e:
+                logger.error(f"Could not store live samples for session {session_id}: {str(e)}", exc_info=True)
+            with self._lock:
+                if self._queues.get(session_id) is frames:
+                    del self._queues[session_id]
+                    del self._finished[session_id]
+            close_stream(session_id)
+            if finished is not None:
+                finished.set()
@@ -1,33 +1,150 @@
+import json
+import os
+import numpy as np
+from functools import lru_cache
 
 # Logic rules for the application.
-# It includes the function to check the logical conditions based on the input data.
+# Rules are evaluated as NumPy masks over whole arrays and stored as one bitmask code per row.
+# Codes are rendered to alert text only when needed (render_alerts / render_alert_codes).
 
-# @logical_check = Function to check the logical conditions based on the input data.
+# Rule bit flags (order is the order of the alerts in the rendered text)
+RULE_TOTAL_PRESSURE_HIGH = 1 << 0
+RULE_SEVERE_IMBALANCE = 1 << 1
+RULE_IMBALANCE = 1 << 2
+RULE_LEFT_LOW = 1 << 3
+RULE_RIGHT_LOW = 1 << 4
+RULE_CORE_LOW = 1 << 5
+RULE_MSE_HIGH = 1 << 6
+
+RULE_MESSAGES = [
+    (RULE_TOTAL_PRESSURE_HIGH, "Toplam basınç yüksek!"),
+    (RULE_SEVERE_IMBALANCE, "Ayaklar arası ciddi dengesizlik!"),
+    (RULE_IMBALANCE, "Ayaklar arası dengesizlik var!"),
+    (RULE_LEFT_LOW, "Sol ayak az basıyor!"),
+    (RULE_RIGHT_LOW, "Sağ ayak az basıyor!"),
+    (RULE_CORE_LOW, "Stabilite düşük!"),
+    (RULE_MSE_HIGH, "Öğrenilmemiş (mse)"),
+]
+NORMAL_MESSAGE = "Fiziksel parametreler normal"
+
+# Rule thresholds on scaled sensor values.
+# @total_pressure_max = Alert when left + right exceeds this value.
+# @severe_imbalance = Alert when |left - right| exceeds this value.
+# @imbalance = Milder alert when |left - right| exceeds this value.
+# @foot_pressure_min = Alert when one foot is below this value.
+# @core_min = Alert when core stability is below this value.
+DEFAULT_RULES = {
+    'total_pressure_max': 1.2,
+    'severe_imbalance': 0.4,
+    'imbalance': 0.2,
+    'foot_pressure_min': 0.3,
+    'core_min': 0.4,
+}
+
+# Per lift type overrides of DEFAULT_RULES (missing keys use the default value), loaded from
+# LIFT_RULES_FILE when the module is imported.
+# LIFT_RULES_FILE = JSON file mapping lift types to overrides, e.g.
+#   {"deadlift": {"core_min": 0.5}, "bench_press": {"foot_pressure_min": 0.2, "total_pressure_max": 1.0}}
+LIFT_RULES_FILE = os.getenv('LIFT_RULES_FILE')
+LIFT_RULES = {}
+
+
+# Returns the rule thresholds of a lift type.
+def get_rules(lift_type=None):
+    rules = dict(DEFAULT_RULES)
+    rules.update(LIFT_RULES.get(lift_type, {}))
+    return rules
+
+
+# Overrides rule thresholds for a lift type (e.g. from configuration at startup).
+def configure_rules(lift_type, **overrides):
+    unknown = set(overrides) - set(DEFAULT_RULES)
+    if unknown:
+        raise ValueError(f"Unknown rule settings: {', '.join(sorted(unknown))}")
+    LIFT_RULES.setdefault(lift_type, {}).update(overrides)
+
+
+# Applies the per lift type overrides of a JSON file (see LIFT_RULES_FILE).
+# Raises ValueError for unknown settings, so a mistyped key fails at startup instead of being ignored.
+def load_rules(path):
+    with open(path) as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError(f"{path} must map lift types to rule settings")
+    for lift_type, overrides in config.items():
+        configure_rules(lift_type, **{key: float(value) for key, value in overrides.items()})
+
+
+if LIFT_RULES_FILE:
+    load_rules(LIFT_RULES_FILE)
+
+
+# Evaluates all rules at once.
+# @param left, right, core, mse: Arrays (or scalars) of scaled values and LSTM MSE.
+# @param threshold: MSE threshold.
+# @param lift_type: Lift type whose rule thresholds are used.
+# @return uint8 array of rule bitmask codes, one per row (0 = normal).
+def evaluate_rules(left, right, core, mse, threshold, lift_type=None):
+    rules = get_rules(lift_type)
+    left = np.asarray(left, dtype=np.float64)
+    right = np.asarray(right, dtype=np.float64)
+    core = np.asarray(core, dtype=np.float64)
+    mse = np.asarray(mse, dtype=np.float64)
+
+    diff = np.abs(left - right)
+    severe = diff > rules['severe_imbalance']
+
+    codes = np.zeros(np.broadcast(left, right, core, mse).shape, dtype=np.uint8)
+    codes |= np.where(left + right > rules['total_pressure_max'], RULE_TOTAL_PRESSURE_HIGH, 0).astype(np.uint8)
+    codes |= np.where(severe, RULE_SEVERE_IMBALANCE, 0).astype(np.uint8)
+    codes |= np.where(~severe & (diff > rules['imbalance']), RULE_IMBALANCE, 0).astype(np.uint8)
+    codes |= np.where(left < rules['foot_pressure_min'], RULE_LEFT_LOW, 0).astype(np.uint8)
+    codes |= np.where(right < rules['foot_pressure_min'], RULE_RIGHT_LOW, 0).astype(np.uint8)
+    codes |= np.where(core < rules['core_min'], RULE_CORE_LOW, 0).astype(np.uint8)
+    codes |= np.where(mse > threshold, RULE_MSE_HIGH, 0).astype(np.uint8)
+    return codes
+
+
+# Evaluates the rules on a results DataFrame with the sensor and LSTM_MSE columns.
+def evaluate_frame(results, threshold, lift_type=None):
+    return evaluate_rules(
+        results['left_foot_pressure'].to_numpy(),
+        results['right_foot_pressure'].to_numpy(),
+        results['core_stability'].to_numpy(),
+        results['LSTM_MSE'].to_numpy(),
+        threshold,
+        lift_type,
+    )
+
+
+# Renders one rule code as alert text.
+@lru_cache(maxsize=256)
+def render_alerts(code):
+    alerts = [message for bit, message in RULE_MESSAGES if code & bit]
+    if not alerts:
+        alerts.append(NORMAL_MESSAGE)
+    return " | ".join(alerts)
+
+
+# Renders an array of codes; each distinct code is rendered only once.
+# @return List of alert strings.
+def render_alert_codes(codes):
+    unique, inverse = np.unique(np.asarray(codes, dtype=np.uint8), return_inverse=True)
+    texts = [render_alerts(int(code)) for code in unique]
+    return [texts[i] for i in inverse.ravel()]
+
+
+# Checks the logical conditions for a single row.
 # @row = A row of data containing the features to be checked.
 # @threshold = Threshold value for the MSE to determine anomalies.
 # @return = A string containing the alerts generated based on the logical conditions.
-def logical_check(row, threshold):
-    alerts = [] # List of alerts generated based on the logical conditions
-    left = row['left_foot_pressure'] # Left foot pressure value.
-    right = row['right_foot_pressure'] # Right foot pressure value
-    core = row['core_stability'] # Core stability value
-    mse = row['LSTM_MSE'] # Mean Squared Error value
-
-    if left + right > 1.2:
-        alerts.append("Toplam basınç yüksek!")
-    diff = abs(left - right)
-    if diff > 0.4:
-        alerts.append("Ayaklar arası ciddi dengesizlik!")
-    elif diff > 0.2:
-        alerts.append("Ayaklar arası dengesizlik var!")
-    if left < 0.3:
-        alerts.append("Sol ayak az basıyor!")
-    if right < 0.3:
-        alerts.append("Sağ ayak az basıyor!")
-    if core < 0.4:
-        alerts.append("Stabilite düşük!")
-    if mse > threshold:
-        alerts.append("Öğrenilmemiş (mse)")
-    if not alerts:
-        alerts.append("Fiziksel parametreler normal")
-    return " | ".join(alerts)
+def logical_check(row, threshold, lift_type=None):
+    code = evaluate_rules(
+        row['left_foot_pressure'],
+        row['right_foot_pressure'],
+        row['core_stability'],
+        row['LSTM_MSE'],
+        threshold,
+        lift_type,
+    )
+    return render_alerts(int(code))
@@ -1,5 +1,11 @@
+import math
+import numpy as np
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, RepeatVector, TimeDistributed
+from tensorflow.keras.utils import Sequence
+from utils.windowing import sliding_windows
+# predict_mse lives in the TensorFlow-free runtime module; re-exported for existing callers
+from services.lstm_runtime import predict_mse, LSTM_UNITS
 
 # LSTM Autoencoder Model
 # @model = LSTM Autoencoder model for time series anomaly detection.
@@ -15,16 +21,59 @@ from tensorflow.keras.layers import LSTM, Dense, RepeatVector, TimeDistributed
 
 # @param timesteps: Number of previous time steps to consider for each sample.
 # @param n_features: Number of features in the input data.
+# @param units: Units of the four LSTM layers (encoder 1, encoder 2, decoder 1, decoder 2).
 # @return Compiled LSTM Autoencoder model.
-def build_lstm_autoencoder(timesteps, n_features):
+def build_lstm_autoencoder(timesteps, n_features, units=LSTM_UNITS):
     model = Sequential([
-        LSTM(64, activation='relu', return_sequences=True, input_shape=(timesteps, n_features)), # 64 columns
-        LSTM(32, activation='relu', return_sequences=False),
+        LSTM(units[0], activation='relu', return_sequences=True, input_shape=(timesteps, n_features)), # 64 columns
+        LSTM(units[1], activation='relu', return_sequences=False),
         RepeatVector(timesteps),
-        LSTM(32, activation='relu', return_sequences=True),
-        LSTM(64, activation='relu', return_sequences=True),
+        LSTM(units[2], activation='relu', return_sequences=True),
+        LSTM(units[3], activation='relu', return_sequences=True),
         TimeDistributed(Dense(n_features))
     ])
     model.compile(optimizer='adam', loss='mse')
 
     return model
+
+
+# Feeds strided windows to model.fit batch by batch.
+# Only the current batch is copied, so training memory does not grow with timesteps.
+# @windows = Window view from sliding_windows.
+# @batch_size = Number of windows per batch.
+class WindowSequence(Sequence):
+    def __init__(self, windows, batch_size=32, shuffle=False):
+        super().__init__()
+        self.windows = windows
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.order = np.arange(len(self))
+
+    def __len__(self):
+        return math.ceil(len(self.windows) / self.batch_size)
+
+    def __getitem__(self, index):
+        start = self.order[index] * self.batch_size
+        X = np.ascontiguousarray(self.windows[start:start + self.batch_size], dtype=np.float32)
+        return X, X
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            np.random.shuffle(self.order)
+
+
+# Trains the autoencoder on scaled data without materializing every window.
+# Like validation_split in model.fit, the last windows are held out for validation.
+# @param data: Scaled 2D array (rows, features).
+# @return Keras History object.
+def fit_windows(model, data, timesteps, epochs=30, batch_size=32, validation_split=0.1, verbose=0, callbacks=None):
+    windows = sliding_windows(data, timesteps)
+    n_train = int(len(windows) * (1 - validation_split))
+    validation_data = WindowSequence(windows[n_train:], batch_size) if n_train < len(windows) else None
+    return model.fit(
+        WindowSequence(windows[:n_train], batch_size, shuffle=True),
+        validation_data=validation_data,
+        epochs=epochs,
+        verbose=verbose,
+        callbacks=callbacks,
+    )
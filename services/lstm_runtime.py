@@ -0,0 +1,178 @@
+import threading
+import numpy as np
+from utils.windowing import sliding_windows, iter_window_chunks
+
+# Lightweight inference runtimes for the LSTM autoencoder.
+# Serving only needs the encoder-decoder forward pass, so the web app does not have to import
+# TensorFlow/Keras. Trained weights are exported next to the Keras weights:
+#
+#   lstm.npz    -> Keras weight list (float32) + timesteps, run by NumpyAutoencoder (default)
+#   lstm.tflite -> Converted graph, run by TFLiteAutoencoder with tflite_runtime (optional)
+#
+# Both expose predict(X, verbose=0) and get_weights() like the Keras model, so predict_mse,
+# StreamingAnalyzer and fine-tuning (set_weights(artifact.model.get_weights())) work unchanged.
+
+NPZ_FORMAT_VERSION = 1
+
+# Layout of build_lstm_autoencoder: (return_sequences,) per LSTM layer; a RepeatVector
+# follows the encoder (last layer without return_sequences) and a TimeDistributed Dense closes it.
+# LSTM cells use activation='relu' and the Keras default recurrent_activation='sigmoid'.
+LSTM_LAYERS = (True, False, True, True)
+# Default units of the four LSTM layers; other sizes can be trained (train_lstm.py --units) and are
+# read back from the weight shapes
+LSTM_UNITS = (64, 32, 32, 64)
+
+
+# @return Units of each LSTM layer of a Keras weight list.
+def lstm_units(weights):
+    return tuple(int(weights[3 * layer + 1].shape[0]) for layer in range(len(LSTM_LAYERS)))
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+# One Keras LSTM layer over a batch.
+# Gate order of the fused kernels is input, forget, cell, output (Keras convention).
+# @param X: Array of shape (batch, timesteps, features).
+# @return (batch, timesteps, units) if return_sequences, else (batch, units).
+def lstm_forward(X, kernel, recurrent_kernel, bias, return_sequences):
+    batch, timesteps, _ = X.shape
+    units = recurrent_kernel.shape[0]
+    # Input projection of every timestep in one matmul; only the recurrent part stays in the loop
+    x_proj = (X.reshape(-1, X.shape[2]) @ kernel + bias).reshape(batch, timesteps, 4 * units)
+    h = np.zeros((batch, units), dtype=X.dtype)
+    c = np.zeros((batch, units), dtype=X.dtype)
+    outputs = np.empty((batch, timesteps, units), dtype=X.dtype) if return_sequences else None
+
+    for t in range(timesteps):
+        z = x_proj[:, t] + h @ recurrent_kernel
+        i = _sigmoid(z[:, :units])
+        f = _sigmoid(z[:, units:2 * units])
+        g = np.maximum(z[:, 2 * units:3 * units], 0)
+        o = _sigmoid(z[:, 3 * units:])
+        c = f * c + i * g
+        h = o * np.maximum(c, 0)
+        if return_sequences:
+            outputs[:, t] = h
+    return outputs if return_sequences else h
+
+
+# NumPy reference implementation of build_lstm_autoencoder's forward pass.
+# @weights = Keras weight list (model.get_weights()): kernel, recurrent_kernel, bias per LSTM layer, then Dense kernel, bias.
+# @timesteps = Window length the model was trained with.
+class NumpyAutoencoder:
+    def __init__(self, weights, timesteps):
+        expected = 3 * len(LSTM_LAYERS) + 2
+        if len(weights) != expected:
+            raise ValueError(f"Expected {expected} weight arrays, got {len(weights)}")
+        self.weights = [np.asarray(w, dtype=np.float32) for w in weights]
+        self.timesteps = int(timesteps)
+        self.n_features = self.weights[-1].shape[0]
+
+    def predict(self, X, verbose=0, batch_size=None):
+        h = np.asarray(X, dtype=np.float32)
+        for layer, return_sequences in enumerate(LSTM_LAYERS):
+            kernel, recurrent_kernel, bias = self.weights[3 * layer:3 * layer + 3]
+            h = lstm_forward(h, kernel, recurrent_kernel, bias, return_sequences)
+            if not return_sequences:
+                # RepeatVector
+                h = np.repeat(h[:, np.newaxis, :], self.timesteps, axis=1)
+        dense_kernel, dense_bias = self.weights[-2:]
+        return h @ dense_kernel + dense_bias
+
+    def get_weights(self):
+        return [w.copy() for w in self.weights]
+
+    # Saves the weights in the lstm.npz format.
+    def save(self, path):
+        arrays = {f'w{i}': w for i, w in enumerate(self.weights)}
+        np.savez(path, format_version=NPZ_FORMAT_VERSION, timesteps=self.timesteps, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            n_weights = len([key for key in data.files if key.startswith('w')])
+            weights = [data[f'w{i}'] for i in range(n_weights)]
+            return cls(weights, int(data['timesteps']))
+
+    def __repr__(self):
+        return f'<NumpyAutoencoder timesteps={self.timesteps} features={self.n_features}>'
+
+
+# Writes a Keras model's weights as lstm.npz (no TensorFlow needed to read it back).
+def export_npz(model, timesteps, path):
+    NumpyAutoencoder(model.get_weights(), timesteps).save(path)
+    return path
+
+
+# Converts a Keras model to a TFLite flatbuffer. Needs TensorFlow (export time only).
+def export_tflite(model, path):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    # Keras LSTMs with relu activations are not always fused into TFLite builtins
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+    converter._experimental_lower_tensor_list_ops = False
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+    return path
+
+
+def _tflite_interpreter(path):
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite import Interpreter
+    return Interpreter(model_path=path)
+
+
+# Runs an exported lstm.tflite with tflite_runtime (falls back to tf.lite if only TensorFlow is installed).
+# The interpreter is not thread-safe, so calls are serialized.
+# @weights = Keras weight list kept for fine-tuning (from lstm.npz), optional.
+class TFLiteAutoencoder:
+    def __init__(self, path, timesteps, weights=None):
+        self.path = path
+        self.timesteps = int(timesteps)
+        self.weights = weights
+        self.interpreter = _tflite_interpreter(path)
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.batch_size = None
+        self.lock = threading.Lock()
+
+    def predict(self, X, verbose=0, batch_size=None):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        with self.lock:
+            if self.batch_size != len(X):
+                self.interpreter.resize_tensor_input(self.input_index, X.shape)
+                self.interpreter.allocate_tensors()
+                self.batch_size = len(X)
+            self.interpreter.set_tensor(self.input_index, X)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index).copy()
+
+    def get_weights(self):
+        if self.weights is None:
+            raise RuntimeError("TFLite model has no exported weights for fine-tuning")
+        return [w.copy() for w in self.weights]
+
+    def __repr__(self):
+        return f'<TFLiteAutoencoder {self.path}>'
+
+
+# Reconstruction error of every window, predicted chunk by chunk.
+# Works with the Keras model and both runtimes above.
+# @param data: Scaled 2D array (rows, features).
+# @param chunk_size: Windows per model.predict call; bounds peak memory.
+# @return 1D array with the MSE of each window.
+def predict_mse(model, data, timesteps, chunk_size=4096):
+    mse = np.empty(len(sliding_windows(data, timesteps)), dtype=np.float32)
+    for start, X in iter_window_chunks(data, timesteps, chunk_size):
+        X_pred = model.predict(X, verbose=0)
+        mse[start:start + len(X)] = np.mean(np.power(X - X_pred, 2), axis=(1, 2))
+    return mse
+
+
+# Largest absolute difference between two models' reconstructions of the same windows.
+def max_abs_diff(model_a, model_b, X):
+    return float(np.max(np.abs(model_a.predict(X, verbose=0) - model_b.predict(X, verbose=0))))
@@ -0,0 +1,166 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process metrics rendered in the Prometheus text exposition format (GET /metrics).
+# Counters and histograms are updated on the hot path; gauges are read through callbacks
+# when the endpoint is scraped. Metrics of analysis jobs running in worker processes
+# (ANALYSIS_EXECUTOR=process) stay in those processes and are not exported.
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+# Gauge whose value is read from a callback at scrape time.
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, callback):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+
+    def samples(self):
+        try:
+            return [(self.name, (), float(self.callback()))]
+        except Exception:
+            return []
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def samples(self):
+        rows = []
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    rows.append((f'{self.name}_bucket', key + (('le', repr(bound)),), cumulative))
+                rows.append((f'{self.name}_bucket', key + (('le', '+Inf'),), series['count']))
+                rows.append((f'{self.name}_sum', key, series['sum']))
+                rows.append((f'{self.name}_count', key, series['count']))
+        return rows
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        return _registry.setdefault(metric.name, metric)
+
+
+def counter(name, help_text):
+    return _register(Counter(name, help_text))
+
+
+def histogram(name, help_text, buckets=STAGE_BUCKETS):
+    return _register(Histogram(name, help_text, buckets))
+
+
+# Registers (or replaces) a callback gauge, e.g. the analysis queue depth.
+def gauge(name, help_text, callback):
+    metric = Gauge(name, help_text, callback)
+    with _registry_lock:
+        _registry[name] = metric
+    return metric
+
+
+# Metrics shared by the pipeline
+STAGE_SECONDS = histogram('lifting_stage_seconds', 'Duration of pipeline stages in seconds')
+WINDOWS_SCORED = counter('lifting_windows_scored_total', 'Windows scored by the LSTM autoencoder')
+ANOMALIES = counter('lifting_anomalies_total', 'Anomalies found, per detector')
+UPLOADS = counter('lifting_uploads_total', 'Sensor data uploads, per status')
+UPLOADED_ROWS = counter('lifting_uploaded_rows_total', 'Sensor rows received through uploads')
+SESSIONS_ENDED = counter('lifting_sessions_ended_total', 'Sessions ended')
+
+
+# Times a block and records it in the stage histogram.
+# @param stage: Stage name label (e.g. 'lstm_predict').
+# @param pipeline: Pipeline label ('upload', 'live', 'end_session', ...).
+@contextmanager
+def stage_timer(stage, pipeline='upload'):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage, pipeline=pipeline)
+
+
+# Adds the counters of an analysis summary (aggregates.summarize_flags) to the metrics.
+def record_summary(summary, pipeline='upload'):
+    if not summary:
+        return
+    WINDOWS_SCORED.inc(summary.get('windows', 0), pipeline=pipeline)
+    for detector in ('lstm', 'iso', 'svm', 'final'):
+        ANOMALIES.inc(summary.get(f'{detector}_anomalies', 0), detector=detector, pipeline=pipeline)
+
+
+# @return All metrics in the Prometheus text format (version 0.0.4).
+def render_prometheus():
+    lines = []
+    with _registry_lock:
+        metrics = list(_registry.values())
+    for metric in metrics:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, key, value in metric.samples():
+            lines.append(f'{name}{_format_labels(key)} {value}')
+    return '\n'.join(lines) + '\n'
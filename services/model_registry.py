@@ -0,0 +1,257 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from services.anomaly_detection import AnomalyDetector
+from services.lstm_runtime import NumpyAutoencoder, TFLiteAutoencoder, export_npz, lstm_units, LSTM_UNITS
+from services.normalization import MinMaxNormalizer
+
+logger = logging.getLogger(__name__)
+
+# Versioned model registry.
+# Each trained model is stored in its own folder under REGISTRY_DIR:
+#
+#   models/checkpoints/<version>/lstm.weights.h5  -> LSTM autoencoder weights (Keras)
+#   models/checkpoints/<version>/lstm.npz         -> Same weights for the NumPy runtime (services/lstm_runtime.py)
+#   models/checkpoints/<version>/lstm.tflite      -> Exported TFLite graph (optional, export_model.py --tflite)
+#   models/checkpoints/<version>/meta.json        -> threshold, timesteps, features, normalizer parameters, ...
+#   models/checkpoints/<version>/scaler.joblib    -> fitted sklearn MinMaxScaler (versions saved before the normalizer)
+#   models/checkpoints/<version>/iso_forest.joblib, oneclass_svm.joblib -> fitted classical detectors (optional)
+#   models/checkpoints/LATEST                     -> name of the version served by default
+#
+# Training happens offline (train_lstm.py); the web app only loads an artifact and runs inference.
+#
+# INFERENCE_BACKEND = 'numpy' (default), 'tflite' or 'keras'. The numpy and tflite backends do not
+# import TensorFlow; versions without the exported file fall back to Keras.
+
+REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR', os.path.join('models', 'checkpoints'))
+WEIGHTS_FILE = 'lstm.weights.h5'
+SCALER_FILE = 'scaler.joblib'
+META_FILE = 'meta.json'
+ISO_FILE = 'iso_forest.joblib'
+SVM_FILE = 'oneclass_svm.joblib'
+LATEST_FILE = 'LATEST'
+NPZ_FILE = 'lstm.npz'
+TFLITE_FILE = 'lstm.tflite'
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'numpy')
+
+
+# Everything the analysis path needs to score a recording without training.
+# @version = Registry version name of the artifact.
+# @model = LSTM autoencoder with the trained weights loaded (Keras model or a lstm_runtime model).
+# @scaler = MinMaxNormalizer fitted on the training data.
+# @threshold = Calibrated MSE threshold above which a window is an anomaly.
+# @timesteps = Window length the model was trained with.
+# @features = Ordered list of input columns.
+# @path = Folder the artifact was loaded from.
+# @iso_detector, svm_detector = Fitted AnomalyDetector objects, None if the version has none.
+class ModelArtifact:
+    def __init__(self, version, model, scaler, threshold, timesteps, features, path=None, meta=None,
+                 iso_detector=None, svm_detector=None):
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.threshold = float(threshold)
+        self.timesteps = int(timesteps)
+        self.features = list(features)
+        self.path = path
+        self.meta = meta or {}
+        self.iso_detector = iso_detector
+        self.svm_detector = svm_detector
+
+    @property
+    def n_features(self):
+        return len(self.features)
+
+    def __repr__(self):
+        return f'<ModelArtifact {self.version} timesteps={self.timesteps} threshold={self.threshold:.6f}>'
+
+
+# Saves a trained model, its normalizer and threshold as a new registry version.
+# @param scaler: Fitted MinMaxNormalizer (a fitted sklearn MinMaxScaler is converted).
+# @param version: Version name, defaults to a timestamp.
+# @param make_latest: Whether LATEST should point to the new version.
+# @param extra: Additional metadata stored in meta.json (training data, epochs, ...).
+# @param detectors: Optional (iso_detector, svm_detector) fitted on the same reference data.
+# @return Path of the created version folder.
+def save_artifact(model, scaler, threshold, timesteps, features, version=None,
+                  registry_dir=REGISTRY_DIR, make_latest=True, extra=None, detectors=None):
+    version = version or time.strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(registry_dir, version)
+    os.makedirs(path, exist_ok=True)
+
+    model.save_weights(os.path.join(path, WEIGHTS_FILE))
+    export_npz(model, timesteps, os.path.join(path, NPZ_FILE))
+    if not isinstance(scaler, MinMaxNormalizer):
+        scaler = MinMaxNormalizer.from_sklearn(scaler)
+    if detectors:
+        iso_detector, svm_detector = detectors
+        iso_detector.save(os.path.join(path, ISO_FILE))
+        svm_detector.save(os.path.join(path, SVM_FILE))
+
+    meta = {
+        'version': version,
+        'threshold': float(threshold),
+        'timesteps': int(timesteps),
+        'features': list(features),
+        'lstm_units': list(lstm_units(model.get_weights())),
+        'normalizer': scaler.to_dict(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    meta.update(extra or {})
+    with open(os.path.join(path, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    if make_latest:
+        with open(os.path.join(registry_dir, LATEST_FILE), 'w') as f:
+            f.write(version)
+
+    logger.info(f"Model artifact saved: {path}")
+    return path
+
+
+# Lists the versions stored in the registry, oldest first.
+def list_versions(registry_dir=REGISTRY_DIR):
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(registry_dir)
+        if os.path.isfile(os.path.join(registry_dir, name, META_FILE))
+    )
+
+
+# Resolves 'latest' (or None) to a concrete version name.
+# @return Version name or None if the registry is empty.
+def resolve_version(version=None, registry_dir=REGISTRY_DIR):
+    if version and version != 'latest':
+        return version
+    latest_path = os.path.join(registry_dir, LATEST_FILE)
+    if os.path.isfile(latest_path):
+        with open(latest_path) as f:
+            name = f.read().strip()
+        if name:
+            return name
+    versions = list_versions(registry_dir)
+    return versions[-1] if versions else None
+
+
+# Version a process serves unless told otherwise: MODEL_VERSION if set, else LATEST.
+# @param version: Requested version name or 'latest'; None uses MODEL_VERSION.
+def served_version(version=None, registry_dir=REGISTRY_DIR):
+    return resolve_version(version or os.getenv('MODEL_VERSION'), registry_dir)
+
+
+# Normalizer of a version: parameters from meta.json, or the pickled MinMaxScaler of older versions.
+def load_normalizer(path, meta):
+    if 'normalizer' in meta:
+        return MinMaxNormalizer.from_dict(meta['normalizer'])
+    return MinMaxNormalizer.from_sklearn(joblib.load(os.path.join(path, SCALER_FILE)))
+
+
+# Builds the inference model of a version for the configured backend.
+# @param backend: 'numpy', 'tflite' or 'keras'; defaults to INFERENCE_BACKEND.
+def load_model(path, meta, backend=None):
+    backend = backend or INFERENCE_BACKEND
+    npz_path = os.path.join(path, NPZ_FILE)
+    tflite_path = os.path.join(path, TFLITE_FILE)
+
+    if backend == 'numpy' and os.path.isfile(npz_path):
+        return NumpyAutoencoder.load(npz_path)
+    if backend == 'tflite' and os.path.isfile(tflite_path):
+        weights = NumpyAutoencoder.load(npz_path).weights if os.path.isfile(npz_path) else None
+        return TFLiteAutoencoder(tflite_path, meta['timesteps'], weights)
+    if backend != 'keras':
+        logger.warning(f"No exported {backend} model in {path}, loading Keras weights. Run export_model.py.")
+
+    # TensorFlow is only imported when the Keras backend is actually used
+    from services.lstm_model import build_lstm_autoencoder
+    model = build_lstm_autoencoder(meta['timesteps'], len(meta['features']), meta.get('lstm_units', LSTM_UNITS))
+    model.load_weights(os.path.join(path, WEIGHTS_FILE))
+    return model
+
+
+# Loads an artifact from the registry and rebuilds the model with its weights.
+# @param version: Version name, 'latest' or None (uses MODEL_VERSION env or LATEST).
+# @return ModelArtifact, or None if no version is available.
+def load_artifact(version=None, registry_dir=REGISTRY_DIR):
+    version = served_version(version, registry_dir)
+    if version is None:
+        return None
+
+    path = os.path.join(registry_dir, version)
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+
+    model = load_model(path, meta)
+    scaler = load_normalizer(path, meta)
+    iso_path = os.path.join(path, ISO_FILE)
+    svm_path = os.path.join(path, SVM_FILE)
+
+    artifact = ModelArtifact(
+        version=version,
+        model=model,
+        scaler=scaler,
+        threshold=meta['threshold'],
+        timesteps=meta['timesteps'],
+        features=meta['features'],
+        path=path,
+        meta=meta,
+        iso_detector=AnomalyDetector.load(iso_path) if os.path.isfile(iso_path) else None,
+        svm_detector=AnomalyDetector.load(svm_path) if os.path.isfile(svm_path) else None,
+    )
+    logger.info(f"Model artifact loaded: {artifact}")
+    return artifact
+
+
+# Process-wide artifact, loaded once and shared by every analysis.
+_active_artifact = None
+_active_loaded = False
+_active_lock = threading.Lock()
+
+
+# Returns the artifact served by this process, loading it on first call.
+# @return ModelArtifact, or None if the registry is empty.
+def get_active_artifact():
+    global _active_artifact, _active_loaded
+    if _active_loaded:
+        return _active_artifact
+    with _active_lock:
+        if not _active_loaded:
+            _active_artifact = load_artifact()
+            _active_loaded = True
+            if _active_artifact is None:
+                logger.warning("Model registry is empty. Run train_lstm.py to register a model.")
+    return _active_artifact
+
+
+# Replaces the served artifact (e.g. after registering a new version).
+def set_active_artifact(artifact):
+    global _active_artifact, _active_loaded
+    with _active_lock:
+        _active_artifact = artifact
+        _active_loaded = True
+
+
+# Version of the served artifact, read from the registry without loading the model if it is not loaded yet.
+# @return Version name or None if the registry is empty.
+def active_version():
+    if _active_loaded:
+        return _active_artifact.version if _active_artifact else None
+    return served_version()
+
+
+# Loads the active artifact and runs one dummy forward pass, so the first analysis does not pay
+# for imports, weight loading and buffer allocation.
+# @return ModelArtifact, or None if the registry is empty.
+def warm_up():
+    started = time.perf_counter()
+    artifact = get_active_artifact()
+    if artifact is not None:
+        artifact.model.predict(np.zeros((1, artifact.timesteps, artifact.n_features), dtype=np.float32), verbose=0)
+        logger.info(f"Model {artifact.version} warmed up in {time.perf_counter() - started:.2f}s")
+    return artifact
@@ -0,0 +1,93 @@
+import numpy as np
+
+# Min-max normalization stage shared by training and serving.
+# Parameters are fitted once on the training data and stored with the model weights
+# (meta.json of the registry version), so every session is scaled to the training
+# distribution and MSE thresholds stay comparable across sessions.
+# transform is a single vectorized multiply-add: X * scale_ + min_ (same formula as sklearn's MinMaxScaler).
+
+
+# @data_min, data_max = Per-feature minimum / maximum seen while fitting.
+# @feature_range = Target range of the scaled values.
+class MinMaxNormalizer:
+    def __init__(self, data_min=None, data_max=None, feature_range=(0.0, 1.0), n_samples_seen=0):
+        self.data_min = None if data_min is None else np.asarray(data_min, dtype=np.float64)
+        self.data_max = None if data_max is None else np.asarray(data_max, dtype=np.float64)
+        self.feature_range = tuple(float(v) for v in feature_range)
+        self.n_samples_seen = int(n_samples_seen)
+        self._update_params()
+
+    @property
+    def fitted(self):
+        return self.data_min is not None
+
+    def _update_params(self):
+        if not self.fitted:
+            self.scale_ = self.min_ = None
+            return
+        lo, hi = self.feature_range
+        data_range = self.data_max - self.data_min
+        # Constant features keep a scale of 1 (like MinMaxScaler) instead of dividing by zero
+        data_range = np.where(data_range == 0, 1.0, data_range)
+        self.scale_ = (hi - lo) / data_range
+        self.min_ = lo - self.data_min * self.scale_
+
+    # Fits min/max on X, ignoring NaN rows.
+    def fit(self, X):
+        self.data_min = self.data_max = None
+        self.n_samples_seen = 0
+        return self.partial_fit(X)
+
+    # Online update: widens min/max with a new chunk without revisiting earlier data.
+    def partial_fit(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        X = X.reshape(-1, X.shape[-1])
+        X = X[~np.isnan(X).any(axis=1)]
+        if len(X) == 0:
+            return self
+        chunk_min, chunk_max = X.min(axis=0), X.max(axis=0)
+        if self.fitted:
+            chunk_min = np.minimum(self.data_min, chunk_min)
+            chunk_max = np.maximum(self.data_max, chunk_max)
+        self.data_min, self.data_max = chunk_min, chunk_max
+        self.n_samples_seen += len(X)
+        self._update_params()
+        return self
+
+    # @return float32 array with the same shape as X.
+    def transform(self, X):
+        if not self.fitted:
+            raise RuntimeError("MinMaxNormalizer is not fitted")
+        X = np.asarray(X, dtype=np.float32)
+        return X * self.scale_.astype(np.float32) + self.min_.astype(np.float32)
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+    def inverse_transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.min_) / self.scale_
+
+    def copy(self):
+        return MinMaxNormalizer(self.data_min, self.data_max, self.feature_range, self.n_samples_seen)
+
+    def to_dict(self):
+        return {
+            'type': 'minmax',
+            'data_min': self.data_min.tolist(),
+            'data_max': self.data_max.tolist(),
+            'feature_range': list(self.feature_range),
+            'n_samples_seen': self.n_samples_seen,
+        }
+
+    @classmethod
+    def from_dict(cls, params):
+        return cls(params['data_min'], params['data_max'], params.get('feature_range', (0.0, 1.0)),
+                   params.get('n_samples_seen', 0))
+
+    # Converts a fitted sklearn MinMaxScaler (older registry versions).
+    @classmethod
+    def from_sklearn(cls, scaler):
+        return cls(scaler.data_min_, scaler.data_max_, scaler.feature_range, getattr(scaler, 'n_samples_seen_', 0))
+
+    def __repr__(self):
+        return f'<MinMaxNormalizer fitted={self.fitted} n={self.n_samples_seen}>'
@@ -0,0 +1,154 @@
+import threading
+import numpy as np
+
+# Streaming quantile estimation for MSE thresholds.
+# P2Quantile is the P² algorithm (Jain & Chlamtac, 1985): five markers track the minimum, the p/2, p,
+# (1+p)/2 quantiles and the maximum, adjusted with a piecewise-parabolic fit after every observation.
+# Memory is constant however many windows are seen, so thresholds can be calibrated on any amount of
+# reference data and tracked on live streams while every window is flagged as soon as it is scored.
+# The marker state is JSON-serialisable and stored with the model (meta.json 'threshold_calibration').
+
+
+class P2Quantile:
+    def __init__(self, p):
+        if not 0 < p < 1:
+            raise ValueError(f"Quantile must be between 0 and 1, got {p}")
+        self.p = float(p)
+        self.count = 0
+        self.heights = []
+        self.positions = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.desired = [1.0, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5.0]
+        self.increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    # Current estimate; exact while fewer than five values were seen, None before the first one.
+    @property
+    def value(self):
+        if self.count >= 5:
+            return self.heights[2]
+        if self.count == 0:
+            return None
+        return float(np.percentile(self.heights, self.p * 100))
+
+    def update(self, x):
+        x = float(x)
+        self.count += 1
+        q = self.heights
+        if self.count <= 5:
+            q.append(x)
+            q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Move the middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if q[i - 1] < parabolic < q[i + 1]:
+                    q[i] = parabolic
+                else:
+                    q[i] = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    def update_many(self, values):
+        for x in np.asarray(values, dtype=np.float64).ravel():
+            self.update(x)
+        return self
+
+    # Copy whose markers weigh like at most max_count observations, so new values move the
+    # estimate faster (marker positions are scaled, heights are kept).
+    def rescaled(self, max_count):
+        estimator = P2Quantile.from_dict(self.to_dict())
+        if self.count > max(max_count, 5):
+            factor = (max_count - 1) / (self.count - 1)
+            estimator.positions = [1 + (n - 1) * factor for n in self.positions]
+            estimator.desired = [1 + (n - 1) * factor for n in self.desired]
+            estimator.count = int(max_count)
+        return estimator
+
+    def to_dict(self):
+        return {
+            'method': 'p2',
+            'p': self.p,
+            'count': self.count,
+            'heights': list(self.heights),
+            'positions': list(self.positions),
+            'desired': list(self.desired),
+        }
+
+    @classmethod
+    def from_dict(cls, params):
+        estimator = cls(params['p'])
+        estimator.count = int(params['count'])
+        estimator.heights = [float(h) for h in params['heights']]
+        estimator.positions = [float(n) for n in params['positions']]
+        estimator.desired = [float(n) for n in params['desired']]
+        return estimator
+
+    def __repr__(self):
+        return f'<P2Quantile p={self.p} count={self.count} value={self.value}>'
+
+
+# Calibrates an MSE threshold on reference data in constant memory.
+# @param mse_blocks: Iterable of MSE arrays (e.g. one per scored block or recording).
+# @param percentile: Percentile of the reference windows' MSE used as threshold.
+# @return Fitted P2Quantile; its value is the threshold, to_dict() is stored with the model.
+def calibrate_threshold(mse_blocks, percentile=95):
+    estimator = P2Quantile(percentile / 100)
+    for mse in mse_blocks:
+        estimator.update_many(mse)
+    if estimator.count == 0:
+        raise ValueError("No reference windows to calibrate the threshold on")
+    return estimator
+
+
+# Threshold of a model tracked over the windows it scores, shared by every live session of the model
+# so flags stay comparable across sessions.
+# Starts from the model's calibration (markers rescaled to `memory` windows) or, for models registered
+# without one, uses the stored threshold until `warmup` windows were seen.
+class ThresholdTracker:
+    def __init__(self, threshold, percentile=95, calibration=None, memory=10000, warmup=500):
+        self.threshold = float(threshold)
+        self.warmup = warmup
+        if calibration:
+            self.estimator = P2Quantile.from_dict(calibration).rescaled(memory)
+        else:
+            self.estimator = P2Quantile(percentile / 100)
+        self.lock = threading.Lock()
+
+    @property
+    def current(self):
+        if self.estimator.count < self.warmup:
+            return self.threshold
+        return self.estimator.value
+
+    # Flags-ready thresholds of consecutive windows: each window is compared with the threshold
+    # before it was added, then added to the estimate.
+    # @return Array of thresholds, one per window.
+    def observe(self, mse):
+        thresholds = np.empty(len(mse), dtype=np.float64)
+        with self.lock:
+            for i, value in enumerate(np.asarray(mse, dtype=np.float64)):
+                thresholds[i] = self.current
+                self.estimator.update(value)
+        return thresholds
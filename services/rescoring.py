@@ -0,0 +1,258 @@
+import json
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from models import db, Sessions, SensorData, SessionAggregates, PerformanceMetrics
+from services import aggregates, baselines, history, sensor_store
+from services.model_registry import load_artifact, served_version, REGISTRY_DIR
+from services.upload_analysis import rescore_stored
+
+logger = logging.getLogger(__name__)
+
+# Batch re-scoring of stored sessions with a registered model (rescore_sessions.py).
+# Sessions with sensor data are read in keyset pages ordered by (started_at, id). Each page is scored by a
+# process pool without Socket.IO, one session per task, while the next page is already queued. Workers
+# rebuild the session's results cache (services/results_store.py); the parent then writes the page's analysis
+# counters and performance metrics in one commit and saves the cursor of the page to the state file, so an
+# interrupted run resumes after the last committed page.
+
+PAGE_SIZE = 100
+STATE_FILE = 'rescore_state.json'
+
+# Artifact of a worker process, loaded once by init_worker
+_worker_artifact = None
+
+
+# Pool initializer: loads the model version to score with.
+def init_worker(version, registry_dir=REGISTRY_DIR):
+    global _worker_artifact
+    _worker_artifact = load_artifact(version, registry_dir)
+    if _worker_artifact is None:
+        raise RuntimeError("Model registry is empty. Run train_lstm.py to register a model.")
+
+
+# Scores one session in a worker process, with the athlete's baseline of the model if there is one.
+# @param task: (session id, athlete id, lift type, cache_results)
+# @return {session_id, summary} or {session_id, error}
+def rescore_task(task):
+    session_id, athlete, lift_type, cache_results = task
+    try:
+        artifact = baselines.artifact_for(athlete, lift_type, _worker_artifact)
+        summary = rescore_stored(uuid.UUID(session_id), artifact, lift_type, cache_results)
+        return {'session_id': session_id, 'summary': summary}
+    except Exception as e:
+        logger.exception(f"Re-scoring failed for session {session_id}")
+        return {'session_id': session_id, 'error': str(e)}
+
+
+# Filters of a run.
+# @athlete = Athlete id, @lift_type = Lift type, @since/@until = Dates bounding started_at (inclusive).
+class RescoreFilters:
+    def __init__(self, athlete=None, lift_type=None, since=None, until=None):
+        self.athlete = athlete
+        self.lift_type = lift_type
+        self.since = since
+        self.until = until
+
+    def apply(self, query):
+        query = query.filter(db.session.query(SensorData.id).filter(SensorData.session == Sessions.id).exists())
+        if self.athlete:
+            query = query.filter(Sessions.athlete == uuid.UUID(str(self.athlete)))
+        if self.lift_type:
+            query = query.filter(Sessions.lift_type == self.lift_type)
+        if self.since:
+            query = query.filter(Sessions.started_at >= datetime.combine(self.since, datetime.min.time()))
+        if self.until:
+            query = query.filter(Sessions.started_at < datetime.combine(self.until + timedelta(days=1), datetime.min.time()))
+        return query
+
+    def to_dict(self):
+        return {
+            'athlete': str(self.athlete) if self.athlete else None,
+            'lift_type': self.lift_type,
+            'since': self.since.isoformat() if self.since else None,
+            'until': self.until.isoformat() if self.until else None,
+        }
+
+
+def count_sessions(filters, after=None):
+    query = filters.apply(Sessions.query)
+    if after:
+        query = query.filter(db.tuple_(Sessions.started_at, Sessions.id) > after)
+    return query.count()
+
+
+# One page of matching sessions after the cursor.
+# @param after: (started_at, session id) of the last session of the previous page, None for the first page.
+# @return List of (id, started_at, athlete, lift_type) rows.
+def session_page(filters, after=None, limit=PAGE_SIZE):
+    query = filters.apply(Sessions.query.with_entities(Sessions.id, Sessions.started_at, Sessions.athlete, Sessions.lift_type))
+    if after:
+        query = query.filter(db.tuple_(Sessions.started_at, Sessions.id) > after)
+    return query.order_by(Sessions.started_at, Sessions.id).limit(limit).all()
+
+
+# Writes the results of one page: analysis counters replaced, performance metrics of ended sessions
+# recomputed. Rows of the page are loaded with one query per table and committed together.
+# @param dry_run: Compute the changes and roll them back.
+# @return Counters of the page (windows, anomalies_before, anomalies_after, metrics_changed).
+def apply_page(results, dry_run=False):
+    scored = {uuid.UUID(r['session_id']): r['summary'] for r in results if r.get('summary')}
+    stats = {'windows': 0, 'anomalies_before': 0, 'anomalies_after': 0, 'metrics_changed': 0}
+    if not scored:
+        return stats
+
+    ids = list(scored)
+    session_aggregates = {a.session: a for a in SessionAggregates.query.filter(SessionAggregates.session.in_(ids))}
+    session_metrics = {m.session: m for m in PerformanceMetrics.query.filter(PerformanceMetrics.session.in_(ids))}
+    for session_id, summary in scored.items():
+        row = session_aggregates.get(session_id)
+        if row is None:
+            row = aggregates.get_or_create(session_id)
+        if not row.sample_count:
+            # Sessions recorded before aggregates existed
+            for _, chunk in sensor_store.iter_chunks(session_id):
+                aggregates.add_samples(session_id, chunk)
+        stats['windows'] += summary['windows']
+        stats['anomalies_before'] += row.anomaly_count or 0
+        stats['anomalies_after'] += summary['final_anomalies']
+        aggregates.set_analysis(row, summary)
+
+        perf_metrics = session_metrics.get(session_id)
+        if perf_metrics is not None and row.sample_count:
+            scores = aggregates.performance_scores(row)
+            if scores != (perf_metrics.balance_score, perf_metrics.stability_score, perf_metrics.injury_risk):
+                perf_metrics.balance_score, perf_metrics.stability_score, perf_metrics.injury_risk = scores
+                stats['metrics_changed'] += 1
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    return stats
+
+
+def _read_state(path):
+    if not path or not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_state(path, state):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _cursor(state):
+    if not state.get('cursor'):
+        return None
+    started_at, session_id = state['cursor']
+    return datetime.fromisoformat(started_at), uuid.UUID(session_id)
+
+
+# Re-scores every matching session with a model version. Needs an app context.
+# @param version: Registry version, 'latest' or None for the served one.
+# @param jobs: Worker processes; 1 scores in this process.
+# @param state_path: Progress file; a run with the same version and filters resumes from it. None disables resuming.
+# @param restart: Ignore an existing state file.
+# @param dry_run: Score without writing anything (no results cache, counters or state).
+# @param log: Callable receiving progress lines.
+# @return Final state dict (done, failed, windows, anomalies_before/after, metrics_changed, seconds, ...).
+def rescore_sessions(filters, version=None, registry_dir=REGISTRY_DIR, jobs=None, page_size=PAGE_SIZE,
+                     state_path=STATE_FILE, restart=False, dry_run=False, log=print):
+    version = served_version(version, registry_dir)
+    if version is None:
+        raise RuntimeError("Model registry is empty. Run train_lstm.py to register a model.")
+
+    state = None if restart or dry_run else _read_state(state_path)
+    if state and (state['version'] != version or state['filters'] != filters.to_dict()):
+        log(f"⚠️  {state_path} belongs to another run (version {state['version']}), starting over")
+        state = None
+    if state and state.get('finished'):
+        log(f"⏭️  Already finished: {state['done']} sessions re-scored with {version}")
+        return state
+    state = state or {
+        'version': version,
+        'filters': filters.to_dict(),
+        'cursor': None,
+        'done': 0,
+        'failed': [],
+        'skipped': 0,
+        'windows': 0,
+        'anomalies_before': 0,
+        'anomalies_after': 0,
+        'metrics_changed': 0,
+        'seconds': 0.0,
+    }
+    after = _cursor(state)
+    total = count_sessions(filters, after)
+    log(f"🔁 {total} sessions to re-score with {version}" + (" (resuming)" if after else "") + (" [dry run]" if dry_run else ""))
+
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    pool = None
+    if jobs > 1:
+        # Workers are spawned (no forked database connections) and load the artifact once
+        pool = ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=init_worker, initargs=(version, registry_dir))
+    else:
+        init_worker(version, registry_dir)
+
+    def submit(rows):
+        tasks = [(str(session_id), athlete and str(athlete), lift_type, not dry_run) for session_id, _, athlete, lift_type in rows]
+        if pool is None:
+            return tasks
+        return [pool.submit(rescore_task, task) for task in tasks]
+
+    def collect(pending):
+        if pool is None:
+            return [rescore_task(task) for task in pending]
+        return [future.result() for future in pending]
+
+    started = time.perf_counter()
+    previous_seconds = state['seconds']
+    processed = 0
+    try:
+        rows = session_page(filters, after, page_size)
+        pending = submit(rows)
+        while rows:
+            page_cursor = (rows[-1][1], rows[-1][0])
+            # Queue the next page before waiting, so workers stay busy while this page is written
+            next_rows = session_page(filters, page_cursor, page_size)
+            next_pending = submit(next_rows)
+
+            results = collect(pending)
+            page = apply_page(results, dry_run)
+            for key, value in page.items():
+                state[key] += value
+            state['failed'] += [r['session_id'] for r in results if r.get('error')]
+            state['skipped'] += sum(1 for r in results if not r.get('error') and not r.get('summary'))
+            state['done'] += len(results)
+            state['cursor'] = [page_cursor[0].isoformat(), str(page_cursor[1])]
+            processed += len(results)
+
+            elapsed = time.perf_counter() - started
+            state['seconds'] = previous_seconds + elapsed
+            if not dry_run and state_path:
+                _write_state(state_path, state)
+            log(f"   {processed}/{total} sessions, {processed / elapsed:.1f} sessions/s, "
+                f"{state['windows'] / max(state['seconds'], 1e-9):.0f} windows/s, {len(state['failed'])} failed")
+
+            rows, pending = next_rows, next_pending
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    state['finished'] = True
+    if not dry_run:
+        if state['metrics_changed']:
+            # Trend rollups sum the performance metrics
+            history.rebuild_rollups()
+        if state_path:
+            _write_state(state_path, state)
+    return state
@@ -0,0 +1,231 @@
+import logging
+import numpy as np
+from models import db, AnalysisResultChunk, RepSummary
+from services.emitter import BatchEmitter, FLAG_FINAL
+from services.logic_rules import render_alerts
+
+logger = logging.getLogger(__name__)
+
+# Cache of per-window analysis results.
+# Every window scored by an upload analysis is stored once per model version in analysis_results rows.
+# A row holds up to RESULT_CHUNK_ROWS windows packed like the binary datapoint_batch payload
+# (services/emitter.py), 18 bytes per window:
+#   float32 left[n], right[n], core[n], mse[n], uint8 flags[n], uint8 rule_codes[n]
+# start_index is the index of the window's first sample among the session's stored samples.
+#
+# The cache of a session is either complete for one model version or absent: writing results of a
+# new version deletes the other versions, and an analysis that did not finish (or a range that was
+# fine-tuned instead) drops the whole cache. Reads only return results of the served model version,
+# so nothing but a model change makes cached results stale.
+# Per-rep summaries of segmented analyses (services/segmentation.py) are rep_summaries rows cached the same way.
+
+RESULT_CHUNK_ROWS = 4096
+COLUMNS = ('left', 'right', 'core', 'mse', 'flags', 'rule_codes')
+FLOAT_DTYPE = np.dtype('<f4')
+# Bars of the anomaly timeline on the results page
+TIMELINE_BINS = 120
+
+
+# @return Packed bytes of one chunk of results.
+def encode_results(left, right, core, mse, flags, rule_codes):
+    floats = np.stack([left, right, core, mse]).astype(FLOAT_DTYPE)
+    return floats.tobytes() + np.asarray(flags, dtype=np.uint8).tobytes() + np.asarray(rule_codes, dtype=np.uint8).tobytes()
+
+
+# @return {column: array of n_windows values}
+def decode_results(data, n_windows):
+    floats = np.frombuffer(data, dtype=FLOAT_DTYPE, count=4 * n_windows).reshape(4, n_windows)
+    codes = np.frombuffer(data, dtype=np.uint8, offset=16 * n_windows).reshape(2, n_windows)
+    return dict(zip(COLUMNS, (*floats, *codes)))
+
+
+# Stores the results of consecutive windows; the caller commits.
+# @param start_index: Sample index of the first window.
+def save_results(session_id, version, start_index, left, right, core, mse, flags, rule_codes):
+    for offset in range(0, len(mse), RESULT_CHUNK_ROWS):
+        part = slice(offset, offset + RESULT_CHUNK_ROWS)
+        db.session.add(AnalysisResultChunk(
+            session=session_id,
+            model_version=version,
+            start_index=start_index + offset,
+            n_windows=len(mse[part]),
+            data=encode_results(left[part], right[part], core[part], mse[part], flags[part], rule_codes[part]),
+        ))
+
+
+# Stores the summaries of completed reps (see segmentation.RepTracker); the caller commits.
+# @param offset: Sample index of the analysed range's first row.
+def save_reps(session_id, version, reps, offset=0):
+    for rep in reps:
+        db.session.add(RepSummary(
+            session=session_id,
+            model_version=version,
+            start_index=offset + rep['start'],
+            stop_index=offset + rep['stop'],
+            turnaround_index=offset + rep['turnaround'],
+            windows=rep['windows'],
+            anomaly_count=rep['anomalies'],
+            max_mse=rep['max_mse'],
+            phases=rep['phases'],
+        ))
+
+
+# Deletes the cached results and rep summaries of a session; the caller commits.
+# @param keep_version: Version whose results are kept, None deletes all of them.
+def invalidate(session_id, keep_version=None):
+    deleted = 0
+    for model in (AnalysisResultChunk, RepSummary):
+        query = model.query.filter(model.session == session_id)
+        if keep_version is not None:
+            query = query.filter(model.model_version != keep_version)
+        deleted += query.delete(synchronize_session=False)
+    return deleted
+
+
+def has_results(session_id, version):
+    return db.session.query(
+        AnalysisResultChunk.query
+        .filter(AnalysisResultChunk.session == session_id, AnalysisResultChunk.model_version == version)
+        .exists()
+    ).scalar()
+
+
+# Number of cached windows of a session for one version.
+def window_count(session_id, version):
+    total = (
+        db.session.query(db.func.sum(AnalysisResultChunk.n_windows))
+        .filter(AnalysisResultChunk.session == session_id, AnalysisResultChunk.model_version == version)
+        .scalar()
+    )
+    return int(total or 0)
+
+
+# Yields (start_index, {column: array}) for the cached windows overlapping [start, stop), in order.
+def iter_results(session_id, version, start=0, stop=None):
+    query = AnalysisResultChunk.query.filter(
+        AnalysisResultChunk.session == session_id,
+        AnalysisResultChunk.model_version == version,
+        AnalysisResultChunk.start_index + AnalysisResultChunk.n_windows > start,
+    )
+    if stop is not None:
+        query = query.filter(AnalysisResultChunk.start_index < stop)
+
+    for chunk in query.order_by(AnalysisResultChunk.start_index).yield_per(16):
+        columns = decode_results(chunk.data, chunk.n_windows)
+        lo = max(start - chunk.start_index, 0)
+        hi = chunk.n_windows if stop is None else min(stop - chunk.start_index, chunk.n_windows)
+        yield chunk.start_index + lo, {name: values[lo:hi] for name, values in columns.items()}
+
+
+# Reads the cached windows overlapping [start, stop).
+# @return {'index': sample index of each window, column: array, ...}
+def read_results(session_id, version, start=0, stop=None):
+    parts = list(iter_results(session_id, version, start, stop))
+    result = {'index': np.concatenate([np.arange(first, first + len(columns['mse'])) for first, columns in parts])
+              if parts else np.empty(0, dtype=np.int64)}
+    for name in COLUMNS:
+        dtype = np.uint8 if name in ('flags', 'rule_codes') else FLOAT_DTYPE
+        result[name] = np.concatenate([columns[name] for _, columns in parts]) if parts else np.empty(0, dtype=dtype)
+    return result
+
+
+# Anomaly timeline of the cached windows, computed one chunk at a time.
+# @return List of bins {start, stop (sample indices), windows, anomalies, max_mse}.
+def timeline(session_id, version, bins=TIMELINE_BINS):
+    total = window_count(session_id, version)
+    if total == 0:
+        return []
+    per_bin = max(1, -(-total // bins))
+    counts = np.zeros(-(-total // per_bin), dtype=np.int64)
+    anomalies = np.zeros_like(counts)
+    max_mse = np.zeros(len(counts))
+    starts = np.full(len(counts), np.iinfo(np.int64).max)
+    stops = np.zeros_like(counts)
+    seen = 0
+    for start_index, columns in iter_results(session_id, version):
+        n = len(columns['mse'])
+        bin_ids = (seen + np.arange(n)) // per_bin
+        sample_index = start_index + np.arange(n)
+        np.add.at(counts, bin_ids, 1)
+        np.add.at(anomalies, bin_ids, (columns['flags'] & FLAG_FINAL) > 0)
+        np.maximum.at(max_mse, bin_ids, columns['mse'])
+        np.minimum.at(starts, bin_ids, sample_index)
+        np.maximum.at(stops, bin_ids, sample_index + 1)
+        seen += n
+    return [
+        {'start': int(starts[i]), 'stop': int(stops[i]), 'windows': int(counts[i]),
+         'anomalies': int(anomalies[i]), 'max_mse': float(max_mse[i])}
+        for i in range(len(counts))
+    ]
+
+
+# First final anomalies of the cached windows, with their rendered alerts.
+# @return List of {index (1-based sample), left, right, core, mse, alerts}.
+def anomalies(session_id, version, limit=100):
+    rows = []
+    for start_index, columns in iter_results(session_id, version):
+        for i in np.flatnonzero(columns['flags'] & FLAG_FINAL)[:limit - len(rows)]:
+            rows.append({
+                'index': start_index + int(i) + 1,
+                'left': float(columns['left'][i]),
+                'right': float(columns['right'][i]),
+                'core': float(columns['core'][i]),
+                'mse': float(columns['mse'][i]),
+                'alerts': render_alerts(int(columns['rule_codes'][i])),
+            })
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+# Cached rep summaries of a session, in order.
+# @return List of {rep (1-based), start, stop, turnaround (sample indices), windows, anomalies, max_mse, phases}.
+def read_reps(session_id, version):
+    rows = (
+        RepSummary.query
+        .filter(RepSummary.session == session_id, RepSummary.model_version == version)
+        .order_by(RepSummary.start_index)
+    )
+    return [
+        {'rep': number, 'start': row.start_index, 'stop': row.stop_index, 'turnaround': row.turnaround_index,
+         'windows': row.windows, 'anomalies': row.anomaly_count, 'max_mse': row.max_mse, 'phases': row.phases}
+        for number, row in enumerate(rows, 1)
+    ]
+
+
+# Re-emits the cached results of a session as datapoint_batch events, followed by analysis_complete.
+# @return Number of windows sent, None if the delivery was cancelled.
+def replay(session_id, version, socketio, cancel_event=None, room=None):
+    room = room or session_id
+    emitter = BatchEmitter(socketio, room, cancel_event=cancel_event)
+    windows = 0
+    for start_index, columns in iter_results(session_id, version):
+        if not emitter.emit_arrays(*(columns[name] for name in COLUMNS), start_index=start_index + 1):
+            return None
+        windows += len(columns['mse'])
+    socketio.emit('analysis_complete', {'message': f'Cached analysis of model {version} replayed.'}, room=room)
+    return windows
+
+
+# Result sink of one analysed sample range (see run_analysis_realtime).
+# @session_id = Session whose results are stored.
+# @version = Model version that produced them.
+# @offset = Sample index of the first analysed row.
+class ResultWriter:
+    def __init__(self, session_id, version, offset=0):
+        self.session_id = session_id
+        self.version = version
+        self.offset = offset
+        self.windows = 0
+
+    # Stores and commits one scored block.
+    # @param start: Index of the block's first window in the analysed range.
+    def write(self, start, left, right, core, mse, flags, rule_codes):
+        save_results(self.session_id, self.version, self.offset + start, left, right, core, mse, flags, rule_codes)
+        db.session.commit()
+        self.windows += len(mse)
+
+    # Stores and commits the summaries of completed reps.
+    def write_reps(self, reps):
+        save_reps(self.session_id, self.version, reps, self.offset)
+        db.session.commit()
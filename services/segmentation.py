@@ -0,0 +1,217 @@
+import os
+import numpy as np
+from services.logic_rules import render_alerts
+
+# Rep and phase segmentation of a recording, run on the scaled samples ahead of the detectors.
+# The mean foot pressure and the core stability are smoothed over REP_SMOOTH_ROWS samples; their moving
+# standard deviation over REP_ENERGY_ROWS samples is the motion energy of the lift. A rep starts when the
+# energy rises above REP_ENTER_LEVEL and the stretch of reps (usually a set) ends once it stayed below
+# REP_EXIT_LEVEL for REP_MIN_GAP_ROWS samples (hysteresis, so noise at rest and the turnarounds inside a rep
+# do not split it). Everything is computed block by block with NumPy and the state carried between blocks,
+# so long recordings are labelled in one streaming pass. Only windows starting inside an active stretch are
+# scored; rest between sets is skipped.
+# A stretch is split into reps where the smoothed foot pressure returns to the rest level (split_reps),
+# and each rep into its eccentric and concentric phase at the turnaround, the sample where the pressure is
+# furthest from that level.
+#
+# Configuration (environment):
+#   REP_SEGMENTATION=true       score only rep windows and store per-rep summaries (default false)
+#   REP_SMOOTH_ROWS             samples of the smoothing moving average (default 5)
+#   REP_ENERGY_ROWS             samples of the motion energy window (default 25)
+#   REP_ENTER_LEVEL             energy starting a rep and pressure excursion of a rep, in scaled units (default 0.03)
+#   REP_EXIT_LEVEL              energy at rest and pressure back at the rest level (default 0.015)
+#   REP_MIN_GAP_ROWS            rest samples ending a stretch of reps (default 25)
+
+REP_SEGMENTATION = os.getenv('REP_SEGMENTATION', 'false').lower() in ('1', 'true', 'yes')
+REP_SMOOTH_ROWS = int(os.getenv('REP_SMOOTH_ROWS', '5'))
+REP_ENERGY_ROWS = int(os.getenv('REP_ENERGY_ROWS', '25'))
+REP_ENTER_LEVEL = float(os.getenv('REP_ENTER_LEVEL', '0.03'))
+REP_EXIT_LEVEL = float(os.getenv('REP_EXIT_LEVEL', '0.015'))
+REP_MIN_GAP_ROWS = int(os.getenv('REP_MIN_GAP_ROWS', '25'))
+# Active stretches longer than this are closed, so a recording without rest keeps a bounded buffer
+MAX_ACTIVE_ROWS = 6000
+
+PHASES = ('eccentric', 'concentric')
+PHASE_NAMES = {'eccentric': 'eksantrik', 'concentric': 'konsantrik'}
+
+
+# Causal moving mean of the new rows, continuing the rows seen before.
+# @param history: Last width - 1 rows seen before (fewer at the start of the recording).
+# @return (means, new history)
+def _moving_mean(values, history, width):
+    x = np.concatenate([history, values]) if len(history) else values
+    sums = np.concatenate([np.zeros((1,) + x.shape[1:]), np.cumsum(x, axis=0)])
+    end = np.arange(len(history), len(x)) + 1
+    begin = np.maximum(end - width, 0)
+    counts = (end - begin).reshape((-1,) + (1,) * (x.ndim - 1))
+    return (sums[end] - sums[begin]) / counts, x[max(len(x) - (width - 1), 0):] if width > 1 else x[:0]
+
+
+# Labels samples as rep / rest in one streaming pass.
+# The energy windows are causal; labels are returned `lag` samples late so each label is centred on
+# the windows it was computed from, and finish() labels the last samples with the final state.
+class RepSegmenter:
+    def __init__(self, smooth_rows=None, energy_rows=None, enter_level=None, exit_level=None, min_gap_rows=None):
+        self.smooth_rows = smooth_rows or REP_SMOOTH_ROWS
+        self.energy_rows = energy_rows or REP_ENERGY_ROWS
+        self.enter_level = REP_ENTER_LEVEL if enter_level is None else enter_level
+        self.exit_level = REP_EXIT_LEVEL if exit_level is None else exit_level
+        self.min_gap_rows = min_gap_rows or REP_MIN_GAP_ROWS
+        if self.exit_level > self.enter_level:
+            raise ValueError("REP_EXIT_LEVEL must not be above REP_ENTER_LEVEL")
+        self.lag = (self.smooth_rows - 1) // 2 + (self.energy_rows - 1) // 2
+        self.raw_history = np.empty((0, 2))
+        self.smooth_history = np.empty((0, 2))
+        self.square_history = np.empty((0, 2))
+        self.active = False
+        self.quiet_run = 0
+        self.seen = 0
+        self.skipped = 0
+
+    # @param scaled: Scaled rows (n, 3) in FEATURES order.
+    # @return Boolean rep labels of the next samples (up to `lag` samples behind the input).
+    def update(self, scaled):
+        scaled = np.asarray(scaled, dtype=np.float64)
+        signal = np.stack([(scaled[:, 0] + scaled[:, 1]) / 2, scaled[:, 2]], axis=1)
+        smooth, self.raw_history = _moving_mean(signal, self.raw_history, self.smooth_rows)
+        mean, self.smooth_history = _moving_mean(smooth, self.smooth_history, self.energy_rows)
+        mean_square, self.square_history = _moving_mean(smooth ** 2, self.square_history, self.energy_rows)
+        energy = np.sqrt(np.maximum(mean_square - mean ** 2, 0).sum(axis=1))
+        states = self._hysteresis(energy)
+        self.seen += len(states)
+
+        skip = min(self.lag - self.skipped, len(states))
+        self.skipped += skip
+        return states[skip:]
+
+    # @return Labels of the samples still held back.
+    def finish(self):
+        return np.full(min(self.lag, self.seen), self.active)
+
+    # Schmitt trigger over the energy: rows above the enter level start (or continue) a rep, a rest run of
+    # min_gap_rows rows ends it; the state of every other row is the state after the last such event.
+    def _hysteresis(self, energy):
+        n = len(energy)
+        index = np.arange(n)
+        quiet = energy < self.exit_level
+        last_busy = np.maximum.accumulate(np.where(quiet, -1 - self.quiet_run, index))
+        quiet_run = index - last_busy
+        events = np.where(energy > self.enter_level, 1, np.where(quiet_run >= self.min_gap_rows, 0, -1))
+        last_event = np.maximum.accumulate(np.where(events >= 0, index, -1))
+        states = np.where(last_event >= 0, events[np.maximum(last_event, 0)] == 1, self.active)
+        if n:
+            self.active = bool(states[-1])
+            self.quiet_run = int(quiet_run[-1])
+        return states
+
+
+# @return [(start, stop)] of the runs of True in a boolean array.
+def runs(labels):
+    edges = np.diff(np.concatenate([[0], np.asarray(labels, dtype=np.int8), [0]]))
+    return list(zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()))
+
+
+# Summary of one phase of a rep.
+def _phase_summary(left, right, core, mse, final, rule_codes):
+    if len(mse) == 0:
+        return {'rows': 0, 'anomalies': 0, 'max_mse': 0.0, 'mean_imbalance': 0.0, 'min_core': None, 'rule_codes': 0}
+    return {
+        'rows': int(len(mse)),
+        'anomalies': int(np.count_nonzero(final)),
+        'max_mse': float(np.max(mse)),
+        'mean_imbalance': float(np.mean(np.abs(left - right))),
+        'min_core': float(np.min(core)),
+        'rule_codes': int(np.bitwise_or.reduce(rule_codes)),
+    }
+
+
+# Splits an active stretch into reps: a rep is one excursion of the smoothed foot pressure away from the
+# rest level (above REP_ENTER_LEVEL for at least REP_SMOOTH_ROWS rows), and consecutive reps are split where
+# the pressure comes closest to the rest level between their excursions, so reps done without a pause
+# between them (touch-and-go) are still told apart.
+# @param deviation: |smoothed mean foot pressure - rest level| of each row of the stretch.
+# @return [(start, stop)] covering the stretch.
+def split_reps(deviation):
+    excursions = [(a, b) for a, b in runs(deviation > REP_ENTER_LEVEL) if b - a >= REP_SMOOTH_ROWS]
+    bounds = [0]
+    for (_, previous_stop), (next_start, _) in zip(excursions, excursions[1:]):
+        bounds.append(previous_stop + int(np.argmin(deviation[previous_stop:next_start])))
+    bounds.append(len(deviation))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+# Collects the scored windows of active stretches and summarises their reps once a stretch is complete.
+# Scored pieces must be added in order; a piece that does not continue the open stretch starts a new one.
+# @closed = Summaries of the reps completed since they were last taken (take()).
+# @count = Number of reps completed so far.
+class RepTracker:
+    def __init__(self):
+        self.pieces = []
+        self.start = None
+        self.stop = None
+        self.closed = []
+        self.count = 0
+
+    # @param start: Index of the piece's first window in the analysed range.
+    def add(self, start, left, right, core, mse, final, rule_codes):
+        if self.pieces and start != self.stop:
+            self.close()
+        if not self.pieces:
+            self.start = start
+        self.pieces.append((left, right, core, mse, final, rule_codes))
+        self.stop = start + len(mse)
+        if self.stop - self.start >= MAX_ACTIVE_ROWS:
+            self.close()
+
+    # Summarises the reps of the open stretch. Each rep is split into its phases at the turnaround.
+    def close(self):
+        if not self.pieces:
+            return
+        columns = [np.concatenate(column) for column in zip(*self.pieces)]
+        pressure = (np.asarray(columns[0], dtype=np.float64) + columns[1]) / 2
+        smooth, _ = _moving_mean(pressure, np.empty(0), REP_SMOOTH_ROWS)
+        # A stretch ends with REP_MIN_GAP_ROWS rows at rest, which give the rest level
+        deviation = np.abs(smooth - np.median(smooth[-REP_MIN_GAP_ROWS:]))
+        for a, b in split_reps(deviation):
+            left, right, core, mse, final, rule_codes = (column[a:b] for column in columns)
+            turnaround = int(np.argmax(deviation[a:b]))
+            eccentric, concentric = slice(0, turnaround), slice(turnaround, None)
+            self.closed.append({
+                'start': self.start + a,
+                'stop': self.start + b,
+                'turnaround': self.start + a + turnaround,
+                'windows': int(len(mse)),
+                'anomalies': int(np.count_nonzero(final)),
+                'max_mse': float(np.max(mse)),
+                'phases': {
+                    phase: _phase_summary(left[part], right[part], core[part], mse[part], final[part], rule_codes[part])
+                    for phase, part in zip(PHASES, (eccentric, concentric))
+                },
+            })
+            self.count += 1
+        self.pieces = []
+
+    # @return Summaries of the reps completed since the last call.
+    def take(self):
+        closed, self.closed = self.closed, []
+        return closed
+
+
+# Feedback lines for the reps with anomalies, worst phases first.
+# @param reps: Rep summaries in order (see RepTracker), e.g. results_store.read_reps.
+# @return List of alert strings, at most `limit`.
+def rep_alerts(reps, limit=3):
+    problems = []
+    for number, rep in enumerate(reps, 1):
+        for phase in PHASES:
+            stats = rep['phases'][phase]
+            if stats['anomalies']:
+                problems.append((stats['anomalies'], number, phase, stats['rule_codes']))
+    problems.sort(key=lambda p: (-p[0], p[1]))
+    alerts = []
+    for anomalies, number, phase, rule_codes in problems[:limit]:
+        alert = f"{number}. tekrar, {PHASE_NAMES[phase]} faz: {anomalies} anomali"
+        if rule_codes:
+            alert += f" ({render_alerts(rule_codes)})"
+        alerts.append(alert + ".")
+    return alerts
@@ -0,0 +1,196 @@
+import logging
+import numpy as np
+from models import db, SensorData, SensorChunk, Sessions
+from services import aggregates
+
+logger = logging.getLogger(__name__)
+
+# Columnar sensor-data storage.
+# A session has one SensorData header row and any number of sensor_chunks rows.
+# Each chunk holds up to CHUNK_ROWS samples as little-endian float32, channel-major:
+#   left_foot_pressure[n] + right_foot_pressure[n] + core_stability[n]
+# so appending is an INSERT and range reads only decode the chunks they touch.
+# Every write also updates the session's running aggregates (services/aggregates.py); migrating legacy
+# rows recomputes them from the stored chunks instead, so rows already counted are not counted twice.
+# Legacy headers (storage_format='json') keep their rows in SensorData.raw_data until migrated.
+
+FEATURES = ['left_foot_pressure', 'right_foot_pressure', 'core_stability']
+CHUNK_ROWS = 4096
+CHUNK_DTYPE = np.dtype('<f4')
+
+
+# @param samples: Array of shape (n, 3).
+# @return Packed bytes of the chunk.
+def encode_chunk(samples):
+    return np.ascontiguousarray(np.asarray(samples, dtype=CHUNK_DTYPE).T).tobytes()
+
+
+# @return Array of shape (n_samples, 3).
+def decode_chunk(data, n_samples):
+    return np.frombuffer(data, dtype=CHUNK_DTYPE).reshape(len(FEATURES), n_samples).T
+
+
+# Returns the SensorData header of a session, creating a columnar one if needed.
+# Sessions with a legacy JSON header are migrated first so new samples can be appended.
+def get_or_create_header(session_obj):
+    header = _find_header(session_obj.id)
+    if header is not None and header.storage_format == 'json':
+        migrate_header(header)
+    if header is None:
+        header = SensorData(
+            session=session_obj.id,
+            athlete=session_obj.athlete,
+            storage_format='columnar',
+            sample_count=0,
+        )
+        db.session.add(header)
+        db.session.flush()
+        session_obj.sensor_data_id = header.id
+    return header
+
+
+# Columnar header of a session if it has one, else its first legacy header.
+def _find_header(session_id):
+    return (
+        SensorData.query
+        .filter(SensorData.session == session_id)
+        .order_by(SensorData.storage_format)  # 'columnar' < 'json'
+        .first()
+    )
+
+
+# Appends samples to a session; the caller commits.
+# @param samples: Array-like of shape (n, 3) in FEATURES order.
+# @return Updated SensorData header.
+def append_samples(session_obj, samples):
+    samples = np.asarray(samples, dtype=CHUNK_DTYPE).reshape(-1, len(FEATURES))
+    header = get_or_create_header(session_obj)
+    _write_chunks(header, samples)
+    return header
+
+
+# @param count_samples: Add the samples to the session aggregates; migrations rebuild them instead
+#                       (_rebuild_aggregates), since legacy rows may already be counted.
+def _write_chunks(header, samples, count_samples=True):
+    start_index = header.sample_count or 0
+    for offset in range(0, len(samples), CHUNK_ROWS):
+        chunk = samples[offset:offset + CHUNK_ROWS]
+        db.session.add(SensorChunk(
+            session=header.session,
+            sensor_data=header.id,
+            start_index=start_index + offset,
+            n_samples=len(chunk),
+            data=encode_chunk(chunk),
+        ))
+    header.sample_count = start_index + len(samples)
+    if count_samples:
+        aggregates.add_samples(header.session, samples)
+
+
+# Recomputes a session's sample aggregates from its stored chunks after a migration.
+def _rebuild_aggregates(session_id):
+    db.session.flush()
+    aggregates.rebuild_samples(session_id, (samples for _, samples in iter_chunks(session_id)))
+
+
+# Number of stored samples of a session.
+def sample_count(session_id):
+    header = _find_header(session_id)
+    if header is None:
+        return 0
+    if header.storage_format == 'json':
+        return len(header.raw_data or [])
+    return header.sample_count
+
+
+# Yields (start_index, samples) for the chunks overlapping [start, stop), in order.
+def iter_chunks(session_id, start=0, stop=None):
+    header = _find_header(session_id)
+    if header is None:
+        return
+    if header.storage_format == 'json':
+        rows = _json_rows_to_array(header.raw_data or [])
+        rows = rows[start:stop]
+        if len(rows):
+            yield start, rows
+        return
+
+    query = SensorChunk.query.filter(
+        SensorChunk.session == session_id,
+        SensorChunk.start_index + SensorChunk.n_samples > start,
+    )
+    if stop is not None:
+        query = query.filter(SensorChunk.start_index < stop)
+
+    for chunk in query.order_by(SensorChunk.start_index).yield_per(16):
+        samples = decode_chunk(chunk.data, chunk.n_samples)
+        lo = max(start - chunk.start_index, 0)
+        hi = chunk.n_samples if stop is None else min(stop - chunk.start_index, chunk.n_samples)
+        yield chunk.start_index + lo, samples[lo:hi]
+
+
+# Reads samples [start, stop) of a session.
+# @return Array of shape (n, 3), empty if the session has no data.
+def read_samples(session_id, start=0, stop=None):
+    parts = [samples for _, samples in iter_chunks(session_id, start, stop)]
+    if not parts:
+        return np.empty((0, len(FEATURES)), dtype=CHUNK_DTYPE)
+    return np.concatenate(parts)
+
+
+def _json_rows_to_array(rows):
+    return np.array(
+        [[row.get(feature, np.nan) for feature in FEATURES] for row in rows],
+        dtype=CHUNK_DTYPE,
+    ).reshape(-1, len(FEATURES))
+
+
+# Converts one legacy JSON header to columnar chunks; the caller commits.
+def migrate_header(header):
+    samples = _json_rows_to_array(header.raw_data or [])
+    header.storage_format = 'columnar'
+    header.sample_count = 0
+    header.raw_data = None
+    _write_chunks(header, samples, count_samples=False)
+    _rebuild_aggregates(header.session)
+    return len(samples)
+
+
+# Migrates legacy JSON sensor data to columnar chunks, one committed batch at a time.
+# Sessions with several legacy upload rows are merged into the first header.
+# @param batch_size: Headers converted per commit.
+# @return Number of converted headers.
+def migrate_json_rows(batch_size=50):
+    converted = 0
+    while True:
+        headers = (
+            SensorData.query
+            .filter(SensorData.storage_format == 'json')
+            .order_by(SensorData.created_at)
+            .limit(batch_size)
+            .all()
+        )
+        if not headers:
+            break
+        for header in headers:
+            primary = (
+                SensorData.query
+                .filter(SensorData.session == header.session, SensorData.storage_format == 'columnar')
+                .first()
+            )
+            if primary is None:
+                rows = migrate_header(header)
+            else:
+                # Extra legacy upload of a session: append its rows to the existing header
+                rows = len(header.raw_data or [])
+                _write_chunks(primary, _json_rows_to_array(header.raw_data or []), count_samples=False)
+                Sessions.query.filter(Sessions.sensor_data_id == header.id).update(
+                    {Sessions.sensor_data_id: primary.id}, synchronize_session=False
+                )
+                db.session.delete(header)
+                _rebuild_aggregates(header.session)
+            db.session.flush()
+            converted += 1
+            logger.info(f"Migrated sensor data {header.id} ({rows} samples)")
+        db.session.commit()
+    return converted
@@ -0,0 +1,204 @@
+import logging
+import os
+import threading
+import numpy as np
+from services.logic_rules import evaluate_rules, render_alerts
+from services.model_registry import get_active_artifact
+from services.batching import get_batcher, INFERENCE_BATCHING
+from services.quantiles import ThresholdTracker
+
+logger = logging.getLogger(__name__)
+
+# STREAM_ADAPTIVE_SCALING = Widen each live session's normalizer with the samples it receives
+STREAM_ADAPTIVE_SCALING = os.getenv('STREAM_ADAPTIVE_SCALING', 'false').lower() in ('1', 'true', 'yes')
+# STREAM_ADAPTIVE_THRESHOLD = Track each model's MSE threshold over the live windows it scores (P² quantile,
+#                             started from the calibration stored with the model) instead of the fixed threshold
+# STREAM_THRESHOLD_MEMORY = Windows the stored calibration weighs as when tracking starts (lower adapts faster)
+STREAM_ADAPTIVE_THRESHOLD = os.getenv('STREAM_ADAPTIVE_THRESHOLD', 'false').lower() in ('1', 'true', 'yes')
+STREAM_THRESHOLD_MEMORY = int(os.getenv('STREAM_THRESHOLD_MEMORY', '10000'))
+
+
+# Threshold trackers by artifact (version and folder, as baselines of several athletes may share a version),
+# shared by the live sessions scored with that artifact.
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def get_threshold_tracker(artifact):
+    with _trackers_lock:
+        key = (artifact.version, artifact.path)
+        tracker = _trackers.get(key)
+        if tracker is None:
+            tracker = ThresholdTracker(
+                artifact.threshold,
+                percentile=artifact.meta.get('threshold_percentile', 95),
+                calibration=artifact.meta.get('threshold_calibration'),
+                memory=STREAM_THRESHOLD_MEMORY,
+            )
+            _trackers[key] = tracker
+        return tracker
+
+
+# Fixed-size ring buffer holding the last `capacity` sensor rows.
+# Every row is written twice (at pos and pos + capacity) so the current window
+# is always one contiguous slice: append and window() are O(1) and never allocate.
+# @capacity = Number of rows kept (the LSTM timesteps).
+# @n_features = Number of sensor channels per row.
+class RingBuffer:
+    def __init__(self, capacity, n_features, dtype=np.float32):
+        self.capacity = capacity
+        self._data = np.zeros((2 * capacity, n_features), dtype=dtype)
+        self._pos = 0
+        self._size = 0
+
+    def append(self, row):
+        self._data[self._pos] = row
+        self._data[self._pos + self.capacity] = row
+        self._pos = (self._pos + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    @property
+    def full(self):
+        return self._size == self.capacity
+
+    def __len__(self):
+        return self._size
+
+    # @return View of the last `capacity` rows, oldest first.
+    def window(self):
+        return self._data[self._pos:self._pos + self.capacity]
+
+
+# Incremental analysis of one live session.
+# Samples are pushed one at a time or in small chunks; as soon as a window of
+# `timesteps` rows is complete it is scored with the registered LSTM autoencoder,
+# the artifact's pre-fitted Isolation Forest / One-Class SVM (if any) and the logical rules.
+# Memory is bounded by the ring buffer and the chunk size.
+# @session_id = Session the samples belong to.
+# @artifact = ModelArtifact used for scaling, scoring and the MSE threshold.
+# @lift_type = Lift type whose logic rule thresholds are used.
+# @adaptive_scaling = If True the session gets its own copy of the artifact's normalizer, updated
+#                     online (partial_fit) with every chunk so values outside the training range stay in scale.
+# @batcher = InferenceBatcher shared with the other live sessions; defaults to the process-wide one
+#            when INFERENCE_BATCHING is on, otherwise windows are scored with model.predict directly.
+# @adaptive_threshold = If True each window is flagged against the artifact's tracked threshold
+#                       (get_threshold_tracker) at the time it is scored, instead of the fixed one.
+class StreamingAnalyzer:
+    features = ['left_foot_pressure', 'right_foot_pressure', 'core_stability']
+
+    def __init__(self, session_id, artifact=None, lift_type=None, adaptive_scaling=STREAM_ADAPTIVE_SCALING, batcher=None,
+                 adaptive_threshold=STREAM_ADAPTIVE_THRESHOLD):
+        self.session_id = session_id
+        self.lift_type = lift_type
+        self.artifact = artifact or get_active_artifact()
+        if self.artifact is None:
+            raise RuntimeError("Streaming analysis needs a registered model. Run train_lstm.py first.")
+        self.timesteps = self.artifact.timesteps
+        self.threshold = self.artifact.threshold
+        self.threshold_tracker = get_threshold_tracker(self.artifact) if adaptive_threshold else None
+        self.adaptive_scaling = adaptive_scaling
+        self.normalizer = self.artifact.scaler.copy() if adaptive_scaling else self.artifact.scaler
+        self.batcher = batcher or (get_batcher() if INFERENCE_BATCHING else None)
+        self.buffer = RingBuffer(self.timesteps, len(self.features))
+        self.samples_seen = 0
+        self.windows_scored = 0
+        self.lock = threading.Lock()
+
+    # Scales raw rows with the session normalizer; only the new chunk is touched, never the whole recording.
+    def _scale(self, samples):
+        if self.adaptive_scaling:
+            self.normalizer.partial_fit(samples)
+        return self.normalizer.transform(samples)
+
+    # Feeds new samples to the analyzer.
+    # @param samples: Array-like of shape (n, 3) or (3,) with left/right/core values.
+    # @return List of result dicts, one per window completed by these samples.
+    def push(self, samples):
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1, len(self.features))
+        samples = samples[~np.isnan(samples).any(axis=1)]
+        if len(samples) == 0:
+            return []
+
+        with self.lock:
+            scaled = self._scale(samples)
+            windows = np.empty((len(scaled), self.timesteps, len(self.features)), dtype=np.float32)
+            indices = []
+            n_windows = 0
+            for row in scaled:
+                self.buffer.append(row)
+                self.samples_seen += 1
+                if self.buffer.full:
+                    windows[n_windows] = self.buffer.window()
+                    indices.append(self.samples_seen)
+                    n_windows += 1
+
+            if n_windows == 0:
+                return []
+            windows = windows[:n_windows]
+
+            if self.batcher is not None:
+                mse = self.batcher.score(self.artifact.model, windows)
+            else:
+                X_pred = self.artifact.model.predict(windows, verbose=0)
+                mse = np.mean(np.power(windows - X_pred, 2), axis=(1, 2))
+            self.windows_scored += n_windows
+
+        threshold = self.threshold_tracker.observe(mse) if self.threshold_tracker else self.threshold
+        # The newest row of each window is the sample being reported
+        latest = windows[:, -1, :]
+        codes = evaluate_rules(latest[:, 0], latest[:, 1], latest[:, 2], mse, threshold, self.lift_type)
+
+        lstm_anomalies = mse > threshold
+        if self.artifact.iso_detector and self.artifact.svm_detector:
+            iso_anomalies = self.artifact.iso_detector.predict(latest)
+            svm_anomalies = self.artifact.svm_detector.predict(latest)
+        else:
+            iso_anomalies = svm_anomalies = np.zeros(len(latest), dtype=bool)
+        final_anomalies = lstm_anomalies | (iso_anomalies & svm_anomalies)
+
+        results = []
+        for i, (row, index, error, code) in enumerate(zip(latest, indices, mse, codes)):
+            results.append({
+                'index': index,
+                'left': float(row[0]),
+                'right': float(row[1]),
+                'core': float(row[2]),
+                'mse': float(error),
+                'lstm_anomaly': bool(lstm_anomalies[i]),
+                'iso_anomaly': bool(iso_anomalies[i]),
+                'svm_anomaly': bool(svm_anomalies[i]),
+                'final_anomaly': bool(final_anomalies[i]),
+                'rule_code': int(code),
+                'logic_alert': render_alerts(int(code)),
+            })
+        return results
+
+
+# Live analyzers by session id.
+_streams = {}
+_streams_lock = threading.Lock()
+
+
+# Returns the analyzer for a session, creating it on first use.
+def get_stream(session_id, artifact=None, lift_type=None):
+    with _streams_lock:
+        stream = _streams.get(session_id)
+        if stream is None:
+            stream = StreamingAnalyzer(session_id, artifact, lift_type)
+            _streams[session_id] = stream
+            logger.info(f"Streaming analyzer opened for session {session_id}")
+        return stream
+
+
+# Drops the analyzer of a finished session.
+def close_stream(session_id):
+    with _streams_lock:
+        stream = _streams.pop(session_id, None)
+    if stream:
+        logger.info(f"Streaming analyzer closed for session {session_id} ({stream.samples_seen} samples)")
+    return stream
+
+
+# Number of sessions with an open analyzer.
+def active_stream_count():
+    return len(_streams)
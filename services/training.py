@@ -0,0 +1,258 @@
+import glob
+import json
+import logging
+import os
+import numpy as np
+from utils.data_preprocessing import read_csv_chunks
+from utils.windowing import sliding_windows, window_count
+from services.normalization import MinMaxNormalizer
+from services.lstm_runtime import predict_mse
+
+logger = logging.getLogger(__name__)
+
+# Offline training pipeline of the LSTM autoencoder (used by train_lstm.py).
+# Recordings are never loaded whole: every pass reads the CSV files in chunks, and the windows are
+# streamed into model.fit through a shuffling, prefetching tf.data pipeline. Windows never span two files.
+# The last `validation_split` of each recording's rows is held out for validation (val_loss).
+#
+# Each trial (timesteps + layer sizes) keeps its state under <checkpoint_dir>/<trial name>/:
+#   last.weights.h5 + state.json -> weights and progress after the last finished epoch (resume point)
+#   best.weights.h5              -> weights of the best val_loss so far
+# Re-running a sweep continues unfinished trials from last.weights.h5 and skips finished ones.
+
+FEATURES = ['left_foot_pressure', 'right_foot_pressure', 'core_stability']
+CHUNK_ROWS = 65536
+SHUFFLE_BUFFER = 16384
+# Rows sampled over the training split to fit Isolation Forest / One-Class SVM
+DETECTOR_SAMPLE_ROWS = 50000
+LAST_WEIGHTS = 'last.weights.h5'
+BEST_WEIGHTS = 'best.weights.h5'
+STATE_FILE = 'state.json'
+
+
+# Expands files, directories (their *.csv files) and glob patterns into a sorted list of CSV paths.
+# @raise ValueError if nothing matches.
+def expand_inputs(paths):
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            files.update(glob.glob(os.path.join(path, '*.csv')))
+        else:
+            files.update(match for match in glob.glob(path) if os.path.isfile(match))
+    if not files:
+        raise ValueError(f"No training CSV found in: {', '.join(paths)}")
+    return sorted(files)
+
+
+# Yields the float32 rows of a recording chunk by chunk, without NaN rows.
+def iter_rows(path, features=FEATURES, chunk_rows=CHUNK_ROWS):
+    for chunk in read_csv_chunks(path, features, chunk_rows):
+        chunk = chunk[~np.isnan(chunk).any(axis=1)]
+        if len(chunk):
+            yield chunk
+
+
+# One pass over every recording: fits the normalizer and counts the clean rows.
+# @return (MinMaxNormalizer, {path: rows})
+def scan_recordings(files, features=FEATURES, chunk_rows=CHUNK_ROWS):
+    normalizer = MinMaxNormalizer()
+    counts = {}
+    for path in files:
+        counts[path] = 0
+        for chunk in iter_rows(path, features, chunk_rows):
+            normalizer.partial_fit(chunk)
+            counts[path] += len(chunk)
+    return normalizer, counts
+
+
+# Row range [start, stop) of a recording in the 'train' or 'val' split.
+def split_range(n_rows, split, validation_split):
+    n_train = int(n_rows * (1 - validation_split))
+    return (0, n_train) if split == 'train' else (n_train, n_rows)
+
+
+# Number of windows of a split over all recordings.
+def split_window_count(counts, timesteps, split, validation_split):
+    total = 0
+    for n_rows in counts.values():
+        start, stop = split_range(n_rows, split, validation_split)
+        total += window_count(stop - start, timesteps)
+    return total
+
+
+# Yields scaled blocks of rows [start, stop) of a recording. Each block starts with the last
+# `timesteps` rows of the previous one, so windowing the blocks separately gives every window once.
+def iter_scaled_blocks(path, normalizer, timesteps, start=0, stop=None, features=FEATURES, chunk_rows=CHUNK_ROWS):
+    offset = 0
+    tail = np.empty((0, len(features)), dtype=np.float32)
+    for chunk in iter_rows(path, features, chunk_rows):
+        lo = max(start - offset, 0)
+        hi = len(chunk) if stop is None else min(stop - offset, len(chunk))
+        offset += len(chunk)
+        if hi <= lo:
+            if stop is not None and offset >= stop:
+                break
+            continue
+        data = np.concatenate([tail, normalizer.transform(chunk[lo:hi])])
+        if len(data) > timesteps:
+            yield data
+        tail = data[-timesteps:]
+
+
+# Yields contiguous float32 windows of rows [start, stop) of a recording, one block at a time.
+def iter_windows(path, normalizer, timesteps, start=0, stop=None, chunk_rows=CHUNK_ROWS):
+    for data in iter_scaled_blocks(path, normalizer, timesteps, start, stop, chunk_rows=chunk_rows):
+        yield np.ascontiguousarray(sliding_windows(data, timesteps), dtype=np.float32)
+
+
+# tf.data pipeline of (X, X) batches of one split.
+# Window blocks are produced by a Python generator, unbatched, shuffled (train split) in a bounded
+# buffer, batched and prefetched so reading and scaling the next files overlaps training.
+def window_dataset(files, counts, normalizer, timesteps, split, validation_split, batch_size=32,
+                   shuffle_buffer=SHUFFLE_BUFFER, chunk_rows=CHUNK_ROWS):
+    import tensorflow as tf
+
+    def generator():
+        for path in files:
+            start, stop = split_range(counts[path], split, validation_split)
+            yield from iter_windows(path, normalizer, timesteps, start, stop, chunk_rows)
+
+    dataset = tf.data.Dataset.from_generator(
+        generator, output_signature=tf.TensorSpec(shape=(None, timesteps, len(FEATURES)), dtype=tf.float32)
+    ).unbatch()
+    if split == 'train' and shuffle_buffer:
+        dataset = dataset.shuffle(shuffle_buffer, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).map(lambda X: (X, X)).prefetch(tf.data.AUTOTUNE)
+
+
+def trial_name(timesteps, units):
+    return f"t{timesteps}-u{'-'.join(str(u) for u in units)}"
+
+
+def _read_state(trial_dir):
+    path = os.path.join(trial_dir, STATE_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_state(trial_dir, state):
+    path = os.path.join(trial_dir, STATE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+# Trains one sweep configuration; runs in a worker process of the sweep.
+# @param config: Dict with files, counts, normalizer (to_dict), timesteps, units, epochs, batch_size,
+#                patience, validation_split, checkpoint_dir, threads, chunk_rows, fresh, verbose.
+# @return {name, timesteps, units, val_loss, epochs, stopped_early, weights}
+def train_trial(config):
+    import tensorflow as tf
+    from services.lstm_model import build_lstm_autoencoder
+
+    if config.get('threads'):
+        tf.config.threading.set_intra_op_parallelism_threads(config['threads'])
+        tf.config.threading.set_inter_op_parallelism_threads(max(1, config['threads'] // 2))
+
+    timesteps, units = config['timesteps'], tuple(config['units'])
+    name = trial_name(timesteps, units)
+    trial_dir = os.path.join(config['checkpoint_dir'], name)
+    os.makedirs(trial_dir, exist_ok=True)
+    best_path = os.path.join(trial_dir, BEST_WEIGHTS)
+    last_path = os.path.join(trial_dir, LAST_WEIGHTS)
+
+    state = None if config.get('fresh') else _read_state(trial_dir)
+    if state and state.get('finished'):
+        logger.info(f"{name}: already finished (val_loss={state['best_val_loss']:.6f})")
+        return state['result']
+
+    normalizer = MinMaxNormalizer.from_dict(config['normalizer'])
+    files, counts = config['files'], config['counts']
+    validation_split = config['validation_split']
+    train = window_dataset(files, counts, normalizer, timesteps, 'train', validation_split,
+                           config['batch_size'], chunk_rows=config['chunk_rows'])
+    val = window_dataset(files, counts, normalizer, timesteps, 'val', validation_split,
+                         config['batch_size'], chunk_rows=config['chunk_rows'])
+
+    model = build_lstm_autoencoder(timesteps, len(FEATURES), units)
+    initial_epoch = 0
+    state = state or {'epoch': 0, 'best_val_loss': None, 'best_epoch': None, 'wait': 0}
+    if state['epoch'] and os.path.isfile(last_path):
+        model.load_weights(last_path)
+        initial_epoch = state['epoch']
+        logger.info(f"{name}: resuming after epoch {initial_epoch}")
+
+    patience = config['patience']
+
+    # Saves the resume point and the best weights after every epoch and stops on val_loss patience.
+    # Doing the early-stopping bookkeeping here keeps it consistent across resumed runs.
+    class TrialCheckpoint(tf.keras.callbacks.Callback):
+        def on_epoch_end(self, epoch, logs=None):
+            val_loss = float((logs or {}).get('val_loss', np.inf))
+            if state['best_val_loss'] is None or val_loss < state['best_val_loss']:
+                state.update(best_val_loss=val_loss, best_epoch=epoch + 1, wait=0)
+                self.model.save_weights(best_path)
+            else:
+                state['wait'] += 1
+            self.model.save_weights(last_path)
+            state['epoch'] = epoch + 1
+            _write_state(trial_dir, state)
+            if patience and state['wait'] >= patience:
+                self.model.stop_training = True
+
+    if initial_epoch < config['epochs'] and not (patience and state['wait'] >= patience):
+        model.fit(
+            train,
+            validation_data=val,
+            epochs=config['epochs'],
+            initial_epoch=initial_epoch,
+            callbacks=[TrialCheckpoint()],
+            verbose=config.get('verbose', 2),
+        )
+    stopped_early = bool(patience and state['wait'] >= patience and state['epoch'] < config['epochs'])
+
+    result = {
+        'name': name,
+        'timesteps': timesteps,
+        'units': list(units),
+        'val_loss': state['best_val_loss'],
+        'best_epoch': state['best_epoch'],
+        'epochs': state['epoch'],
+        'stopped_early': stopped_early,
+        'weights': best_path,
+    }
+    state.update(finished=True, result=result)
+    _write_state(trial_dir, state)
+    logger.info(f"{name}: best val_loss={result['val_loss']:.6f} at epoch {result['best_epoch']}")
+    return result
+
+
+# Yields the MSE of the training-split windows over all recordings, block by block
+# (for threshold calibration with services/quantiles.py).
+def iter_training_mse(model, files, counts, normalizer, timesteps, validation_split, chunk_rows=CHUNK_ROWS):
+    for path in files:
+        start, stop = split_range(counts[path], 'train', validation_split)
+        for data in iter_scaled_blocks(path, normalizer, timesteps, start, stop, chunk_rows=chunk_rows):
+            yield predict_mse(model, data, timesteps)
+
+
+# Evenly strided sample of at most max_rows scaled training rows, for the classical detectors.
+def sample_training_rows(files, counts, normalizer, validation_split, max_rows=DETECTOR_SAMPLE_ROWS,
+                         chunk_rows=CHUNK_ROWS):
+    total = sum(split_range(n, 'train', validation_split)[1] for n in counts.values())
+    stride = max(1, -(-total // max_rows))
+    parts, seen = [], 0
+    for path in files:
+        _, stop = split_range(counts[path], 'train', validation_split)
+        offset = 0
+        for chunk in iter_rows(path, chunk_rows=chunk_rows):
+            chunk = chunk[:max(stop - offset, 0)]
+            offset += len(chunk)
+            # Keep rows whose index over all training rows is a multiple of the stride
+            parts.append(normalizer.transform(chunk[(-seen) % stride::stride]))
+            seen += len(chunk)
+            if offset >= stop:
+                break
+    return np.concatenate(parts) if parts else np.empty((0, len(FEATURES)), dtype=np.float32)
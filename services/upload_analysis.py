@@ -0,0 +1,108 @@
+import threading
+from flask import has_app_context
+from models import db, create_db_app, Sessions
+from services import sensor_store, results_store, baselines
+from services.analyze import run_analysis_realtime
+
+# Analysis job of an uploaded recording.
+# The upload route stores the CSV chunk by chunk and only queues the stored sample range;
+# the job reads the chunks back from storage and feeds them to run_analysis_realtime one at a
+# time, so neither the request nor the worker holds the whole recording in memory.
+# Scored windows (and, when the recording is segmented, rep summaries) are written to the results cache
+# as they are produced.
+
+# Minimal app giving worker threads/processes a database context
+_worker_app = None
+_worker_app_lock = threading.Lock()
+
+
+def _get_worker_app():
+    global _worker_app
+    with _worker_app_lock:
+        if _worker_app is None:
+            _worker_app = create_db_app(__name__)
+        return _worker_app
+
+
+# Analyses samples [start, stop) of a session (see run_analysis_realtime for the other arguments).
+# Runs as a JobScheduler job in a thread or a worker process.
+def analyze_stored_upload(session_id, start, stop, socketio=None, cancel_event=None, **kwargs):
+    return _with_app_context(_analyze_range, session_id, start, stop, socketio, cancel_event, **kwargs)
+
+
+# Re-analyses every stored sample of a session with the served model to rebuild its results cache
+# (services/results_store.py), e.g. after a model change. The results are streamed to the session room
+# like an upload analysis; no summary is returned, so the session aggregates are not counted twice.
+def rebuild_results(session_id, socketio=None, cancel_event=None, lift_type=None):
+    def rebuild():
+        results_store.invalidate(session_id)
+        db.session.commit()
+        _analyze_range(session_id, 0, None, socketio, cancel_event, lift_type=lift_type)
+    _with_app_context(rebuild)
+
+
+# Re-scores every stored sample of a session without Socket.IO (batch re-scoring, services/rescoring.py).
+# @param cache_results: Replace the session's results cache with the artifact's results; False only scores (dry run).
+# @return Summary counters, None if the session has too little data.
+def rescore_stored(session_id, artifact, lift_type=None, cache_results=True):
+    def rescore():
+        if cache_results:
+            results_store.invalidate(session_id)
+            db.session.commit()
+            return _analyze_range(session_id, 0, None, None, None, artifact=artifact, lift_type=lift_type)
+        blocks = (samples for _, samples in sensor_store.iter_chunks(session_id))
+        return run_analysis_realtime(session_id, blocks, None, artifact=artifact, lift_type=lift_type)
+    return _with_app_context(rescore)
+
+
+def _with_app_context(fn, *args, **kwargs):
+    if has_app_context():
+        return fn(*args, **kwargs)
+    with _get_worker_app().app_context():
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            db.session.remove()
+
+
+# Served artifact for a session: its athlete's baseline for the lift type if one was built (services/baselines.py).
+def _session_artifact(session_id, lift_type):
+    athlete = db.session.query(Sessions.athlete).filter(Sessions.id == session_id).scalar()
+    return baselines.artifact_for(athlete, lift_type)
+
+
+# Results of the range are cached when they extend a complete cache of the same model version
+# (or start it); any other outcome (a cancelled or failed analysis, a fine-tuned range) would leave a gap,
+# so the session's cache is dropped instead.
+# A range appended to stored samples is read from `timesteps` rows earlier: the windows spanning the boundary
+# were not complete when the previous range was analysed, and are scored with the new rows, so the cache and
+# counters end up the same as for one analysis of the whole recording.
+def _analyze_range(session_id, start, stop, socketio, cancel_event, artifact=None, fine_tune=False, **kwargs):
+    artifact = artifact or _session_artifact(session_id, kwargs.get('lift_type'))
+    if artifact and start:
+        start = max(start - artifact.timesteps, 0)
+    blocks = (samples for _, samples in sensor_store.iter_chunks(session_id, start, stop))
+    writer = None
+    if artifact and not fine_tune and (start == 0 or results_store.has_results(session_id, artifact.version)):
+        writer = results_store.ResultWriter(session_id, artifact.version, start)
+
+    try:
+        summary = run_analysis_realtime(
+            session_id, blocks, socketio, artifact=artifact, fine_tune=fine_tune, cancel_event=cancel_event,
+            result_sink=writer.write if writer else None, rep_sink=writer.write_reps if writer else None, **kwargs
+        )
+    except Exception:
+        db.session.rollback()
+        results_store.invalidate(session_id)
+        db.session.commit()
+        raise
+
+    # run_analysis_realtime returns None both for too little data and for a cancelled analysis;
+    # only the latter leaves a partial range behind
+    cancelled = cancel_event is not None and cancel_event.is_set()
+    if writer and not cancelled:
+        results_store.invalidate(session_id, keep_version=artifact.version)
+    else:
+        results_store.invalidate(session_id)
+    db.session.commit()
+    return summary
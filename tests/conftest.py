@@ -0,0 +1,46 @@
+import os
+import sys
+import uuid
+import warnings
+from datetime import datetime
+
+import pytest
+
+# The app reads its configuration at import time: a throwaway SQLite database, no model warm-up
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('ML_WARMUP', 'off')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def artifact():
+    from benchmark import synthetic_artifact
+    return synthetic_artifact(10, 0, 2000)
+
+
+# App context with freshly created tables.
+@pytest.fixture
+def app_context():
+    from app import app
+    from models import db
+    with app.app_context():
+        db.create_all()
+        try:
+            yield db
+        finally:
+            db.session.rollback()
+            with warnings.catch_warnings():
+                # sessions <-> sensor_data reference each other; SQLite drops them unsorted
+                warnings.simplefilter('ignore')
+                db.drop_all()
+
+
+# Session with no samples.
+@pytest.fixture
+def session_obj(app_context):
+    from models import Sessions
+    session_obj = Sessions(id=uuid.uuid4(), lift_type='squat', status='active', started_at=datetime.now())
+    app_context.session.add(session_obj)
+    app_context.session.commit()
+    return session_obj
+
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from services import aggregates
+
+
+def test_scores_match_the_channel_means(session_obj):
+    samples = np.random.default_rng(0).uniform(0, 1, (1000, 3))
+    for chunk in np.array_split(samples, 7):
+        row = aggregates.add_samples(session_obj.id, chunk)
+    left, right, core = samples.mean(axis=0)
+    balance, stability, risk = aggregates.performance_scores(row)
+    assert balance == pytest.approx(1 - abs(left - right))
+    assert stability == pytest.approx(core)
+    assert risk == pytest.approx(1 - balance * stability)
+    assert aggregates.describe(row)['core_stability']['std'] == pytest.approx(samples[:, 2].std())
+
+
+def test_all_nan_channel_counts_as_zero(session_obj):
+    samples = np.random.default_rng(1).uniform(0, 1, (100, 3))
+    samples[:, 2] = np.nan
+    row = aggregates.add_samples(session_obj.id, samples)
+    assert aggregates.channel_means(row)[2] is None
+    balance, stability, risk = aggregates.performance_scores(row)
+    assert stability == 0.0
+    assert risk == pytest.approx(1.0)
+    assert 'core_stability' not in aggregates.describe(row)
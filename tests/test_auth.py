@@ -0,0 +1,124 @@
+import uuid
+
+import pytest
+
+from utils import auth
+
+
+# Stub identity provider with one local athlete, and a test client of the app.
+@pytest.fixture
+def client(app_context):
+    from app import app
+    from models import User
+    provider = auth.StubProvider()
+    auth.set_provider(provider)
+    athlete = User(id=uuid.uuid4(), first_name='Ada', last_name='Athlete', email='ada@example.com',
+                   role='athlete', firebase_uid='uid-ada')
+    trainer = User(id=uuid.uuid4(), first_name='Tom', last_name='Trainer', email='tom@example.com',
+                   role='trainer', firebase_uid='uid-tom')
+    app_context.session.add_all([athlete, trainer])
+    app_context.session.commit()
+    provider.create_user('ada@example.com', 'secret', uid='uid-ada')
+    client = app.test_client()
+    client.athlete, client.trainer = athlete, trainer
+    client.bearer = {'Authorization': f"Bearer {provider.sign_in('ada@example.com', 'secret')['id_token']}"}
+    yield client
+    auth.set_provider(None)
+
+
+def test_bearer_token_starts_a_session(client):
+    from models import Sessions
+    response = client.post('/sessions', json={'lift_type': 'squat', 'trainer_id': str(client.trainer.id)},
+                           headers=client.bearer)
+    assert response.status_code == 200, response.get_json()
+    session_obj = Sessions.query.one()
+    assert session_obj.athlete == client.athlete.id
+
+
+def test_bearer_token_opens_the_profile(client):
+    response = client.get('/profile', headers=client.bearer)
+    assert response.status_code == 200
+    assert b'Ada' in response.data
+
+
+def test_invalid_bearer_token_is_rejected(client):
+    response = client.get('/profile', headers={'Authorization': 'Bearer forged'})
+    assert response.status_code == 401
+
+
+# A local user signed up before firebase_uid was stored, and a token for another identity with their email
+@pytest.fixture
+def unlinked(app_context):
+    from models import User
+    user = User(id=uuid.uuid4(), first_name='Una', last_name='Linked', email='una@example.com', role='athlete')
+    app_context.session.add(user)
+    app_context.session.commit()
+    provider = auth.StubProvider()
+    auth.set_provider(provider)
+    yield provider, user
+    auth.set_provider(None)
+
+
+def test_unverified_email_does_not_link_a_user(unlinked):
+    provider, _ = unlinked
+    provider.create_user('una@example.com', 'secret', uid='uid-intruder')
+    token = provider.sign_in('una@example.com', 'secret')['id_token']
+    assert 'error' in auth.login_with_token(token)
+    assert auth.get_profile('uid-intruder') is None
+
+
+def test_verified_email_links_a_user(unlinked):
+    provider, user = unlinked
+    provider.create_user('una@example.com', 'secret', uid='uid-una', email_verified=True)
+    token = provider.sign_in('una@example.com', 'secret')['id_token']
+    assert auth.login_with_token(token)['id'] == str(user.id)
+
+
+def test_password_sign_in_links_by_email(unlinked):
+    provider, user = unlinked
+    provider.create_user('una@example.com', 'secret', uid='uid-una')
+    assert auth.login('una@example.com', 'secret')['id'] == str(user.id)
+
+
+# Sessions of the athlete with their trainer and with another trainer
+@pytest.fixture
+def trained_sessions(client, app_context):
+    from datetime import datetime
+    from models import Sessions, User
+    other_trainer = User(id=uuid.uuid4(), first_name='Oz', last_name='Other', email='oz@example.com',
+                         role='trainer', firebase_uid='uid-oz')
+    app_context.session.add(other_trainer)
+    for trainer in (client.trainer, other_trainer):
+        app_context.session.add(Sessions(id=uuid.uuid4(), athlete=client.athlete.id, trainer=trainer.id,
+                                         lift_type='squat', status='ended', started_at=datetime.now()))
+    app_context.session.commit()
+    auth.get_provider().create_user('tom@example.com', 'secret', uid='uid-tom')
+    token = auth.get_provider().sign_in('tom@example.com', 'secret')['id_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_athlete_sees_their_history(client, trained_sessions):
+    response = client.get(f'/athletes/{client.athlete.id}/sessions', headers=client.bearer)
+    assert response.status_code == 200
+    assert len(response.get_json()['sessions']) == 2
+    assert client.get(f'/athletes/{client.athlete.id}/trends', headers=client.bearer).status_code == 200
+
+
+def test_trainer_sees_the_sessions_they_trained(client, trained_sessions):
+    response = client.get(f'/athletes/{client.athlete.id}/sessions', headers=trained_sessions)
+    assert response.status_code == 200
+    assert len(response.get_json()['sessions']) == 1
+    assert client.get(f'/athletes/{client.athlete.id}/trends', headers=trained_sessions).status_code == 200
+
+
+def test_other_athletes_history_is_forbidden(client, trained_sessions, app_context):
+    from models import User
+    app_context.session.add(User(id=uuid.uuid4(), first_name='Ben', last_name='Other', email='ben@example.com',
+                                 role='athlete', firebase_uid='uid-ben'))
+    app_context.session.commit()
+    auth.get_provider().create_user('ben@example.com', 'secret', uid='uid-ben')
+    token = auth.get_provider().sign_in('ben@example.com', 'secret')['id_token']
+    for path in ('sessions', 'trends'):
+        response = client.get(f'/athletes/{client.athlete.id}/{path}', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 403
+    assert client.get('/athletes/not-a-uuid/sessions', headers=client.bearer).status_code == 400
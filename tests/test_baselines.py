@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+from services import baselines
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def write_meta(path, baseline_id, threshold):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, baselines.META_FILE), 'w') as f:
+        json.dump({'baseline_id': baseline_id, 'threshold': threshold}, f)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(baselines, 'cache', baselines.BaselineCache(max_bytes=1000, recheck_seconds=30, clock=clock))
+    return clock
+
+
+def test_least_recently_used_is_dropped():
+    cache = baselines.BaselineCache(max_bytes=100)
+    cache.put('a', 'A', 60)
+    cache.put('b', 'B', 30)
+    assert cache.get('a') == (True, 'A')
+    cache.put('c', 'C', 30)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 'A')
+    assert cache.size == 90
+
+
+def test_unchanged_entry_is_kept_after_recheck(clock):
+    stamps = []
+    baselines.cache.put('a', 'A', 10, stamp=1)
+    clock.now = 31
+    assert baselines.cache.get('a', lambda: stamps.append(1) or 1) == (True, 'A')
+    assert baselines.cache.get('a', lambda: stamps.append(1) or 1) == (True, 'A')
+    assert len(stamps) == 1
+
+
+def test_changed_entry_is_reloaded(clock):
+    baselines.cache.put('a', 'A', 10, stamp=1)
+    assert baselines.cache.get('a', lambda: 2) == (True, 'A')
+    clock.now = 31
+    assert baselines.cache.get('a', lambda: 2) == (False, None)
+    assert baselines.cache.size == 0
+
+
+def test_rebuilt_baseline_is_picked_up(clock, artifact, tmp_path):
+    path = baselines.baseline_path(artifact.version, 'athlete', 'squat', str(tmp_path))
+    assert baselines.artifact_for('athlete', 'squat', artifact, str(tmp_path)) is artifact
+
+    # Another process builds a baseline; the cached miss is trusted until the recheck
+    write_meta(path, 'first', 0.5)
+    assert baselines.artifact_for('athlete', 'squat', artifact, str(tmp_path)) is artifact
+    clock.now = 31
+    first = baselines.artifact_for('athlete', 'squat', artifact, str(tmp_path))
+    assert first.version == f"{artifact.version}+bl-first"
+
+    # ... and rebuilds it
+    write_meta(path, 'second', 0.7)
+    os.utime(os.path.join(path, baselines.META_FILE), ns=(1, 1))
+    clock.now = 62
+    second = baselines.artifact_for('athlete', 'squat', artifact, str(tmp_path))
+    assert second.version == f"{artifact.version}+bl-second"
+    assert second.threshold == 0.7
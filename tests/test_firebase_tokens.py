@@ -0,0 +1,108 @@
+import base64
+import hashlib
+import json
+
+import pytest
+
+from utils.firebase_tokens import InvalidTokenError, TokenVerifier, rsa_sha256_verify
+
+# 1024-bit test key made with `openssl genrsa`, and its signature of b'header.payload' made with
+# `openssl dgst -sha256 -sign`
+N = int(
+    'c64de11d5c60b8c7196ca71cf35b1736c46b874b7ec2fda663dca764e60c2461d7f46229c7297cbe3a9a72f6e06855167bafcc4bddb'
+    '48fa9dff82c64bb191d06198e3e547a188186b8b21ee5be55036a7e3f45faa4c7f2cc61eba7637b7c2d8f74aa12ff1e34ff93bf9a82f'
+    '00123130c4dc3014326fe78840ca71e8ae47aba01', 16)
+E = 65537
+D = int(
+    '57b8d5cf8630e72c740bc3752415f493ee99de94bff383ff5a079f291c36dcd54791bce6dc4a76fb33b3650ddec1687a74a694ca2ebe'
+    '141b428f671bfc4424b8e9a8b28f1ccc230d40ec0b21c4ef9d692c3268614690e451d5d1e010bfcba4a22076d2d44fd4e1769a84569f'
+    'ddf5cf2926b164f2354dddae27aa3a61b9bd4e51', 16)
+OPENSSL_SIGNATURE = (
+    'h6g3T6Sy035gbiSXMYUp8FMiJSnR3l3dz7qGS-_kKYHkaG0z20hE8v4sHagHePRjhCQJSvk85ARSRRQmUjc1W12mKkDSX1i-sUQxj5GJ5b1a'
+    'XfaU02NehFtN4P74cwfCttPS4z_-_8KoWJzubnYixcvDH0NP-1iIG6cgYSZku_c')
+PROJECT = 'lifting-tracker'
+NOW = 1_800_000_000
+
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def b64url_decode(value):
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+# RSASSA-PKCS1-v1_5 with SHA-256 (RFC 8017)
+def sign(message, d=D, n=N):
+    digest_info = bytes.fromhex('3031300d060960864801650304020105000420') + hashlib.sha256(message).digest()
+    size = (n.bit_length() + 7) // 8
+    encoded = b'\x00\x01' + b'\xff' * (size - 3 - len(digest_info)) + b'\x00' + digest_info
+    return pow(int.from_bytes(encoded, 'big'), d, n).to_bytes(size, 'big')
+
+
+def make_token(kid='key-1', alg='RS256', **overrides):
+    claims = {'iss': f'https://securetoken.google.com/{PROJECT}', 'aud': PROJECT, 'sub': 'firebase-uid',
+              'iat': NOW - 10, 'exp': NOW + 3600, 'auth_time': NOW - 10, 'email': 'athlete@example.com'}
+    claims.update(overrides)
+    signing_input = f"{b64url(json.dumps({'alg': alg, 'kid': kid}).encode())}.{b64url(json.dumps(claims).encode())}"
+    return f"{signing_input}.{b64url(sign(signing_input.encode()))}"
+
+
+@pytest.fixture
+def verifier():
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        return {'key-1': (N, E)}, 3600
+
+    verifier = TokenVerifier(PROJECT, fetch=fetch, clock=lambda: NOW)
+    verifier.fetches = fetches
+    return verifier
+
+
+def test_openssl_signature_verifies():
+    signature = b64url_decode(OPENSSL_SIGNATURE)
+    assert sign(b'header.payload') == signature
+    assert rsa_sha256_verify(N, E, b'header.payload', signature)
+    assert not rsa_sha256_verify(N, E, b'header.payloaD', signature)
+    assert not rsa_sha256_verify(N, E, b'header.payload', signature[:-1] + bytes([signature[-1] ^ 1]))
+    assert not rsa_sha256_verify(N, E, b'header.payload', signature[1:])
+
+
+def test_valid_token(verifier):
+    claims = verifier.verify(make_token())
+    assert claims['sub'] == 'firebase-uid'
+    assert claims['email'] == 'athlete@example.com'
+    # Keys are fetched once and then verified locally
+    verifier.verify(make_token())
+    assert len(verifier.fetches) == 1
+
+
+def test_tampered_payload_is_rejected(verifier):
+    header, _, signature = make_token().split('.')
+    _, payload, _ = make_token(sub='someone-else').split('.')
+    with pytest.raises(InvalidTokenError, match='signature'):
+        verifier.verify(f'{header}.{payload}.{signature}')
+
+
+@pytest.mark.parametrize('token, message', [
+    (make_token(aud='another-project'), 'another project'),
+    (make_token(iss='https://securetoken.google.com/another-project'), 'another project'),
+    (make_token(exp=NOW - 120), 'expired'),
+    (make_token(iat=NOW + 120), 'not valid yet'),
+    (make_token(sub=''), 'subject'),
+    (make_token(alg='HS256'), 'RS256'),
+    ('not.a-token', 'Malformed'),
+])
+def test_invalid_claims_are_rejected(verifier, token, message):
+    with pytest.raises(InvalidTokenError, match=message):
+        verifier.verify(token)
+
+
+def test_unknown_key_refetches_at_most_once_a_minute(verifier):
+    with pytest.raises(InvalidTokenError, match='unknown key'):
+        verifier.verify(make_token(kid='rotated'))
+    with pytest.raises(InvalidTokenError, match='unknown key'):
+        verifier.verify(make_token(kid='rotated'))
+    assert len(verifier.fetches) == 1
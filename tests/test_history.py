@@ -0,0 +1,62 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import history
+
+
+# Seven sessions of one athlete; three share a start time, so pages must break ties by id.
+@pytest.fixture
+def athlete_sessions(app_context):
+    from models import Sessions
+    athlete = uuid.uuid4()
+    start = datetime(2026, 3, 1, 9, 0)
+    started = [start, start + timedelta(days=1), start + timedelta(days=2), start + timedelta(days=2),
+               start + timedelta(days=2), start + timedelta(days=3), start + timedelta(days=4)]
+    rows = [Sessions(id=uuid.uuid4(), athlete=athlete, lift_type='squat', status='ended', started_at=t)
+            for t in started]
+    # Another athlete's session in between is never listed
+    rows.append(Sessions(id=uuid.uuid4(), athlete=uuid.uuid4(), lift_type='squat', status='ended',
+                         started_at=start + timedelta(days=2)))
+    app_context.session.add_all(rows)
+    app_context.session.commit()
+    newest_first = sorted(rows[:7], key=lambda s: (s.started_at, s.id), reverse=True)
+    return athlete, [s.id for s in newest_first]
+
+
+def all_pages(athlete, limit):
+    pages, cursor = [], None
+    while True:
+        sessions, cursor = history.athlete_sessions(athlete, limit=limit, cursor=cursor)
+        pages.append([s.id for s in sessions])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 6, 7, 8])
+def test_pages_cover_the_history_once(athlete_sessions, limit):
+    athlete, expected = athlete_sessions
+    pages = all_pages(athlete, limit)
+    assert [session_id for page in pages for session_id in page] == expected
+    assert all(len(page) == limit for page in pages[:-1])
+    # A full last page does not leave an empty page behind
+    assert 0 < len(pages[-1]) <= limit
+
+
+def test_page_size_is_bounded(athlete_sessions):
+    athlete, expected = athlete_sessions
+    sessions, cursor = history.athlete_sessions(athlete, limit=0)
+    assert [s.id for s in sessions] == expected[:1]
+    sessions, cursor = history.athlete_sessions(athlete, limit=history.MAX_PAGE_SIZE + 1)
+    assert len(sessions) == len(expected) and cursor is None
+
+
+def test_cursor_round_trip(session_obj):
+    assert history.decode_cursor(history.encode_cursor(session_obj)) == (session_obj.started_at, session_obj.id)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', 'MjAyNi0wMy0wMXxub3QtYS11dWlk'])
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError):
+        history.decode_cursor(cursor)
@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+from services.jobs import CANCELLED, DONE, FAILED, JobScheduler, QueueFullError
+
+TIMEOUT = 10
+
+
+# One worker, held by a first job until `release` is set, so the jobs queued meanwhile are dispatched in
+# scheduler order.
+@pytest.fixture
+def scheduler():
+    finished = []
+    done = threading.Condition()
+
+    def on_complete(job):
+        with done:
+            finished.append(job)
+            done.notify_all()
+
+    scheduler = JobScheduler(None, max_workers=1, max_queue=4, executor='thread', on_complete=on_complete)
+    scheduler.release = threading.Event()
+    scheduler.order = []
+
+    def wait_for(count):
+        with done:
+            assert done.wait_for(lambda: len(finished) >= count, TIMEOUT)
+    scheduler.wait_for = wait_for
+
+    started = threading.Event()
+
+    def hold(socketio, cancel_event):
+        started.set()
+        # Stops like an analysis when cancelled
+        for _ in range(TIMEOUT * 100):
+            if scheduler.release.wait(0.01) or cancel_event.is_set():
+                return
+    scheduler.holding = scheduler.submit('hold', hold)
+    assert started.wait(TIMEOUT)
+    yield scheduler
+    scheduler.release.set()
+    scheduler.shutdown()
+
+
+def record(scheduler, name):
+    def run(socketio, cancel_event):
+        scheduler.order.append(name)
+        return name
+    return run
+
+
+def test_sessions_are_served_round_robin(scheduler):
+    for name in ('a1', 'a2', 'a3'):
+        scheduler.submit('a', record(scheduler, name))
+    scheduler.submit('b', record(scheduler, 'b1'))
+    scheduler.release.set()
+    scheduler.wait_for(5)
+    assert scheduler.order == ['a1', 'b1', 'a2', 'a3']
+
+
+def test_full_queue_rejects_jobs(scheduler):
+    for i in range(4):
+        scheduler.submit('a', record(scheduler, i))
+    with pytest.raises(QueueFullError):
+        scheduler.submit('b', record(scheduler, 'rejected'))
+    assert scheduler.queue_depth == 4
+
+
+def test_cancelled_queued_job_never_runs(scheduler):
+    job = scheduler.submit('a', record(scheduler, 'cancelled'))
+    other = scheduler.submit('b', record(scheduler, 'kept'))
+    assert scheduler.cancel(job.id)
+    assert job.status == CANCELLED and scheduler.queue_depth == 1
+    scheduler.release.set()
+    scheduler.wait_for(2)
+    assert scheduler.order == ['kept']
+    assert other.status == DONE and other.result == 'kept'
+    assert not scheduler.cancel(job.id)
+
+
+def test_running_job_is_asked_to_stop(scheduler):
+    assert scheduler.cancel(scheduler.holding.id)
+    scheduler.wait_for(1)
+    assert scheduler.holding.status == CANCELLED
+
+
+def test_failed_job_frees_its_worker(scheduler):
+    def fail(socketio, cancel_event):
+        raise RuntimeError('broken recording')
+    failed = scheduler.submit('a', fail)
+    after = scheduler.submit('a', record(scheduler, 'after'))
+    scheduler.release.set()
+    scheduler.wait_for(3)
+    assert failed.status == FAILED and failed.error == 'broken recording'
+    assert after.status == DONE
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from services import logic_rules
+
+
+@pytest.fixture(autouse=True)
+def lift_rules(monkeypatch):
+    monkeypatch.setattr(logic_rules, 'LIFT_RULES', {})
+
+
+def write_config(tmp_path, config):
+    path = tmp_path / 'lift_rules.json'
+    path.write_text(json.dumps(config))
+    return str(path)
+
+
+def test_loaded_overrides_apply_to_their_lift_type(tmp_path):
+    logic_rules.load_rules(write_config(tmp_path, {'deadlift': {'core_min': 0.5}}))
+    assert logic_rules.get_rules('deadlift')['core_min'] == 0.5
+    assert logic_rules.get_rules('deadlift')['imbalance'] == logic_rules.DEFAULT_RULES['imbalance']
+    assert logic_rules.get_rules('squat') == logic_rules.DEFAULT_RULES
+
+    # core 0.45 is low for a deadlift only
+    args = (0.5, 0.5, 0.45, 0.0, 1.0)
+    assert logic_rules.evaluate_rules(*args, lift_type='deadlift') == logic_rules.RULE_CORE_LOW
+    assert logic_rules.evaluate_rules(*args, lift_type='squat') == 0
+
+
+def test_unknown_setting_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match='core_minimum'):
+        logic_rules.load_rules(write_config(tmp_path, {'squat': {'core_minimum': 0.5}}))
+
+
+def test_config_must_map_lift_types(tmp_path):
+    with pytest.raises(ValueError):
+        logic_rules.load_rules(write_config(tmp_path, [{'core_min': 0.5}]))
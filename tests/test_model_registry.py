@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+from services import model_registry
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    # REGISTRY_DIR is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('MODEL_VERSION', raising=False)
+    monkeypatch.setattr(model_registry, '_active_loaded', False)
+    monkeypatch.setattr(model_registry, '_active_artifact', None)
+    for version in ('20260101-000000', '20260201-000000'):
+        os.makedirs(os.path.join(model_registry.REGISTRY_DIR, version))
+    with open(os.path.join(model_registry.REGISTRY_DIR, model_registry.LATEST_FILE), 'w') as f:
+        f.write('20260201-000000')
+    return model_registry.REGISTRY_DIR
+
+
+def test_latest_is_served_by_default(registry):
+    assert model_registry.served_version() == '20260201-000000'
+    assert model_registry.active_version() == '20260201-000000'
+
+
+def test_pinned_version_is_served(registry, monkeypatch):
+    monkeypatch.setenv('MODEL_VERSION', '20260101-000000')
+    assert model_registry.served_version() == '20260101-000000'
+    assert model_registry.active_version() == '20260101-000000'
+    assert model_registry.served_version('latest') == '20260201-000000'
+
+
+def test_loaded_artifact_wins(registry, artifact):
+    model_registry.set_active_artifact(artifact)
+    assert model_registry.active_version() == artifact.version
@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pytest
+
+from services.quantiles import P2Quantile, ThresholdTracker, calibrate_threshold
+
+
+@pytest.mark.parametrize('p', [0.5, 0.95, 0.99])
+def test_estimate_is_close_to_the_exact_quantile(p):
+    # MSE-like, right-skewed values
+    values = np.random.default_rng(0).lognormal(-4, 1, 50000)
+    estimate = P2Quantile(p).update_many(values).value
+    exact = np.quantile(values, p)
+    assert abs(estimate - exact) / exact < 0.03
+
+
+def test_estimate_is_exact_for_few_values():
+    estimator = P2Quantile(0.5).update_many([3, 1, 2])
+    assert estimator.value == 2
+    assert P2Quantile(0.5).value is None
+
+
+def test_calibration_does_not_depend_on_the_blocks():
+    values = np.random.default_rng(1).exponential(size=5000)
+    whole = calibrate_threshold([values], 95)
+    blocks = calibrate_threshold(np.array_split(values, 37), 95)
+    assert blocks.to_dict() == whole.to_dict()
+
+
+def test_state_round_trips_through_json():
+    values = np.random.default_rng(2).exponential(size=3000)
+    estimator = P2Quantile(0.95).update_many(values[:2000])
+    restored = P2Quantile.from_dict(json.loads(json.dumps(estimator.to_dict())))
+    estimator.update_many(values[2000:])
+    restored.update_many(values[2000:])
+    assert restored.value == estimator.value
+
+
+def test_no_reference_windows():
+    with pytest.raises(ValueError):
+        calibrate_threshold([np.empty(0)])
+
+
+def test_tracker_uses_the_stored_threshold_until_warm():
+    tracker = ThresholdTracker(0.5, warmup=10)
+    thresholds = tracker.observe(np.full(20, 0.01))
+    assert (thresholds[:10] == 0.5).all()
+    assert thresholds[-1] == pytest.approx(0.01)
+
+
+def test_tracker_adapts_from_its_calibration():
+    rng = np.random.default_rng(3)
+    calibration = calibrate_threshold([rng.exponential(1.0, 20000)], 95).to_dict()
+    tracker = ThresholdTracker(calibration['heights'][2], calibration=calibration, memory=1000)
+    # The scored windows come from a distribution twice as wide
+    tracker.observe(rng.exponential(2.0, 20000))
+    assert tracker.current == pytest.approx(2 * np.log(20), rel=0.1)
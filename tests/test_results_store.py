@@ -0,0 +1,76 @@
+import threading
+
+import numpy as np
+
+from models import db
+from services import results_store, sensor_store
+from services.analyze import run_analysis_realtime
+from services.upload_analysis import _analyze_range
+from utils.synthetic import generate_recording, FEATURES
+
+
+def store_recording(session_obj, rows, seed=0):
+    samples = generate_recording(rows, anomaly_rate=0.02, seed=seed)[FEATURES].to_numpy()
+    sensor_store.append_samples(session_obj, samples)
+    db.session.commit()
+    return samples
+
+
+def test_cached_results_match_whole_recording(session_obj, artifact):
+    samples = store_recording(session_obj, 10000)
+    summary = _analyze_range(session_obj.id, 0, None, None, None, artifact=artifact)
+
+    cached = results_store.read_results(session_obj.id, artifact.version)
+    assert summary['windows'] == len(cached['mse']) == len(samples) - artifact.timesteps
+    np.testing.assert_array_equal(cached['index'], np.arange(len(samples) - artifact.timesteps))
+
+    sink = []
+    run_analysis_realtime('whole', samples, None, artifact=artifact,
+                          result_sink=lambda start, *columns: sink.append(columns[3]))
+    np.testing.assert_allclose(cached['mse'], np.concatenate(sink), rtol=1e-5)
+
+
+def test_appended_range_extends_cache(session_obj, artifact):
+    first = store_recording(session_obj, 5000)
+    counted = _analyze_range(session_obj.id, 0, 5000, None, None, artifact=artifact)['windows']
+    second = store_recording(session_obj, 5000, seed=1)
+    counted += _analyze_range(session_obj.id, 5000, None, None, None, artifact=artifact)['windows']
+
+    # The windows spanning both uploads are scored too: the cache matches one analysis of the whole recording
+    cached = results_store.read_results(session_obj.id, artifact.version)
+    assert counted == len(cached['mse']) == 10000 - artifact.timesteps
+    np.testing.assert_array_equal(cached['index'], np.arange(10000 - artifact.timesteps))
+
+    sink = []
+    run_analysis_realtime('whole', np.concatenate([first, second]), None, artifact=artifact,
+                          result_sink=lambda start, *columns: sink.append(columns[3]))
+    np.testing.assert_allclose(cached['mse'], np.concatenate(sink), rtol=1e-5)
+
+
+def test_cancelled_analysis_drops_partial_cache(session_obj, artifact, monkeypatch):
+    store_recording(session_obj, 3 * sensor_store.CHUNK_ROWS)
+    cancel_event = threading.Event()
+    write = results_store.ResultWriter.write
+
+    # Cancel once the first block was written
+    def write_then_cancel(self, *args):
+        write(self, *args)
+        cancel_event.set()
+    monkeypatch.setattr(results_store.ResultWriter, 'write', write_then_cancel)
+
+    summary = _analyze_range(session_obj.id, 0, None, None, cancel_event, artifact=artifact)
+    assert summary is None
+    assert not results_store.has_results(session_obj.id, artifact.version)
+
+
+def test_too_little_data_keeps_existing_cache(session_obj, artifact):
+    store_recording(session_obj, 5000)
+    _analyze_range(session_obj.id, 0, None, None, None, artifact=artifact)
+    # An upload shorter than a window still completes the windows spanning the boundary
+    store_recording(session_obj, artifact.timesteps - 1, seed=1)
+    _analyze_range(session_obj.id, 5000, None, None, None, artifact=artifact)
+    total = 5000 + artifact.timesteps - 1
+    assert results_store.window_count(session_obj.id, artifact.version) == total - artifact.timesteps
+
+    assert _analyze_range(session_obj.id, total, None, None, None, artifact=artifact) is None
+    assert results_store.window_count(session_obj.id, artifact.version) == total - artifact.timesteps
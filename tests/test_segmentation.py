@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from services.analyze import run_analysis_realtime
+from services.segmentation import RepSegmenter, RepTracker, runs, split_reps
+from utils.synthetic import generate_lifting_recording, FEATURES
+
+
+def label(scaled, block_rows):
+    segmenter = RepSegmenter()
+    parts = [segmenter.update(scaled[i:i + block_rows]) for i in range(0, len(scaled), block_rows)]
+    return np.concatenate(parts + [segmenter.finish()])
+
+
+@pytest.fixture(scope='module')
+def recording(artifact):
+    df, reps = generate_lifting_recording(seed=0)
+    samples = df[FEATURES].to_numpy(dtype=np.float32)
+    return samples, artifact.scaler.transform(samples), reps
+
+
+@pytest.mark.parametrize('block_rows', [1, 7, 24, 777])
+def test_labels_do_not_depend_on_block_size(recording, block_rows):
+    _, scaled, _ = recording
+    whole = label(scaled, len(scaled))
+    assert len(whole) == len(scaled)
+    np.testing.assert_array_equal(label(scaled, block_rows), whole)
+
+
+def test_rest_is_not_labelled(recording):
+    _, scaled, reps = recording
+    labels = label(scaled, len(scaled))
+    assert not labels[:reps[0][0] - 100].any()
+    assert not labels[reps[-1][1] + 100:].any()
+    for start, stop in reps:
+        assert labels[start + 10:stop - 10].all()
+
+
+def tracked_reps(scaled, labels):
+    tracker = RepTracker()
+    for a, b in runs(labels):
+        rows = scaled[a:b]
+        tracker.add(a, rows[:, 0], rows[:, 1], rows[:, 2], np.zeros(b - a), np.zeros(b - a, dtype=bool),
+                    np.zeros(b - a, dtype=np.uint8))
+    tracker.close()
+    return tracker.take()
+
+
+def test_reps_and_turnarounds(recording):
+    _, scaled, reps = recording
+    found = tracked_reps(scaled, label(scaled, len(scaled)))
+    assert len(found) == len(reps)
+    for rep, (start, stop) in zip(found, reps):
+        assert abs(rep['turnaround'] - (start + stop) / 2) <= 10
+        assert rep['phases']['eccentric']['rows'] + rep['phases']['concentric']['rows'] == rep['windows']
+
+
+def test_touch_and_go_reps_are_split(artifact):
+    df, reps = generate_lifting_recording(sets=1, reps=6, rep_rows=100, pause=0, rest=2000, seed=1)
+    scaled = artifact.scaler.transform(df[FEATURES].to_numpy())
+    labels = label(scaled, len(scaled))
+    assert len(runs(labels)) == 1
+    assert len(tracked_reps(scaled, labels)) == len(reps)
+
+
+def test_split_reps_without_excursion_keeps_stretch():
+    assert split_reps(np.zeros(50)) == [(0, 50)]
+
+
+@pytest.mark.parametrize('block_rows', [7, 1000])
+def test_segmented_analysis_matches_whole_recording(recording, artifact, block_rows):
+    samples, _, reps = recording
+    whole_reps, block_reps = [], []
+    whole = run_analysis_realtime('whole', samples, None, artifact=artifact, segment=True, rep_sink=whole_reps.extend)
+    blocks = [samples[i:i + block_rows] for i in range(0, len(samples), block_rows)]
+    blockwise = run_analysis_realtime('blocks', blocks, None, artifact=artifact, segment=True,
+                                      rep_sink=block_reps.extend)
+    assert whole == blockwise
+    assert whole['reps'] == len(reps)
+    assert [(r['start'], r['stop'], r['turnaround']) for r in block_reps] == \
+        [(r['start'], r['stop'], r['turnaround']) for r in whole_reps]
+    # Only rep windows are scored
+    assert whole['windows'] < len(samples) // 4
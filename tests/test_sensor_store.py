@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from models import db, SensorData
+from services import aggregates, sensor_store
+from utils.synthetic import generate_recording, FEATURES
+
+
+def samples(rows, seed=0):
+    return generate_recording(rows, seed=seed)[FEATURES].to_numpy(dtype=np.float32)
+
+
+def add_legacy_rows(session_obj, rows):
+    header = SensorData(session=session_obj.id, storage_format='json', sample_count=0,
+                        raw_data=[dict(zip(FEATURES, map(float, row))) for row in rows])
+    db.session.add(header)
+    db.session.commit()
+    return header
+
+
+def assert_aggregates_match(session_id, expected):
+    row = aggregates.get_or_create(session_id)
+    assert row.sample_count == len(expected)
+    stats = row.channel_stats
+    for i, feature in enumerate(FEATURES):
+        assert stats[feature]['count'] == len(expected)
+        assert stats[feature]['mean'] == pytest.approx(expected[:, i].mean(), rel=1e-6)
+        assert stats[feature]['m2'] == pytest.approx(((expected[:, i] - expected[:, i].mean()) ** 2).sum(), rel=1e-4)
+    assert sum(row.imbalance_hist) == len(expected)
+
+
+def test_chunks_round_trip(session_obj):
+    data = samples(2 * sensor_store.CHUNK_ROWS + 100)
+    sensor_store.append_samples(session_obj, data[:5000])
+    sensor_store.append_samples(session_obj, data[5000:])
+    db.session.commit()
+    np.testing.assert_array_equal(sensor_store.read_samples(session_obj.id), data)
+    np.testing.assert_array_equal(sensor_store.read_samples(session_obj.id, 4000, 4200), data[4000:4200])
+    assert_aggregates_match(session_obj.id, data)
+
+
+def test_migration_does_not_count_backfilled_rows_twice(session_obj):
+    data = samples(1000)
+    add_legacy_rows(session_obj, data)
+    # end_session backfilled the aggregates from the legacy rows
+    for _, chunk in sensor_store.iter_chunks(session_obj.id):
+        aggregates.add_samples(session_obj.id, chunk)
+    db.session.commit()
+
+    assert sensor_store.migrate_json_rows() == 1
+    assert_aggregates_match(session_obj.id, data)
+
+
+def test_merging_legacy_uploads_counts_every_row_once(session_obj):
+    first, second = samples(600), samples(400, seed=1)
+    add_legacy_rows(session_obj, first)
+    add_legacy_rows(session_obj, second)
+    assert sensor_store.migrate_json_rows() == 2
+    np.testing.assert_array_equal(sensor_store.read_samples(session_obj.id), np.concatenate([first, second]))
+    assert_aggregates_match(session_obj.id, np.concatenate([first, second]))
+
+
+def test_lazy_migration_before_append(session_obj):
+    legacy, new = samples(500), samples(300, seed=1)
+    add_legacy_rows(session_obj, legacy)
+    for _, chunk in sensor_store.iter_chunks(session_obj.id):
+        aggregates.add_samples(session_obj.id, chunk)
+    sensor_store.append_samples(session_obj, new)
+    db.session.commit()
+    assert_aggregates_match(session_obj.id, np.concatenate([legacy, new]))
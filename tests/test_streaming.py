@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from services.analyze import run_analysis_realtime
+from services.live_ingest import decode_frame
+from services.streaming import RingBuffer, StreamingAnalyzer
+from utils.synthetic import generate_recording, FEATURES
+
+
+@pytest.fixture(scope='module')
+def samples():
+    return generate_recording(1200, anomaly_rate=0.02, seed=4)[FEATURES].to_numpy(dtype=np.float32)
+
+
+def stream(artifact, blocks):
+    analyzer = StreamingAnalyzer('live', artifact, adaptive_scaling=False, adaptive_threshold=False)
+    # model.predict directly, the shared batcher pads and is covered by the benchmark
+    analyzer.batcher = None
+    return [result for block in blocks for result in analyzer.push(block)]
+
+
+def test_ring_buffer_window_is_contiguous():
+    buffer = RingBuffer(3, 1)
+    for value in range(5):
+        buffer.append([value])
+    assert buffer.full and len(buffer) == 3
+    np.testing.assert_array_equal(buffer.window().ravel(), [2, 3, 4])
+
+
+@pytest.mark.parametrize('block_rows', [3, 7, 1000])
+def test_frames_give_the_same_results_as_one_push(artifact, samples, block_rows):
+    whole = stream(artifact, [samples])
+    frames = stream(artifact, [decode_frame(block.tobytes()) for block in np.array_split(
+        samples, np.arange(block_rows, len(samples), block_rows))])
+    assert [r['index'] for r in frames] == [r['index'] for r in whole]
+    np.testing.assert_allclose([r['mse'] for r in frames], [r['mse'] for r in whole], rtol=1e-5)
+    assert [r['final_anomaly'] for r in frames] == [r['final_anomaly'] for r in whole]
+
+
+def test_live_stream_matches_upload_analysis(artifact, samples):
+    live = stream(artifact, [samples])
+    upload = []
+    run_analysis_realtime('upload', np.array_split(samples, 5), None, artifact=artifact,
+                          result_sink=lambda start, *columns: upload.append(columns[3]))
+    upload = np.concatenate(upload)
+    # The upload reports window i at its first row, the stream at its last; the stream also scores the final window
+    assert len(live) == len(upload) + 1
+    np.testing.assert_allclose([r['mse'] for r in live[:-1]], upload, rtol=1e-5)
+
+
+def test_rows_with_missing_values_are_skipped(artifact, samples):
+    gappy = samples[:100].copy()
+    gappy[50, 1] = np.nan
+    results = stream(artifact, [gappy])
+    assert len(results) == 99 - artifact.timesteps + 1
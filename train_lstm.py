@@ -1,36 +1,146 @@
-import numpy as np
-import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, RepeatVector, TimeDistributed
-
-# Yeni dosyayı oku
-df = pd.read_csv('Final_Structured_Data.csv')
-features = ['left_foot_pressure', 'right_foot_pressure', 'core_stability']
-data_clean = df[features].dropna().reset_index(drop=True)
-
-# Normalizasyon
-scaler = MinMaxScaler()
-scaled_data = scaler.fit_transform(data_clean)
-
-# LSTM formatına hazırla
-timesteps = 10
-X_lstm = np.array([scaled_data[i:i + timesteps] for i in range(len(scaled_data) - timesteps)])
-
-# Modeli kur
-model = Sequential([
-    LSTM(64, activation='relu', return_sequences=True, input_shape=(timesteps, X_lstm.shape[2])),
-    LSTM(32, activation='relu', return_sequences=False),
-    RepeatVector(timesteps),
-    LSTM(32, activation='relu', return_sequences=True),
-    LSTM(64, activation='relu', return_sequences=True),
-    TimeDistributed(Dense(X_lstm.shape[2]))
-])
-model.compile(optimizer='adam', loss='mse')
-
-# Eğitimi başlat
-model.fit(X_lstm, X_lstm, epochs=30, batch_size=32, validation_split=0.1, verbose=2)
-
-# Eğitilen ağırlıkları kaydet
-model.save_weights('trained_lstm_model.weights.h5')
-print("✅ Eğitim tamamlandı ve model ağırlıkları kaydedildi: trained_lstm_model.weights.h5")
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from services import training
+from services.quantiles import calibrate_threshold
+from services.lstm_runtime import LSTM_UNITS
+from services.model_registry import save_artifact, REGISTRY_DIR
+
+logger = logging.getLogger(__name__)
+
+# Offline training: the web app only loads the registered artifact and runs inference.
+# Several --timesteps / --units values run a sweep: every combination is trained in its own process,
+# and the configuration with the lowest validation loss is registered.
+
+
+def parse_units(value):
+    units = tuple(int(u) for u in value.split(','))
+    if len(units) != len(LSTM_UNITS) or min(units) < 1:
+        raise argparse.ArgumentTypeError(f"expected {len(LSTM_UNITS)} comma-separated layer sizes, e.g. 64,32,32,64")
+    return units
+
+
+# Shows the progress of services/training.py; also the initializer of the sweep workers.
+def setup_logging():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the LSTM autoencoder and register it in the model registry.')
+    parser.add_argument('--data', nargs='+', default=['Final_Structured_Data.csv'],
+                        help='Training CSV files, directories or glob patterns')
+    parser.add_argument('--timesteps', type=int, nargs='+', default=[10])
+    parser.add_argument('--units', type=parse_units, nargs='+', default=[LSTM_UNITS],
+                        help='Sizes of the four LSTM layers, e.g. 64,32,32,64 (several values run a sweep)')
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--patience', type=int, default=5, help='Epochs without val_loss improvement before stopping (0 = off)')
+    parser.add_argument('--validation-split', type=float, default=0.1, help='Share of each recording held out (its last rows)')
+    parser.add_argument('--percentile', type=float, default=95, help='MSE percentile used as anomaly threshold')
+    parser.add_argument('--version', default=None, help='Registry version name (default: timestamp)')
+    parser.add_argument('--registry-dir', default=REGISTRY_DIR)
+    parser.add_argument('--checkpoint-dir', default='training_runs', help='Checkpoints of the sweep trials (resume point)')
+    parser.add_argument('--jobs', type=int, default=None, help='Trials trained in parallel (default: min(trials, CPUs))')
+    parser.add_argument('--chunk-rows', type=int, default=training.CHUNK_ROWS, help='CSV rows read per chunk')
+    parser.add_argument('--fresh', action='store_true', help='Ignore existing checkpoints and train every trial from scratch')
+    parser.add_argument('--from-weights', default=None,
+                        help='Register existing weights (e.g. trained_lstm_model.weights.h5) without training')
+    args = parser.parse_args()
+    setup_logging()
+
+    files = training.expand_inputs(args.data)
+    features = training.FEATURES
+
+    # Normalizasyon: parametreler yalnızca eğitim verisinde, dosyalar parça parça okunarak hesaplanır
+    scaler, counts = training.scan_recordings(files, features, args.chunk_rows)
+    logger.info(f"{len(files)} dosya, {sum(counts.values())} satır")
+
+    configs = [(timesteps, units) for timesteps in args.timesteps for units in args.units]
+    sweep = []
+    if args.from_weights:
+        if len(configs) > 1:
+            parser.error('--from-weights registers a single --timesteps/--units configuration')
+        timesteps, units = configs[0]
+        best = {'timesteps': timesteps, 'units': list(units), 'weights': args.from_weights, 'epochs': 0}
+    else:
+        # Her konfigürasyon ayrı bir süreçte eğitilir; CPU çekirdekleri süreçler arasında paylaştırılır
+        jobs = max(1, min(args.jobs or os.cpu_count() or 1, len(configs)))
+        trial_configs = [
+            {
+                'files': files,
+                'counts': counts,
+                'normalizer': scaler.to_dict(),
+                'timesteps': timesteps,
+                'units': list(units),
+                'epochs': args.epochs,
+                'batch_size': args.batch_size,
+                'patience': args.patience,
+                'validation_split': args.validation_split,
+                'checkpoint_dir': args.checkpoint_dir,
+                'threads': max(1, (os.cpu_count() or 1) // jobs),
+                'chunk_rows': args.chunk_rows,
+                'fresh': args.fresh,
+                'verbose': 2 if jobs == 1 else 0,
+            }
+            for timesteps, units in configs
+        ]
+        if jobs == 1:
+            sweep = [training.train_trial(config) for config in trial_configs]
+        else:
+            # TensorFlow is not fork-safe: workers are started with spawn
+            with ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=setup_logging) as pool:
+                sweep = list(pool.map(training.train_trial, trial_configs))
+
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+        with open(os.path.join(args.checkpoint_dir, 'sweep.json'), 'w') as f:
+            json.dump(sorted(sweep, key=lambda r: r['val_loss']), f, indent=2)
+        best = min(sweep, key=lambda r: r['val_loss'])
+        for result in sorted(sweep, key=lambda r: r['val_loss']):
+            logger.info(f"   {result['name']}: val_loss={result['val_loss']:.6f} ({result['epochs']} epochs)")
+
+    # En iyi konfigürasyonun ağırlıklarını yükle
+    from services.lstm_model import build_lstm_autoencoder
+    timesteps = best['timesteps']
+    model = build_lstm_autoencoder(timesteps, len(features), tuple(best['units']))
+    model.load_weights(best['weights'])
+
+    # Eşik değerini eğitim verisi üzerinde, sabit bellekle (P²) kalibre et
+    calibration = calibrate_threshold(
+        training.iter_training_mse(model, files, counts, scaler, timesteps, args.validation_split, args.chunk_rows),
+        args.percentile,
+    )
+    threshold = calibration.value
+
+    # Isolation Forest ve One-Class SVM referans verinin bir örneklemi üzerinde bir kez eğitilir
+    from services.anomaly_detection import fit_reference_detectors
+    detectors = fit_reference_detectors(
+        training.sample_training_rows(files, counts, scaler, args.validation_split, chunk_rows=args.chunk_rows)
+    )
+
+    # Ağırlıkları, normalizer'ı, eşik değerini ve dedektörleri kaydet
+    path = save_artifact(
+        model, scaler, threshold, timesteps, features,
+        version=args.version,
+        registry_dir=args.registry_dir,
+        detectors=detectors,
+        extra={
+            'training_data': files,
+            'training_rows': int(sum(counts.values())),
+            'epochs': best['epochs'],
+            'best_epoch': best.get('best_epoch'),
+            'val_loss': best.get('val_loss'),
+            'validation_split': args.validation_split,
+            'threshold_percentile': args.percentile,
+            'threshold_calibration': calibration.to_dict(),
+            'sweep': [{k: r[k] for k in ('timesteps', 'units', 'val_loss', 'epochs')} for r in sweep],
+        },
+    )
+    logger.info(f"Eğitim tamamlandı ve model kaydedildi: {path} (threshold={threshold:.6f})")
+
+
+if __name__ == '__main__':
+    main()
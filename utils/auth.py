@@ -1,44 +1,247 @@
-import pyrebase
+import hashlib
+import hmac
 import os
-from models.user import User 
-from models.db import db     
-
-firebaseConfig = {
-    'apiKey': os.getenv('FIREBASE_API_KEY'),
-    'authDomain': os.getenv('FIREBASE_AUTH_DOMAIN'),
-    'databaseURL': os.getenv('FIREBASE_DATABASE_URL'),
-    'projectId': os.getenv('FIREBASE_PROJECT_ID'),
-    'storageBucket': os.getenv('FIREBASE_STORAGE_BUCKET'),
-    'messagingSenderId': os.getenv('FIREBASE_MESSAGING_SENDER_ID'),
-    'appId': os.getenv('FIREBASE_APP_ID'),
-    'measurementId': os.getenv('FIREBASE_MEASUREMENT_ID'),
-}
-
-firebase = pyrebase.initialize_app(firebaseConfig)
-auth = firebase.auth()
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from models.user import User
+from models.db import db
+from utils.firebase_tokens import TokenVerifier, InvalidTokenError
 
-def login(email, password):
-    try:
-        firebase_user = auth.sign_in_with_email_and_password(email, password)
+# Authentication through a swappable identity provider.
+# The provider signs users in and verifies their ID tokens; the local user profile (id, email, role)
+# is then read through a TTL cache, so verifying a token (login with an ID token from the Firebase
+# web SDK, or an Authorization: Bearer header) needs neither a network call nor a database query.
+#
+# AUTH_PROVIDER = 'firebase' (default) or 'stub' (in-memory accounts, for tests and offline development)
+# AUTH_PROFILE_TTL = Seconds a user profile stays cached
+# AUTH_PROFILE_CACHE_SIZE = Max cached profiles
+
+AUTH_PROVIDER = os.getenv('AUTH_PROVIDER', 'firebase')
+AUTH_PROFILE_TTL = float(os.getenv('AUTH_PROFILE_TTL', '300'))
+AUTH_PROFILE_CACHE_SIZE = int(os.getenv('AUTH_PROFILE_CACHE_SIZE', '10000'))
+STUB_TOKEN_TTL = 3600
+
+
+def firebase_config():
+    return {
+        'apiKey': os.getenv('FIREBASE_API_KEY'),
+        'authDomain': os.getenv('FIREBASE_AUTH_DOMAIN'),
+        'databaseURL': os.getenv('FIREBASE_DATABASE_URL'),
+        'projectId': os.getenv('FIREBASE_PROJECT_ID'),
+        'storageBucket': os.getenv('FIREBASE_STORAGE_BUCKET'),
+        'messagingSenderId': os.getenv('FIREBASE_MESSAGING_SENDER_ID'),
+        'appId': os.getenv('FIREBASE_APP_ID'),
+        'measurementId': os.getenv('FIREBASE_MEASUREMENT_ID'),
+    }
+
+
+# Raised by providers when credentials or tokens are rejected.
+class AuthError(Exception):
+    pass
+
+
+# Firebase: password sign-in and sign-up through pyrebase (REST), ID tokens verified locally.
+# pyrebase is imported and initialized on first use, so starting the app (and workers that
+# never authenticate) does not pay for it, and the config is read after load_dotenv().
+class FirebaseProvider:
+    def __init__(self, config=None):
+        self.config = config or firebase_config()
+        self.verifier = TokenVerifier(self.config['projectId'])
+        self._auth = None
+        self._lock = threading.Lock()
+
+    # pyrebase auth client, created on first call.
+    def client(self):
+        if self._auth is None:
+            with self._lock:
+                if self._auth is None:
+                    import pyrebase
+                    self._auth = pyrebase.initialize_app(self.config).auth()
+        return self._auth
+
+    # @return {'uid', 'email', 'id_token'}
+    def sign_in(self, email, password):
+        try:
+            user = self.client().sign_in_with_email_and_password(email, password)
+        except Exception as e:
+            raise AuthError(str(e))
+        return {'uid': user['localId'], 'email': user.get('email', email), 'id_token': user['idToken']}
+
+    # @return {'uid', 'email'}
+    def create_user(self, email, password):
+        try:
+            user = self.client().create_user_with_email_and_password(email, password)
+        except Exception as e:
+            raise AuthError(str(e))
+        return {'uid': user['localId'], 'email': email}
+
+    # @return {'uid', 'email', 'email_verified'}
+    def verify_id_token(self, id_token):
+        try:
+            claims = self.verifier.verify(id_token)
+        except InvalidTokenError as e:
+            raise AuthError(str(e))
+        return {'uid': claims['sub'], 'email': claims.get('email'), 'email_verified': claims.get('email_verified') is True}
+
+
+# In-memory identity provider with the same interface; tokens are opaque random strings.
+# Accounts' emails count as unverified unless created with email_verified=True.
+class StubProvider:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._users = {}
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(password, salt):
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, 1000)
+
+    def create_user(self, email, password, uid=None, email_verified=False):
+        with self._lock:
+            if email in self._users:
+                raise AuthError("EMAIL_EXISTS")
+            salt = secrets.token_bytes(16)
+            uid = uid or uuid.uuid4().hex
+            self._users[email] = (uid, salt, self._hash(password, salt), email_verified)
+        return {'uid': uid, 'email': email}
+
+    def sign_in(self, email, password):
+        account = self._users.get(email)
+        if account is None or not hmac.compare_digest(account[2], self._hash(password, account[1])):
+            raise AuthError("INVALID_LOGIN_CREDENTIALS")
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._tokens[token] = (account[0], email, self.clock() + STUB_TOKEN_TTL, account[3])
+        return {'uid': account[0], 'email': email, 'id_token': token}
+
+    def verify_id_token(self, id_token):
+        entry = self._tokens.get(id_token)
+        if entry is None or entry[2] < self.clock():
+            raise AuthError("Invalid or expired ID token")
+        return {'uid': entry[0], 'email': entry[1], 'email_verified': entry[3]}
+
+
+# LRU cache of local user profiles with a time-to-live.
+class ProfileCache:
+    def __init__(self, ttl=AUTH_PROFILE_TTL, max_size=AUTH_PROFILE_CACHE_SIZE, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
 
-        # ✅ Flask context içindeyken DB query yapıyoruz
+    def put(self, key, profile):
+        with self._lock:
+            self._entries[key] = (profile, self.clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+profile_cache = ProfileCache()
+
+
+# Identity provider selected by AUTH_PROVIDER, created on first call.
+def get_provider():
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = StubProvider() if AUTH_PROVIDER == 'stub' else FirebaseProvider()
+    return _provider
+
+
+# Replaces the identity provider (e.g. a StubProvider in tests) and clears the profile cache.
+def set_provider(provider):
+    global _provider
+    with _provider_lock:
+        _provider = provider
+    profile_cache.invalidate()
+
+
+# Local profile of an identity, from the cache or the users table (by Firebase uid, then email).
+# Needs an app context on a cache miss.
+# @param email: Email to link a user without a firebase_uid by; only pass one the identity was proven to own
+#               (a password sign-in or a verified email claim, see linkable_email).
+# @return {'id', 'email', 'role', 'firebase_uid'} or None if there is no local user.
+def get_profile(uid, email=None):
+    profile = profile_cache.get(uid)
+    if profile is not None:
+        return profile
+    local_user = User.query.filter_by(firebase_uid=uid).first()
+    if local_user is None and email:
         local_user = User.query.filter_by(email=email).first()
+    if local_user is None:
+        return None
+    profile = {
+        "id": str(local_user.id),               # session'da kullanılacak
+        "email": local_user.email,
+        "role": local_user.role,
+        "firebase_uid": local_user.firebase_uid,
+    }
+    profile_cache.put(uid, profile)
+    return profile
+
+
+# Email of a verified ID token's identity that may be used to find its local user, None if unverified.
+def linkable_email(identity):
+    return identity.get('email') if identity.get('email_verified') else None
 
-        if not local_user:
-            return {"error": "User found in Firebase but not in local database"}
 
-        return {
-            "id": str(local_user.id),               # session'da kullanılacak
-            "email": local_user.email,
-            "role": local_user.role,
-            "firebase_uid": local_user.firebase_uid,
-        }
+def _profile_result(identity, email):
+    profile = get_profile(identity['uid'], email)
+    if not profile:
+        return {"error": "User found in Firebase but not in local database"}
+    return dict(profile, uid=identity['uid'])
+
+
+def login(email, password):
+    try:
+        identity = get_provider().sign_in(email, password)
+        result = _profile_result(identity, identity['email'])
+        if "error" not in result:
+            result["id_token"] = identity['id_token']
+        return result
+    except Exception as e:
+        return {"error": str(e)}
+
+
+# Login with an ID token obtained by the client (e.g. the Firebase web SDK); verified locally.
+def login_with_token(id_token):
+    try:
+        identity = get_provider().verify_id_token(id_token)
+        return _profile_result(identity, linkable_email(identity))
     except Exception as e:
         return {"error": str(e)}
 
+
+# @return {'uid', 'email'} of the new identity, or {'error'}.
 def signup(email, password):
     try:
-        user = auth.create_user_with_email_and_password(email, password)
-        return user
+        return get_provider().create_user(email, password)
     except Exception as e:
         return {"error": f"Error creating user: {e}"}
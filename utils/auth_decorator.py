@@ -1,10 +1,28 @@
+import uuid
 from functools import wraps
-from flask import session, redirect, url_for
+from flask import session, redirect, url_for, request, jsonify, g
+from utils.auth import get_provider, get_profile, linkable_email
 
+# Requires a logged-in user: the Flask session of a browser login, or an
+# Authorization: Bearer <ID token> header (verified locally, profile from the cache).
+# The user id is available as g.user_id (uuid.UUID).
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Bearer '):
+            try:
+                identity = get_provider().verify_id_token(header[len('Bearer '):].strip())
+            except Exception as e:
+                return jsonify({'status': 'error', 'message': f"Unauthorized: {str(e)}"}), 401
+            profile = get_profile(identity['uid'], linkable_email(identity))
+            if not profile:
+                return jsonify({'status': 'error', 'message': 'Unauthorized: unknown user'}), 401
+            g.user_id = uuid.UUID(profile['id'])
+            return f(*args, **kwargs)
+
         if not session.get('user_id'):
             return redirect(url_for('login_page'))
+        g.user_id = uuid.UUID(session['user_id'])
         return f(*args, **kwargs)
     return decorated_function
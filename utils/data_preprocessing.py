@@ -9,3 +9,23 @@ def load_and_clean_data(filepath, features):
     df = pd.read_csv(filepath) # DataFrame containing the loaded data.
     data_clean = df[features].dropna().reset_index(drop=True) # DataFrame containing the cleaned data with selected features and no missing values.
     return data_clean
+
+
+# Reads an uploaded CSV in fixed-size chunks, keeping only the feature columns as float32.
+# The header is checked before any data is parsed, so a file with missing columns is rejected up front.
+# @param file: Path or seekable file object (e.g. an uploaded FileStorage stream).
+# @param features: Required columns, in the order of the returned arrays.
+# @param chunksize: Rows per chunk; bounds the memory used while parsing.
+# @return Generator of float32 arrays of shape (rows, len(features)); NaN rows are kept.
+# @raise ValueError if a required column is missing.
+def read_csv_chunks(file, features, chunksize=65536):
+    header = pd.read_csv(file, nrows=0)
+    missing = [feature for feature in features if feature not in header.columns]
+    if missing:
+        raise ValueError(f"CSV missing required columns: {', '.join(missing)}")
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+    reader = pd.read_csv(file, usecols=features, dtype={feature: 'float32' for feature in features}, chunksize=chunksize)
+    for chunk in reader:
+        yield chunk[features].to_numpy()
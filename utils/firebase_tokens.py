@@ -0,0 +1,151 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import re
+import threading
+import time
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+# Local verification of Firebase ID tokens (RS256 JWTs signed by securetoken@system.gserviceaccount.com).
+# Google's public keys are fetched as a JWK set and cached for the max-age of the response; they are
+# refreshed in the background shortly before they expire, and at most every KEY_MIN_REFRESH_SECONDS when a
+# token names an unknown key (key rotation). Verifying a token is then pure computation, no network call.
+# The RSA PKCS#1 v1.5 check needs only the key's modulus and exponent, so no crypto library is required.
+
+FIREBASE_JWKS_URL = 'https://www.googleapis.com/service_accounts/v1/jwk/securetoken@system.gserviceaccount.com'
+ISSUER_PREFIX = 'https://securetoken.google.com/'
+# Used when the key response has no Cache-Control max-age
+DEFAULT_KEY_MAX_AGE = 3600
+# Keys are refreshed in the background once they are this close to expiry
+KEY_REFRESH_MARGIN = 300
+KEY_MIN_REFRESH_SECONDS = 60
+# Tolerated clock skew for exp/iat checks
+CLOCK_SKEW_SECONDS = 60
+
+# DER prefix of a SHA-256 DigestInfo (RFC 8017, section 9.2)
+_SHA256_DIGEST_INFO = bytes.fromhex('3031300d060960864801650304020105000420')
+
+
+# Raised when a token is malformed, expired or not signed by a current Google key.
+class InvalidTokenError(Exception):
+    pass
+
+
+def _b64url_decode(value):
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+def _b64url_int(value):
+    return int.from_bytes(_b64url_decode(value), 'big')
+
+
+# @return True if signature is a valid RS256 signature of message for the public key (n, e).
+def rsa_sha256_verify(n, e, message, signature):
+    size = (n.bit_length() + 7) // 8
+    if len(signature) != size:
+        return False
+    decoded = pow(int.from_bytes(signature, 'big'), e, n).to_bytes(size, 'big')
+    digest_info = _SHA256_DIGEST_INFO + hashlib.sha256(message).digest()
+    padding = size - 3 - len(digest_info)
+    if padding < 8:
+        return False
+    expected = b'\x00\x01' + b'\xff' * padding + b'\x00' + digest_info
+    return hmac.compare_digest(decoded, expected)
+
+
+# Downloads the JWK set.
+# @return ({kid: (n, e)}, max_age_seconds)
+def fetch_jwks(url=FIREBASE_JWKS_URL, timeout=5):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        body = json.load(response)
+        cache_control = response.headers.get('Cache-Control', '')
+    match = re.search(r'max-age=(\d+)', cache_control)
+    keys = {
+        key['kid']: (_b64url_int(key['n']), _b64url_int(key['e']))
+        for key in body.get('keys', [])
+        if key.get('kty') == 'RSA'
+    }
+    return keys, int(match.group(1)) if match else DEFAULT_KEY_MAX_AGE
+
+
+# @project_id = Firebase project the tokens must be issued for (aud claim).
+# @fetch = Callable returning ({kid: (n, e)}, max_age); replaced in tests.
+# @clock = Time source in seconds.
+class TokenVerifier:
+    def __init__(self, project_id, fetch=fetch_jwks, clock=time.time):
+        self.project_id = project_id
+        self.fetch = fetch
+        self.clock = clock
+        self._keys = {}
+        self._expires_at = 0.0
+        self._last_fetch = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _refresh(self):
+        keys, max_age = self.fetch()
+        with self._lock:
+            self._keys = keys
+            self._last_fetch = self.clock()
+            self._expires_at = self._last_fetch + max_age
+        logger.info(f"Firebase public keys refreshed ({len(keys)} keys, valid {max_age}s)")
+
+    def _refresh_in_background(self):
+        try:
+            self._refresh()
+        except Exception as e:
+            logger.warning(f"Background refresh of Firebase public keys failed: {str(e)}")
+        finally:
+            self._refreshing = False
+
+    # Current keys; expired keys are refetched inline, nearly expired ones in the background.
+    def keys(self):
+        now = self.clock()
+        if now >= self._expires_at:
+            self._refresh()
+        elif now >= self._expires_at - KEY_REFRESH_MARGIN and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._refresh_in_background, name='firebase-keys', daemon=True).start()
+        return self._keys
+
+    def _key(self, kid):
+        key = self.keys().get(kid)
+        if key is None and self.clock() - self._last_fetch >= KEY_MIN_REFRESH_SECONDS:
+            self._refresh()
+            key = self._keys.get(kid)
+        return key
+
+    # Verifies signature and claims of an ID token.
+    # @return Claims dict (uid in 'sub', plus 'email' when present).
+    # @raise InvalidTokenError
+    def verify(self, token):
+        try:
+            header_b64, payload_b64, signature_b64 = token.split('.')
+            header = json.loads(_b64url_decode(header_b64))
+            claims = json.loads(_b64url_decode(payload_b64))
+            signature = _b64url_decode(signature_b64)
+        except (AttributeError, ValueError):
+            raise InvalidTokenError("Malformed ID token")
+
+        if header.get('alg') != 'RS256':
+            raise InvalidTokenError("ID token must be signed with RS256")
+        key = self._key(header.get('kid'))
+        if key is None:
+            raise InvalidTokenError("ID token signed with an unknown key")
+        if not rsa_sha256_verify(key[0], key[1], f"{header_b64}.{payload_b64}".encode(), signature):
+            raise InvalidTokenError("Invalid ID token signature")
+
+        now = self.clock()
+        if claims.get('aud') != self.project_id or claims.get('iss') != ISSUER_PREFIX + str(self.project_id):
+            raise InvalidTokenError("ID token was issued for another project")
+        if not claims.get('sub') or len(claims['sub']) > 128:
+            raise InvalidTokenError("ID token has no valid subject")
+        if claims.get('exp', 0) < now - CLOCK_SKEW_SECONDS:
+            raise InvalidTokenError("ID token has expired")
+        if claims.get('iat', now) > now + CLOCK_SKEW_SECONDS or claims.get('auth_time', 0) > now + CLOCK_SKEW_SECONDS:
+            raise InvalidTokenError("ID token is not valid yet")
+        return claims
@@ -0,0 +1,92 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# Optional per-request cProfile capture, switchable at runtime.
+# While enabled, every request (or only requests sent with ?profile=1 / X-Profile: 1 when
+# mode is 'on_demand') is profiled and its stats are written to PROFILE_DIR/<time>-<endpoint>.prof
+# (open with snakeviz or pstats); the top functions are logged.
+# Only one request is profiled at a time, since a Python profiler cannot run in several threads at once.
+#
+# PROFILING_ALLOWED = Allows switching profiling on through POST /debug/profiling (default false)
+# PROFILE_DIR = Folder for the .prof files
+
+PROFILING_ALLOWED = os.getenv('PROFILING_ALLOWED', 'false').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_TOP_FUNCTIONS = 20
+
+OFF = 'off'
+ALL = 'all'
+ON_DEMAND = 'on_demand'
+
+
+# @mode = 'off', 'all' (every request) or 'on_demand' (requests asking for it).
+class RequestProfiler:
+    def __init__(self, mode=OFF, output_dir=PROFILE_DIR):
+        self.mode = mode
+        self.output_dir = output_dir
+        self.captured = 0
+        self._busy = threading.Lock()
+
+    def set_mode(self, mode):
+        if mode not in (OFF, ALL, ON_DEMAND):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.mode = mode
+        logger.info(f"Request profiling: {mode}")
+
+    def _wanted(self):
+        if self.mode == ALL:
+            return True
+        return self.mode == ON_DEMAND and (
+            request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'
+        )
+
+    def before_request(self):
+        if not self._wanted() or not self._busy.acquire(blocking=False):
+            return
+        g._profiler = cProfile.Profile()
+        g._profiler.enable()
+
+    def after_request(self, response):
+        profiler = g.pop('_profiler', None)
+        if profiler is None:
+            return response
+        try:
+            profiler.disable()
+            path = self._save(profiler)
+            response.headers['X-Profile-File'] = path
+        finally:
+            self._busy.release()
+        return response
+
+    # Unhandled errors skip after_request; drop the capture so the next request can be profiled.
+    def teardown_request(self, error=None):
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            self._busy.release()
+
+    def _save(self, profiler):
+        os.makedirs(self.output_dir, exist_ok=True)
+        endpoint = (request.endpoint or 'unknown').replace('.', '_')
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{self.captured}.prof")
+        profiler.dump_stats(path)
+        self.captured += 1
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        logger.info(f"Profile of {request.method} {request.path} saved to {path}\n{summary.getvalue()}")
+        return path
+
+    # Registers the hooks on a Flask app.
+    def init_app(self, app):
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
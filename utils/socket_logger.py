@@ -1,10 +1,11 @@
 from tensorflow.keras.callbacks import Callback
 
 class SocketIOCallback(Callback):
-    def __init__(self, socketio, session_id):
+    def __init__(self, socketio, session_id, cancel_event=None):
         super().__init__()
         self.socketio = socketio
         self.session_id = session_id
+        self.cancel_event = cancel_event
 
     def on_epoch_end(self, epoch, logs=None):
         if logs is not None:
@@ -13,3 +14,7 @@ class SocketIOCallback(Callback):
                 'loss': logs.get('loss', 0),
                 'val_loss': logs.get('val_loss', 0)
             }, room=self.session_id)
+
+        # Stop training when the analysis job is cancelled
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.model.stop_training = True
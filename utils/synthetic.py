@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+# Synthetic sensor recordings (same normal model as expand.py) for data expansion and benchmarks.
+# Normal rows are drawn from independent normal distributions per channel; anomalies are injected
+# as short bursts of one of three faults seen on the platform: left/right imbalance, a pressure
+# spike on both feet and a core stability drop.
+
+FEATURES = ['left_foot_pressure', 'right_foot_pressure', 'core_stability']
+# (mean, std) per channel, as used by expand.py
+DEFAULT_PARAMS = {
+    'left_foot_pressure': (50, 5),
+    'right_foot_pressure': (50, 5),
+    'core_stability': (0.85, 0.05),
+}
+ANOMALY_KINDS = ('imbalance', 'spike', 'core_drop')
+
+
+# @param n_rows: Number of samples in the recording.
+# @param anomaly_rate: Fraction of rows (0-1) that are part of an injected anomaly burst.
+# @param burst: Length of one anomaly burst in rows.
+# @param seed: Seed of the random generator; the same seed gives the same recording.
+# @param params: {column: (mean, std)} overriding DEFAULT_PARAMS.
+# @return DataFrame with the FEATURES columns and a boolean `injected_anomaly` label column.
+def generate_recording(n_rows, anomaly_rate=0.0, burst=5, seed=None, params=None):
+    rng = np.random.default_rng(seed)
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    data = {feature: rng.normal(*params[feature], n_rows) for feature in FEATURES}
+    labels = np.zeros(n_rows, dtype=bool)
+
+    n_bursts = int(round(n_rows * anomaly_rate / burst)) if n_rows > burst else 0
+    if n_bursts:
+        starts = rng.choice(n_rows - burst, n_bursts, replace=False)
+        kinds = rng.choice(len(ANOMALY_KINDS), n_bursts)
+        for start, kind in zip(starts, kinds):
+            rows = slice(start, start + burst)
+            if ANOMALY_KINDS[kind] == 'imbalance':
+                data['left_foot_pressure'][rows] *= 1.5
+                data['right_foot_pressure'][rows] *= 0.5
+            elif ANOMALY_KINDS[kind] == 'spike':
+                data['left_foot_pressure'][rows] *= 1.6
+                data['right_foot_pressure'][rows] *= 1.6
+            else:
+                data['core_stability'][rows] *= 0.4
+            labels[rows] = True
+
+    df = pd.DataFrame(data, columns=FEATURES)
+    df['injected_anomaly'] = labels
+    return df
+
+
+# Recording of a lifting session: sets of reps, each rep one half-sine excursion of both foot pressures,
+# separated by `pause` rows within a set and `rest` rows between sets (for rep segmentation).
+# @param amplitude: Peak pressure change of a rep, in raw units.
+# @return (DataFrame with the FEATURES columns, [(start, stop)] row ranges of the reps)
+def generate_lifting_recording(sets=3, reps=5, rep_rows=120, pause=40, rest=3000, amplitude=10, seed=None):
+    rng = np.random.default_rng(seed)
+    parts, rep_ranges, position = [], [], 0
+    for _ in range(sets):
+        parts.append(np.zeros(rest))
+        position += rest
+        for _ in range(reps):
+            parts.append(amplitude * np.sin(np.pi * np.arange(rep_rows) / rep_rows))
+            parts.append(np.zeros(pause))
+            rep_ranges.append((position, position + rep_rows))
+            position += rep_rows + pause
+    parts.append(np.zeros(rest))
+    pressure = np.concatenate(parts)
+    n_rows = len(pressure)
+    left_mean, _ = DEFAULT_PARAMS['left_foot_pressure']
+    right_mean, _ = DEFAULT_PARAMS['right_foot_pressure']
+    core_mean, _ = DEFAULT_PARAMS['core_stability']
+    df = pd.DataFrame({
+        'left_foot_pressure': left_mean + pressure + rng.normal(0, 0.5, n_rows),
+        'right_foot_pressure': right_mean + pressure + rng.normal(0, 0.5, n_rows),
+        'core_stability': core_mean + rng.normal(0, 0.005, n_rows),
+    }, columns=FEATURES)
+    return df, rep_ranges
@@ -0,0 +1,40 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Sliding windows for the LSTM autoencoder, shared by training and inference.
+# Windows are strided views over the scaled data, so building them allocates nothing:
+# window i is data[i:i + timesteps], exactly like the old list comprehension
+# np.array([data[i:i + timesteps] for i in range(len(data) - timesteps)]).
+
+
+# Number of windows produced for `n_rows` rows.
+def window_count(n_rows, timesteps):
+    return max(n_rows - timesteps, 0)
+
+
+# @param data: 2D array of shape (rows, features).
+# @param timesteps: Window length.
+# @return Read-only view of shape (rows - timesteps, timesteps, features).
+def sliding_windows(data, timesteps):
+    data = np.asarray(data)
+    n_windows = window_count(len(data), timesteps)
+    if n_windows == 0:
+        return np.empty((0, timesteps, data.shape[1]), dtype=data.dtype)
+    # sliding_window_view puts the window axis last: (n, features, timesteps) -> (n, timesteps, features)
+    windows = sliding_window_view(data, timesteps, axis=0).transpose(0, 2, 1)
+    return windows[:n_windows]
+
+
+# Chunked generator mode: yields contiguous float32 copies of at most `chunk_size` windows,
+# so peak memory is bounded by the chunk instead of the whole recording.
+# @return Generator of (start_index, windows) tuples.
+def iter_window_chunks(data, timesteps, chunk_size=4096, dtype=np.float32):
+    windows = sliding_windows(data, timesteps)
+    for start in range(0, len(windows), chunk_size):
+        yield start, np.ascontiguousarray(windows[start:start + chunk_size], dtype=dtype)
+
+
+# Yields (X, X) batches for autoencoder training, one pass over the data.
+def iter_window_batches(data, timesteps, batch_size=32, dtype=np.float32):
+    for _, X in iter_window_chunks(data, timesteps, batch_size, dtype):
+        yield X, X